@@ -1,5 +1,7 @@
 import streamlit as st
 
+from oyken.cache import local_activo
+
 st.set_page_config(
     page_title="OYKEN",
     layout="centered",
@@ -19,4 +21,6 @@ No sustituye sistemas ya existentes: Los interpreta y los convierte en criterio
 PROXIMOS MODULOS: Margen Bruto-Ebitda Real-Escenarios ... 
 """)
            
+local_activo()
+
 st.markdown("Selecciona un módulo en el menú lateral")
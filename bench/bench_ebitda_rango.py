@@ -0,0 +1,132 @@
+# =========================
+# BENCHMARK · EBITDA POR RANGO
+# =========================
+# Genera N años de cierres mensuales canónicos en un directorio
+# temporal y compara:
+#   - la página anterior: 5 lecturas CSV + to_numeric + 5 merges,
+#     filtrando por año como pretendía el bucle de locals() (que en
+#     realidad no filtraba: se informa de cuántas filas generaba)
+#   - la tabla materializada + consulta por rango sobre (anio, mes)
+# Antes de medir comprueba que consultar_ebitda coincide con un
+# cálculo de referencia para últimos 12 meses, YTD y ejercicio fiscal.
+# Uso: python bench/bench_ebitda_rango.py [años ...]
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from oyken.ebitda import (
+    FUENTES,
+    actualizar_ebitda,
+    consultar_ebitda,
+    indexar_ebitda,
+    rango_ejercicio,
+    rango_ultimos_12,
+    rango_ytd,
+    totales_ebitda
+)
+
+
+def generar_fuentes(directorio, anios, semilla=0):
+    rng = np.random.default_rng(semilla)
+    claves = pd.MultiIndex.from_product(
+        [range(2026 - anios + 1, 2027), range(1, 13)], names=["anio", "mes"]
+    ).to_frame(index=False)
+
+    for columna, archivo in FUENTES.items():
+        df = claves.copy()
+        df[columna] = rng.uniform(1_000, 90_000, len(df)).round(2)
+        # Algún mes repetido: la última fila es la buena
+        dup = df.sample(frac=0.02, random_state=semilla).assign(**{columna: 0.0})
+        pd.concat([dup, df], ignore_index=True).to_csv(directorio / archivo, index=False)
+
+
+def leer_fuentes(directorio):
+    dfs = {}
+    for columna, archivo in FUENTES.items():
+        df = pd.read_csv(directorio / archivo)
+        df["anio"] = pd.to_numeric(df["anio"], errors="coerce")
+        df["mes"] = pd.to_numeric(df["mes"], errors="coerce")
+        df[columna] = pd.to_numeric(df[columna], errors="coerce").fillna(0)
+        dfs[columna] = df
+    return dfs
+
+
+def pagina_anterior(directorio, anio_sel):
+    base = pd.DataFrame({"mes": range(1, 13)})
+    for columna, df in leer_fuentes(directorio).items():
+        df = df[df["anio"] == anio_sel]
+        base = base.merge(df[["mes", columna]], on="mes", how="left")
+    return base.fillna(0)
+
+
+def filas_sin_filtrar(directorio):
+    # Filas que producían los 5 merges sin filtrar: por mes, producto
+    # de las filas de cada fuente (no se materializa, no cabe en memoria)
+    conteos = [df["mes"].value_counts() for df in leer_fuentes(directorio).values()]
+    return int(np.prod(conteos, axis=0).sum())
+
+
+def referencia(directorio, desde, hasta):
+    k0, k1 = desde[0] * 12 + desde[1] - 1, hasta[0] * 12 + hasta[1] - 1
+    total = {}
+    for columna, archivo in FUENTES.items():
+        df = pd.read_csv(directorio / archivo).drop_duplicates(["anio", "mes"], keep="last")
+        clave = df["anio"] * 12 + df["mes"] - 1
+        total[columna] = df.loc[clave.between(k0, k1), columna].sum()
+    total["ebitda_base_eur"] = (
+        total["ventas_total_eur"] - total["compras_total_eur"]
+        - total["rrhh_total_eur"] - total["gastos_total_eur"]
+    )
+    total["ebitda_ajustado_eur"] = total["ebitda_base_eur"] - total["variacion_inventario_eur"]
+    return pd.Series(total)
+
+
+def cronometrar(funcion, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - t0)
+    return min(tiempos) * 1000
+
+
+if __name__ == "__main__":
+    tamanos = [int(x) for x in sys.argv[1:]] or [10, 25, 50]
+
+    print(f"{'años':>6} {'filas con bug':>22} {'anterior':>10} {'materializada':>14} {'consulta 12m':>13}")
+    for anios in tamanos:
+        with tempfile.TemporaryDirectory() as tmp:
+            directorio = Path(tmp)
+            generar_fuentes(directorio, anios)
+            actualizar_ebitda(directorio)
+            indexado = indexar_ebitda(actualizar_ebitda(directorio))
+
+            for desde, hasta in [
+                rango_ultimos_12(2026, 3),
+                rango_ytd(2025, 7),
+                rango_ejercicio(2024, 9),
+                ((2026 - anios + 1, 1), (2026, 12)),
+            ]:
+                mensual = consultar_ebitda(indexado, desde, hasta)
+                assert len(mensual) == (hasta[0] - desde[0]) * 12 + hasta[1] - desde[1] + 1
+                assert np.allclose(totales_ebitda(mensual), referencia(directorio, desde, hasta)[mensual.columns[2:]])
+
+            filas_anterior = filas_sin_filtrar(directorio)
+
+            t_anterior = cronometrar(lambda: pagina_anterior(directorio, 2026))
+            t_materializada = cronometrar(
+                lambda: consultar_ebitda(indexar_ebitda(actualizar_ebitda(directorio)), (2026, 1), (2026, 12))
+            )
+            t_consulta = cronometrar(lambda: consultar_ebitda(indexado, *rango_ultimos_12(2026, 3)), 50)
+
+            print(
+                f"{anios:>6} {filas_anterior:>22,} {t_anterior:>8.1f}ms "
+                f"{t_materializada:>12.1f}ms {t_consulta:>11.2f}ms"
+            )
@@ -0,0 +1,130 @@
+# =========================
+# BENCHMARK · CONSOLIDADO DE GRUPO
+# =========================
+# Genera L locales × N años de registros brutos (ventas diarias,
+# compras, gastos, puestos de RRHH, inventario) en un directorio
+# temporal con particiones locales/<id>/ y mide consolidar_grupo:
+#   - en frío (sin mensuales ni EBITDA), secuencial y con pool
+#   - en caliente (nada ha cambiado: se salta cada local), secuencial y con pool
+# Antes de comparar tiempos comprueba que el pool da la misma tabla
+# que la pasada secuencial.
+# Uso: python bench/bench_grupo.py [locales] [años] [procesos]
+
+import os
+import sys
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from oyken import db
+from oyken.calendario import MESES
+from oyken.consolidacion import CONSOLIDACIONES, FIRMA_FILE, INVENTARIO_FILE, consolidar_grupo
+from oyken.ebitda import EBITDA_FILE, FUENTES_FILE
+from oyken.locales import crear_local, directorio_local, listar_locales
+from oyken.ventas import COLUMNAS
+
+COMPRAS_POR_DIA = 6
+GASTOS_POR_DIA = 2
+
+
+def generar_local(directorio, anios, semilla):
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range(f"{2026 - anios + 1}-01-01", "2026-12-31")
+    n = len(fechas)
+
+    ventas = pd.DataFrame({"fecha": fechas.strftime("%Y-%m-%d")})
+    for t in ["manana", "tarde", "noche"]:
+        ventas[f"ventas_{t}_eur"] = rng.uniform(200, 1500, n).round(2)
+        ventas[f"comensales_{t}"] = rng.integers(10, 80, n)
+        ventas[f"tickets_{t}"] = rng.integers(5, 60, n)
+    ventas["ventas_total_eur"] = ventas[[f"ventas_{t}_eur" for t in ["manana", "tarde", "noche"]]].sum(axis=1)
+    ventas["observaciones"] = ""
+    ventas[COLUMNAS].to_csv(directorio / "ventas.csv", index=False)
+
+    for archivo, por_dia in (("compras.csv", COMPRAS_POR_DIA), ("gastos.csv", GASTOS_POR_DIA)):
+        m = n * por_dia
+        f = pd.DatetimeIndex(rng.choice(fechas, m))
+        pd.DataFrame({
+            "Fecha": f.strftime("%d/%m/%Y"),
+            "Proveedor": rng.choice(["Makro", "Coca Cola", "Pescados Ruiz"], m),
+            "Coste (€)": rng.uniform(5, 400, m).round(2)
+        }).to_csv(directorio / archivo, index=False)
+
+    puestos = [
+        {"Año": a, "Puesto": p, "Bruto anual (€)": 22_000.0, **{mes: int(rng.integers(1, 4)) for mes in MESES}}
+        for a in range(2026 - anios + 1, 2027) for p in ["Cocina", "Sala", "Barra"]
+    ]
+    pd.DataFrame(puestos).to_csv(directorio / "rrhh_puestos.csv", index=False)
+
+    claves = pd.MultiIndex.from_product(
+        [range(2026 - anios + 1, 2027), range(1, 13)], names=["anio", "mes"]
+    ).to_frame(index=False)
+    claves["inventario_cierre_eur"] = rng.uniform(2_000, 6_000, len(claves)).round(2)
+    claves["variacion_inventario_eur"] = 0
+    claves["fecha_actualizacion"] = "2026-01-01"
+    claves.to_csv(directorio / "inventario_mensual.csv", index=False)
+
+
+def borrar_derivados(raiz):
+    # Vuelta al estado "solo brutos" (inventario se recalcula igual):
+    # fuera los archivos derivados y se vacían las tablas mensuales
+    for local in listar_locales(raiz):
+        directorio = directorio_local(local, raiz)
+        with closing(db.conectar(directorio)) as con:
+            for archivo in [*CONSOLIDACIONES, EBITDA_FILE, FUENTES_FILE, FIRMA_FILE]:
+                if archivo == INVENTARIO_FILE:
+                    continue
+                if Path(archivo).stem in db.TABLAS:
+                    db.reemplazar(con, db.tabla_de(archivo), db.vacia(db.tabla_de(archivo)))
+                else:
+                    (directorio / archivo).unlink(missing_ok=True)
+
+
+def medir(raiz, procesos):
+    t0 = time.perf_counter()
+    tabla = consolidar_grupo(raiz, procesos)
+    return tabla, time.perf_counter() - t0
+
+
+def ordenar(tabla):
+    return tabla.sort_values(["local", "anio", "mes"]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    n_locales = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    anios = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    procesos = int(sys.argv[3]) if len(sys.argv) > 3 else (os.cpu_count() or 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raiz = Path(tmp)
+        t0 = time.perf_counter()
+        for i in range(n_locales):
+            generar_local(crear_local(f"local-{i:03d}", raiz), anios, semilla=i)
+        print(
+            f"{n_locales} locales × {anios} años generados en {time.perf_counter() - t0:.1f}s "
+            f"({os.cpu_count()} CPU, pool de {procesos})"
+        )
+
+        borrar_derivados(raiz)
+        secuencial, t_sec_frio = medir(raiz, 1)
+        _, t_sec_caliente = medir(raiz, 1)
+
+        borrar_derivados(raiz)
+        pool, t_pool_frio = medir(raiz, procesos)
+        _, t_pool_caliente = medir(raiz, procesos)
+
+        pd.testing.assert_frame_equal(ordenar(secuencial), ordenar(pool))
+        print(f"OK: pool = secuencial ({len(pool):,} filas local × mes)")
+
+        print(f"{'':<22}{'secuencial':>12}{'pool':>12}{'x':>8}")
+        for nombre, a, b in (
+            ("en frío", t_sec_frio, t_pool_frio),
+            ("en caliente", t_sec_caliente, t_pool_caliente),
+        ):
+            print(f"{nombre:<22}{a:>11.2f}s{b:>11.2f}s{a / b:>7.1f}x")
@@ -0,0 +1,67 @@
+# =========================
+# BENCHMARK · ROLLUP MENSUAL
+# =========================
+# Compara la tabla mensual de Compras/Gastos construida con el bucle
+# de 12 máscaras (versión anterior) frente a resumen_mensual (un solo
+# groupby). Uso: python bench/bench_resumen_mensual.py [filas ...]
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from oyken.mensual import resumen_mensual
+
+
+def generar_compras(filas, anios=5, semilla=0):
+    rng = np.random.default_rng(semilla)
+    inicio = pd.Timestamp(2026 - anios + 1, 1, 1)
+    dias = rng.integers(0, 365 * anios, filas)
+    return pd.DataFrame({
+        "Fecha": inicio + pd.to_timedelta(dias, unit="D"),
+        "Proveedor": rng.choice(["Makro", "Coca Cola", "Pescados Ruiz"], filas),
+        "Coste (€)": rng.uniform(5, 800, filas).round(2)
+    })
+
+
+def tabla_bucle(df, anio_sel):
+    df_filtrado = df[df["Fecha"].dt.year == anio_sel]
+    datos_meses = []
+    for mes in range(1, 13):
+        total_mes = df_filtrado[df_filtrado["Fecha"].dt.month == mes]["Coste (€)"].sum()
+        datos_meses.append({"Mes": mes, "Compras del mes (€)": round(total_mes, 2)})
+    return pd.DataFrame(datos_meses)
+
+
+def cronometrar(funcion, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - t0)
+    return min(tiempos) * 1000
+
+
+if __name__ == "__main__":
+    tamanos = [int(x) for x in sys.argv[1:]] or [100_000, 250_000, 1_000_000]
+
+    print(f"{'filas':>10} {'bucle 1 año':>12} {'groupby 1 año':>14} {'bucle 5 años':>13} {'groupby 5 años':>15}")
+    for filas in tamanos:
+        df = generar_compras(filas)
+        anios = sorted(df["Fecha"].dt.year.unique())
+
+        # Comprobación de equivalencia antes de medir
+        esperado = tabla_bucle(df, anios[-1])["Compras del mes (€)"].to_numpy()
+        obtenido = resumen_mensual(df, "Fecha", "Coste (€)", anios=[anios[-1]])["Coste (€)"].round(2).to_numpy()
+        assert np.allclose(esperado, obtenido)
+
+        t_bucle = cronometrar(lambda: tabla_bucle(df, anios[-1]))
+        t_group = cronometrar(lambda: resumen_mensual(df, "Fecha", "Coste (€)", anios=[anios[-1]]))
+        t_bucle_n = cronometrar(lambda: [tabla_bucle(df, a) for a in anios], 3)
+        t_group_n = cronometrar(lambda: resumen_mensual(df, "Fecha", "Coste (€)"), 3)
+
+        print(f"{filas:>10,} {t_bucle:>10.1f}ms {t_group:>12.1f}ms {t_bucle_n:>11.1f}ms {t_group_n:>13.1f}ms")
@@ -0,0 +1,84 @@
+# =========================
+# STRESS · ESCRITORES CONCURRENTES
+# =========================
+# Lanza cientos de procesos que escriben a la vez en los mismos
+# archivos (altas en compras.csv, ventas en el diario, compactaciones
+# y upserts mensuales en oyken.db) y comprueba que no se pierde ningún
+# registro ni queda ningún archivo a medias.
+# Uso: python bench/stress_concurrencia.py [escritores] [altas_por_escritor]
+
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from oyken.consolidacion import COMPRAS_MENSUALES_FILE
+from oyken.mensual import guardar_mensual, leer_mensual
+from oyken.persistencia import anadir_filas
+from oyken.ventas import cargar_ventas, compactar_ventas, registrar_venta
+
+
+def escritor(args):
+    directorio, n, altas = args
+    directorio = Path(directorio)
+
+    for k in range(altas):
+        anadir_filas(directorio / "compras.csv", [{
+            "Fecha": "01/01/2026",
+            "Proveedor": f"P{n}",
+            "Familia": "Otros",
+            "Coste (€)": n * 1000 + k
+        }])
+
+        registrar_venta({
+            "fecha": pd.Timestamp("2000-01-01") + pd.Timedelta(days=n * altas + k),
+            "ventas_total_eur": 1.0
+        }, directorio=directorio)
+
+        guardar_mensual(COMPRAS_MENSUALES_FILE, pd.DataFrame([{
+            "anio": 2000 + n, "mes": k % 12 + 1, "compras_total_eur": float(n)
+        }]), directorio)
+
+        if k % 2 == 0:
+            compactar_ventas(directorio)
+
+    return n
+
+
+if __name__ == "__main__":
+    escritores = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    altas = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    directorio = Path(tempfile.mkdtemp(prefix="oyken_stress_"))
+    t0 = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=min(escritores, 64)) as pool:
+        list(pool.map(escritor, [(str(directorio), n, altas) for n in range(escritores)]))
+
+    compactar_ventas(directorio)
+    segundos = time.perf_counter() - t0
+
+    compras = pd.read_csv(directorio / "compras.csv")
+    ventas = cargar_ventas(directorio=directorio)
+    mensual = leer_mensual(COMPRAS_MENSUALES_FILE, directorio)
+    esperado = escritores * altas
+    esperado_mensual = len({(n, k % 12) for n in range(escritores) for k in range(altas)})
+
+    print(f"Escritores: {escritores} · altas por escritor: {altas} · {segundos:.1f} s")
+    print(f"compras.csv            {len(compras):>6} / {esperado}")
+    print(f"ventas (diario+base)   {len(ventas):>6} / {esperado}")
+    print(f"compras_mensuales      {len(mensual):>6} / {esperado_mensual}")
+
+    ok = (
+        len(compras) == esperado
+        and compras["Coste (€)"].nunique() == esperado
+        and len(ventas) == esperado
+        and len(mensual) == esperado_mensual
+    )
+    print("OK: ningún registro perdido" if ok else "ERROR: se han perdido registros")
+    sys.exit(0 if ok else 1)
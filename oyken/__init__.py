@@ -0,0 +1,5 @@
+# =========================
+# OYKEN · núcleo de datos
+# =========================
+# Lógica compartida por las páginas de Streamlit (persistencia,
+# consolidaciones y cálculos). No depende de Streamlit.
@@ -0,0 +1,122 @@
+import sys
+import time
+import traceback
+from pathlib import Path
+
+from oyken.consolidacion import CONSOLIDACIONES, consolidar_grupo
+from oyken.ebitda import EBITDA_FILE, actualizar_ebitda
+from oyken.grupo import GRUPO_FILE, escribir_grupo
+from oyken.locales import directorios_locales, listar_locales, raiz_datos
+
+# =========================
+# CLI · RECONSTRUCCIÓN EN LOTE
+# =========================
+# Recalcula todos los derivados de uno o varios directorios de datos
+# (un restaurante cada uno), todos los años, sin Streamlit:
+#   python -m oyken rebuild [directorio ...]
+# Sin directorios, todos los locales de la raíz de datos (OYKEN_DATOS),
+# y con particiones también el consolidado de grupo. Por directorio se
+# informa del tiempo de cada etapa; al final, el total por etapa del
+# lote. Un directorio que falla no detiene el resto.
+#
+# Consolidado de grupo incremental, un proceso por local; se salta los
+# locales cuyos brutos no han cambiado desde su última pasada:
+#   python -m oyken grupo [--procesos N]
+
+USO = "Uso: python -m oyken rebuild [directorio ...] | python -m oyken grupo [--procesos N]"
+
+
+def _ebitda(directorio):
+    # Tabla de hechos completa, sin reutilizar el estado de fuentes
+    actualizar_ebitda(directorio, forzar=True)
+    return True
+
+
+# Orden de ejecución: EBITDA lee todas las salidas anteriores
+ETAPAS = {**CONSOLIDACIONES, EBITDA_FILE: _ebitda}
+
+
+def reconstruir(directorio=Path(".")):
+    # [(etapa, segundos, reescrito)]
+    tiempos = []
+    for etapa, funcion in ETAPAS.items():
+        t0 = time.perf_counter()
+        cambiado = bool(funcion(directorio))
+        tiempos.append((etapa, time.perf_counter() - t0, cambiado))
+    return tiempos
+
+
+def rebuild(directorios):
+    ancho = max(len(e) for e in ETAPAS)
+    acumulado = dict.fromkeys(ETAPAS, 0.0)
+    fallidos = []
+    t_lote = time.perf_counter()
+
+    for directorio in directorios:
+        print(directorio)
+        try:
+            tiempos = reconstruir(directorio)
+        except Exception:
+            fallidos.append(directorio)
+            print(traceback.format_exc(), file=sys.stderr)
+            continue
+
+        for etapa, segundos, cambiado in tiempos:
+            acumulado[etapa] += segundos
+            print(f"  {etapa:<{ancho}}  {segundos:7.3f}s  {'reescrito' if cambiado else 'sin cambios'}")
+        print(f"  {'total':<{ancho}}  {sum(s for _, s, _ in tiempos):7.3f}s")
+
+    if len(directorios) > 1:
+        print(f"\nLote: {len(directorios) - len(fallidos)}/{len(directorios)} directorios")
+        for etapa, segundos in acumulado.items():
+            print(f"  {etapa:<{ancho}}  {segundos:7.3f}s")
+        print(f"  {'total':<{ancho}}  {time.perf_counter() - t_lote:7.3f}s")
+
+    for directorio in fallidos:
+        print(f"ERROR en {directorio}", file=sys.stderr)
+
+    return not fallidos
+
+
+def grupo(procesos=None):
+    raiz = raiz_datos()
+    if not listar_locales(raiz):
+        print("Sin particiones por local: no hay consolidado de grupo")
+        return True
+
+    t0 = time.perf_counter()
+    tabla = consolidar_grupo(raiz, procesos)
+    print(
+        f"{tabla['local'].nunique()} locales · {len(tabla):,} filas → "
+        f"{raiz / GRUPO_FILE} ({time.perf_counter() - t0:.2f}s)"
+    )
+    return True
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if args[:1] == ["grupo"]:
+        if len(args) not in (1, 3) or (len(args) == 3 and args[1] != "--procesos"):
+            print(USO)
+            sys.exit(1)
+        sys.exit(0 if grupo(int(args[2]) if len(args) == 3 else None) else 1)
+
+    if args[:1] != ["rebuild"]:
+        print(USO)
+        sys.exit(1)
+
+    directorios = [Path(d) for d in args[1:]] or directorios_locales()
+    no_existen = [d for d in directorios if not d.is_dir()]
+    if no_existen:
+        print(f"No es un directorio: {', '.join(map(str, no_existen))}")
+        sys.exit(1)
+
+    correcto = rebuild(directorios)
+
+    # Lote completo de una instalación con locales: se reúne el grupo
+    if not args[1:] and listar_locales():
+        escribir_grupo(raiz_datos())
+        print(f"Consolidado de grupo → {raiz_datos() / GRUPO_FILE}")
+
+    sys.exit(0 if correcto else 1)
@@ -0,0 +1,146 @@
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from oyken.calendario import FESTIVOS_FILE
+from oyken.compras import COMPRAS_FILE, cubo_compras
+from oyken.grupo import GRUPO_FILE, leer_grupo
+from oyken.locales import directorio_local, listar_locales, raiz_datos
+from oyken.persistencia import version
+from oyken.tendencias import leer_indicadores
+from oyken.tickets import firma_tickets, ventas_por_franja
+from oyken.ventas import cargar_ventas, compactar_si_conviene, enriquecer_ventas, firma_ventas
+
+# =========================
+# CACHÉ COMPARTIDA (STREAMLIT)
+# =========================
+# Las páginas piden los datos aquí. La clave incluye la firma
+# (mtime, tamaño) de los archivos: mientras no cambien, un clic en
+# cualquier widget no vuelve a leer ni a parsear nada.
+#
+# El directorio del local forma parte de la clave: cada partición
+# tiene sus propias entradas. max_entries acota la memoria a los
+# MAX_LOCALES_ACTIVOS locales usados más recientemente y TTL_CACHE
+# libera los que dejan de consultarse.
+
+MAX_LOCALES_ACTIVOS = 8
+TTL_CACHE = 3600  # segundos
+
+
+# =========================
+# LOCAL ACTIVO (COMPARTIDO POR TODAS LAS PÁGINAS)
+# =========================
+def _fijar_local():
+    st.session_state.local_activo = st.session_state._selector_local
+
+
+def local_activo():
+    # Selector en la barra lateral y directorio de datos del local
+    # elegido. La elección vive en session_state (no en la clave del
+    # widget, que Streamlit descarta al cambiar de página).
+    locales = listar_locales()
+    if not locales:
+        directorio = directorio_local()
+    else:
+        if st.session_state.get("local_activo") not in locales:
+            st.session_state.local_activo = locales[0]
+
+        st.sidebar.selectbox(
+            "Local",
+            locales,
+            index=locales.index(st.session_state.local_activo),
+            key="_selector_local",
+            on_change=_fijar_local
+        )
+        directorio = directorio_local(st.session_state.local_activo)
+
+    # La primera vez que la sesión abre un local se vuelca su diario
+    # de ventas pendiente (el resto de guardados solo lo hace si crece)
+    abiertos = st.session_state.setdefault("_locales_abiertos", set())
+    if str(directorio) not in abiertos:
+        abiertos.add(str(directorio))
+        compactar_si_conviene(directorio, al_abrir=True)
+
+    return directorio
+
+
+def _firma(directorio):
+    # Ventas + festivos locales: todo lo que cambia el resultado
+    return (firma_ventas(directorio), version(Path(directorio) / FESTIVOS_FILE))
+
+
+@st.cache_data(show_spinner=False, max_entries=MAX_LOCALES_ACTIVOS, ttl=TTL_CACHE)
+def _ventas_enriquecidas(firma, directorio):
+    directorio = Path(directorio)
+    return enriquecer_ventas(cargar_ventas(directorio=directorio), directorio)
+
+
+def ventas_enriquecidas(directorio=Path(".")):
+    # Ventas diarias + columnas de la dimensión calendario + tickets_total,
+    # ticket_medio
+    firma = _firma(directorio)
+    return _ventas_enriquecidas(firma, str(directorio))
+
+
+@st.cache_data(show_spinner=False, max_entries=4 * MAX_LOCALES_ACTIVOS, ttl=TTL_CACHE)
+def _venta_del_dia(firma, directorio, fecha):
+    df = _ventas_enriquecidas(firma, directorio)
+    fila = df[df["fecha"].dt.normalize() == fecha]
+    return None if fila.empty else fila.iloc[-1].to_dict()
+
+
+def venta_del_dia(fecha, directorio=Path(".")):
+    # Fila de un solo día como dict (None si no hay venta). Lo que
+    # queda en caché es la fila, no el histórico: HOY y su comparable
+    # se sirven sin copiar el DataFrame completo en cada rerun.
+    firma = _firma(directorio)
+    return _venta_del_dia(firma, str(directorio), pd.Timestamp(fecha).normalize())
+
+
+@st.cache_data(show_spinner=False, max_entries=MAX_LOCALES_ACTIVOS, ttl=TTL_CACHE)
+def _tendencias(firma, directorio):
+    return leer_indicadores(Path(directorio))
+
+
+def tendencias(directorio=Path(".")):
+    # Tabla precalculada de indicadores de Tendencias (todo el histórico)
+    firma = _firma(directorio)
+    return _tendencias(firma, str(directorio))
+
+
+@st.cache_data(show_spinner=False, max_entries=4 * MAX_LOCALES_ACTIVOS, ttl=TTL_CACHE)
+def _franjas(firma, directorio, desde, hasta, minutos):
+    return ventas_por_franja(Path(directorio), desde, hasta, minutos)
+
+
+def franjas(directorio=Path("."), desde=None, hasta=None, minutos=60):
+    # Ventas por (día, franja horaria) desde el almacén de tickets. Por
+    # debajo, oyken.tickets guarda el agregado de cada partición: un
+    # periodo o tramo nuevo solo agrega los meses que faltan.
+    firma = firma_tickets(directorio)
+    return _franjas(firma, str(directorio), desde, hasta, minutos)
+
+
+@st.cache_data(show_spinner=False, max_entries=MAX_LOCALES_ACTIVOS, ttl=TTL_CACHE)
+def _cubo(firma, directorio):
+    return cubo_compras(Path(directorio))
+
+
+def cubo(directorio=Path(".")):
+    # Cubo de gasto anio × mes × proveedor × familia. Las altas y bajas
+    # ya lo mantienen al día; aquí solo se relee cuando cambia compras.csv.
+    firma = version(Path(directorio) / COMPRAS_FILE)
+    return _cubo(firma, str(directorio))
+
+
+@st.cache_data(show_spinner=False, max_entries=1, ttl=TTL_CACHE)
+def _grupo(firma, raiz):
+    return leer_grupo(Path(raiz))
+
+
+def grupo(raiz=None):
+    # Tabla local × mes de todos los locales, tal como la dejó el
+    # worker (python -m oyken grupo / vigilancia); aquí solo se lee
+    raiz = Path(raiz or raiz_datos())
+    return _grupo(version(raiz / GRUPO_FILE), str(raiz))
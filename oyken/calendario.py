@@ -0,0 +1,203 @@
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+from oyken.persistencia import bloqueo, escribir_atomico
+
+# =========================
+# NOMBRES EN ESPAÑOL (NO LOCALE)
+# =========================
+MESES_ES = {
+    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril",
+    5: "Mayo", 6: "Junio", 7: "Julio", 8: "Agosto",
+    9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
+}
+
+MESES = list(MESES_ES.values())
+
+DOW_ES = {
+    0: "Lunes", 1: "Martes", 2: "Miércoles",
+    3: "Jueves", 4: "Viernes", 5: "Sábado", 6: "Domingo"
+}
+
+CUATRIMESTRES = ["Ene–Abr", "May–Ago", "Sep–Dic"]
+
+# =========================
+# COMPARABLES DOW (ISO)
+# =========================
+# El comparable de una fecha es el mismo día de la semana de la misma
+# semana ISO, N años ISO antes (regla de las grandes cadenas). Se
+# calcula en bloque para toda una serie de fechas y se usa como clave
+# de cruce: todos los comparables de un mes, trimestre o año salen de
+# un único merge.
+
+
+def _lunes_semana_1(anios):
+    # Lunes de la semana ISO 1: la semana que contiene el 4 de enero
+    cuatro_enero = pd.to_datetime(pd.DataFrame({"year": anios, "month": 1, "day": 4}))
+    return cuatro_enero - pd.to_timedelta(cuatro_enero.dt.weekday, unit="D")
+
+
+def _semanas_iso(anios):
+    # 52 o 53: el 28 de diciembre siempre cae en la última semana ISO
+    dic_28 = pd.to_datetime(pd.DataFrame({"year": anios, "month": 12, "day": 28}))
+    return dic_28.dt.isocalendar().week.astype(int)
+
+
+def fecha_comparable(fechas, anios=1):
+    # Serie de fechas -> misma (semana ISO, weekday) en iso_year - anios.
+    # La semana 53 cae en la 52 si el año de referencia no la tiene.
+    fechas = pd.to_datetime(pd.Series(fechas)).dt.normalize()
+    iso = fechas.dt.isocalendar()
+
+    anio_ref = iso.year.astype(int) - anios
+    semana = iso.week.astype(int).clip(upper=_semanas_iso(anio_ref).to_numpy())
+
+    return (
+        _lunes_semana_1(anio_ref.to_numpy()).to_numpy()
+        + pd.to_timedelta((semana - 1) * 7 + fechas.dt.weekday, unit="D").to_numpy()
+    )
+
+
+def con_comparables(df, historico=None, anios=1, columnas=None, sufijo="_comp"):
+    # Añade a df su fecha comparable y las columnas del histórico en esa
+    # fecha (con sufijo). Sin comparable, las columnas quedan a NaN.
+    historico = df if historico is None else historico
+    columnas = columnas or [c for c in historico.columns if c != "fecha"]
+
+    df = df.copy()
+    # La dimensión calendario ya trae fecha_comp (un año): se reutiliza
+    if anios != 1 or f"fecha{sufijo}" not in df.columns:
+        df[f"fecha{sufijo}"] = fecha_comparable(df["fecha"], anios)
+
+    ref = (
+        historico[["fecha", *columnas]]
+        .assign(fecha=lambda d: d["fecha"].dt.normalize())
+        .drop_duplicates("fecha", keep="last")
+        .rename(columns={"fecha": f"fecha{sufijo}", **{c: f"{c}{sufijo}" for c in columnas}})
+    )
+
+    ref[f"fecha{sufijo}"] = ref[f"fecha{sufijo}"].astype(df[f"fecha{sufijo}"].dtype)
+    return df.merge(ref, on=f"fecha{sufijo}", how="left")
+
+
+# =========================
+# DIMENSIÓN CALENDARIO
+# =========================
+# Una fila por fecha con todo lo que las páginas temporales derivaban
+# en cada render: campos ISO, nombres en español, cuatrimestre, fecha
+# comparable DOW del año anterior y festivo. Se genera una vez en
+# calendario.parquet y se cruza por fecha; solo se regenera si se pide
+# un rango que no cubre o si cambia festivos.csv (festivos locales,
+# columna "fecha", que se suman a los nacionales). El hash del
+# festivos.csv con el que se generó va en los metadatos del parquet:
+# cualquier diferencia (edición, copia con mtime antiguo, borrado)
+# lo regenera.
+
+CALENDARIO_FILE = "calendario.parquet"
+FESTIVOS_FILE = "festivos.csv"
+
+# Festivos nacionales de fecha fija (mes, día)
+FESTIVOS_NACIONALES = [
+    (1, 1), (1, 6), (5, 1), (8, 15), (10, 12),
+    (11, 1), (12, 6), (12, 8), (12, 25)
+]
+
+COLUMNAS_CALENDARIO = [
+    "fecha", "anio", "mes", "mes_es", "cuatrimestre",
+    "iso_year", "iso_week", "weekday", "dow_es",
+    "fecha_comp", "festivo"
+]
+
+
+def _domingo_pascua(anio):
+    # Algoritmo anónimo gregoriano (Meeus/Jones/Butcher)
+    a, b, c = anio % 19, anio // 100, anio % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes = (h + l - 7 * m + 114) // 31
+    dia = (h + l - 7 * m + 114) % 31 + 1
+    return pd.Timestamp(anio, mes, dia)
+
+
+def firma_festivos(directorio=Path(".")):
+    # sha256 de festivos.csv ("" si no hay festivos locales)
+    locales = Path(directorio) / FESTIVOS_FILE
+    return hashlib.sha256(locales.read_bytes()).hexdigest() if locales.exists() else ""
+
+
+def festivos(anios, directorio=Path(".")):
+    fechas = [pd.Timestamp(a, m, d) for a in anios for m, d in FESTIVOS_NACIONALES]
+    fechas += [_domingo_pascua(a) - pd.Timedelta(days=2) for a in anios]  # Viernes Santo
+
+    locales = Path(directorio) / FESTIVOS_FILE
+    if locales.exists():
+        extra = pd.to_datetime(pd.read_csv(locales)["fecha"], errors="coerce").dropna()
+        fechas += list(extra.dt.normalize())
+
+    return pd.DatetimeIndex(fechas).unique()
+
+
+def generar_calendario(desde, hasta, directorio=Path(".")):
+    fechas = pd.Series(pd.date_range(pd.Timestamp(desde).normalize(), pd.Timestamp(hasta).normalize()))
+    iso = fechas.dt.isocalendar()
+
+    cal = pd.DataFrame({
+        "fecha": fechas,
+        "anio": fechas.dt.year,
+        "mes": fechas.dt.month,
+        "iso_year": iso.year.astype(int).to_numpy(),
+        "iso_week": iso.week.astype(int).to_numpy(),
+        "weekday": fechas.dt.weekday,
+    })
+    cal["mes_es"] = cal["mes"].map(MESES_ES)
+    cal["cuatrimestre"] = pd.Categorical.from_codes((cal["mes"] - 1) // 4, CUATRIMESTRES)
+    cal["dow_es"] = cal["weekday"].map(DOW_ES)
+    cal["fecha_comp"] = fecha_comparable(fechas)
+    cal["festivo"] = fechas.isin(festivos(range(fechas.dt.year.min(), fechas.dt.year.max() + 1), directorio))
+
+    cal = cal[COLUMNAS_CALENDARIO]
+    cal.attrs["festivos"] = firma_festivos(directorio)
+    return cal
+
+
+def calendario(desde, hasta, directorio=Path(".")):
+    # Dimensión que cubre al menos [desde, hasta], leída del archivo si
+    # ya lo cubre. Se amplía por años completos para no regenerar a diario.
+    directorio = Path(directorio)
+    ruta = directorio / CALENDARIO_FILE
+    desde, hasta = pd.Timestamp(desde).normalize(), pd.Timestamp(hasta).normalize()
+
+    with bloqueo(ruta):
+        inicio, fin = desde, hasta
+        if ruta.exists():
+            cal = pd.read_parquet(ruta)
+            festivos_cambiados = cal.attrs.get("festivos") != firma_festivos(directorio)
+
+            if not festivos_cambiados and cal["fecha"].min() <= desde and cal["fecha"].max() >= hasta:
+                return cal[cal["fecha"].between(desde, hasta)].reset_index(drop=True)
+
+            inicio, fin = min(desde, cal["fecha"].min()), max(hasta, cal["fecha"].max())
+
+        cal = generar_calendario(pd.Timestamp(inicio.year, 1, 1), pd.Timestamp(fin.year, 12, 31), directorio)
+        escribir_atomico(ruta, lambda tmp: cal.to_parquet(tmp, index=False))
+
+    return cal[cal["fecha"].between(desde, hasta)].reset_index(drop=True)
+
+
+def con_calendario(df, directorio=Path("."), col_fecha="fecha"):
+    # Añade las columnas de la dimensión a un DataFrame con fechas
+    fechas = df[col_fecha].dropna()
+    if fechas.empty:
+        return df.assign(**{c: pd.Series(dtype=object) for c in COLUMNAS_CALENDARIO if c != "fecha"})
+
+    cal = calendario(fechas.min(), fechas.max(), directorio).rename(columns={"fecha": "_dia"})
+    df = df.drop(columns=[c for c in COLUMNAS_CALENDARIO if c != "fecha" and c in df.columns])
+    df = df.assign(_dia=df[col_fecha].dt.normalize().astype(cal["_dia"].dtype))
+
+    return df.merge(cal, on="_dia", how="left").drop(columns="_dia")
@@ -0,0 +1,225 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from oyken.persistencia import bloqueo, escribir_atomico, modificar_csv, version
+
+# =========================
+# COMPRAS
+# =========================
+# compras.csv: una línea por compra (Fecha dd/mm/AAAA, Proveedor,
+# Familia, Coste). El proveedor se escribe tal como figura en el
+# maestro (oyken.proveedores).
+#
+# Cubo de gasto: compras_cubo.parquet con el coste y el nº de líneas
+# por (anio, mes, proveedor, familia). Las altas y bajas
+# (anadir_compras, borrar_compras) le suman o restan solo sus propias
+# líneas; compras_cubo.version.json guarda la versión de compras.csv
+# que refleja. Si no coincide (otra sesión escribió en medio, edición
+# a mano), el cubo se rehace entero desde compras.csv.
+
+COMPRAS_FILE = "compras.csv"
+CUBO_FILE = "compras_cubo.parquet"
+CUBO_VERSION_FILE = "compras_cubo.version.json"
+
+COLUMNAS_COMPRAS = ["Fecha", "Proveedor", "Familia", "Coste (€)"]
+
+FAMILIAS = ["Materia prima", "Bebidas", "Limpieza", "Otros"]
+
+DIMENSIONES_CUBO = ["anio", "mes", "proveedor", "familia"]
+COLUMNAS_CUBO = [*DIMENSIONES_CUBO, "coste_eur", "lineas"]
+
+
+# =========================
+# CUBO: CONSTRUCCIÓN
+# =========================
+def agregar_cubo(df):
+    # Líneas de compras.csv -> celdas del cubo. Un compras.csv antiguo
+    # sin Proveedor o Familia cuenta como proveedor vacío / "Otros".
+    fecha = pd.to_datetime(df["Fecha"], dayfirst=True, errors="coerce")
+    validas = fecha.notna()
+
+    def columna(nombre, defecto):
+        if nombre not in df.columns:
+            return pd.Series(defecto, index=df.index)
+        return df[nombre].fillna(defecto).astype(str)
+
+    celdas = pd.DataFrame({
+        "anio": fecha.dt.year,
+        "mes": fecha.dt.month,
+        "proveedor": columna("Proveedor", ""),
+        "familia": columna("Familia", "Otros"),
+        "coste_eur": pd.to_numeric(df["Coste (€)"], errors="coerce").fillna(0),
+        "lineas": 1,
+    })[validas]
+
+    celdas = celdas.astype({"anio": int, "mes": int})
+    return celdas.groupby(DIMENSIONES_CUBO, as_index=False).sum()[COLUMNAS_CUBO]
+
+
+def _sumar(cubo, delta, signo):
+    delta = delta.assign(coste_eur=signo * delta["coste_eur"], lineas=signo * delta["lineas"])
+    total = pd.concat([cubo, delta], ignore_index=True).groupby(DIMENSIONES_CUBO, as_index=False).sum()
+    total["coste_eur"] = total["coste_eur"].round(2)
+    return total[total["lineas"] != 0].reset_index(drop=True)
+
+
+def _leer_version_cubo(directorio):
+    ruta = directorio / CUBO_VERSION_FILE
+    if not ruta.exists() or not (directorio / CUBO_FILE).exists():
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _guardar_cubo(directorio, cubo, version_compras):
+    escribir_atomico(directorio / CUBO_FILE, lambda tmp: cubo.to_parquet(tmp, index=False))
+
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(version_compras, f)
+
+    # La versión va después: si se corta entre medias, no coincide y
+    # la siguiente lectura rehace el cubo
+    escribir_atomico(directorio / CUBO_VERSION_FILE, escribir)
+
+
+def _rehacer_cubo(directorio):
+    ruta = directorio / COMPRAS_FILE
+    with bloqueo(ruta):
+        compras = pd.read_csv(ruta) if ruta.exists() else pd.DataFrame(columns=COLUMNAS_COMPRAS)
+        version_compras = version(ruta)
+
+    cubo = agregar_cubo(compras)
+    cubo["coste_eur"] = cubo["coste_eur"].round(2)
+    _guardar_cubo(directorio, cubo, list(version_compras or []))
+    return cubo
+
+
+def _aplicar(directorio, delta, signo, version_previa, version_nueva):
+    # Suma el delta si el cubo estaba en version_previa; si no, lo rehace
+    directorio = Path(directorio)
+    with bloqueo(directorio / CUBO_FILE):
+        if _leer_version_cubo(directorio) == list(version_previa or []):
+            cubo = _sumar(pd.read_parquet(directorio / CUBO_FILE), delta, signo)
+            _guardar_cubo(directorio, cubo, list(version_nueva))
+        else:
+            _rehacer_cubo(directorio)
+
+
+def actualizar_cubo(directorio=Path(".")):
+    # Rehace el cubo si no refleja la versión actual de compras.csv.
+    # True si lo ha reescrito (paso de la consolidación).
+    directorio = Path(directorio)
+    if not (directorio / COMPRAS_FILE).exists():
+        return False
+
+    with bloqueo(directorio / CUBO_FILE):
+        if _leer_version_cubo(directorio) == list(version(directorio / COMPRAS_FILE)):
+            return False
+        _rehacer_cubo(directorio)
+        return True
+
+
+def cubo_compras(directorio=Path(".")):
+    directorio = Path(directorio)
+    actualizar_cubo(directorio)
+    ruta = directorio / CUBO_FILE
+    if not ruta.exists():
+        return pd.DataFrame(columns=COLUMNAS_CUBO)
+    return pd.read_parquet(ruta)
+
+
+# =========================
+# ALTAS Y BAJAS
+# =========================
+def anadir_compras(lineas, directorio=Path(".")):
+    # Añade las líneas a compras.csv (bajo cerrojo, sobre el archivo
+    # actual) y las suma al cubo. Devuelve (df, versión).
+    ruta = Path(directorio) / COMPRAS_FILE
+    nuevas = pd.DataFrame(lineas, columns=COLUMNAS_COMPRAS)
+    previa = {}
+
+    def anadir(df):
+        previa["version"] = version(ruta)
+        return nuevas if df.empty else pd.concat([df, nuevas], ignore_index=True)
+
+    df, version_nueva = modificar_csv(ruta, anadir, COLUMNAS_COMPRAS)
+    _aplicar(directorio, agregar_cubo(nuevas), 1, previa["version"], version_nueva)
+    return df, version_nueva
+
+
+def borrar_compras(indices, directorio=Path("."), version_esperada=False):
+    # Borra filas de compras.csv y las resta del cubo. Con
+    # version_esperada, lanza ConflictoVersion si el archivo ha cambiado.
+    ruta = Path(directorio) / COMPRAS_FILE
+    previa = {}
+
+    def borrar(df):
+        previa["version"] = version(ruta)
+        previa["borradas"] = df.loc[indices]
+        return df.drop(indices).reset_index(drop=True)
+
+    df, version_nueva = modificar_csv(ruta, borrar, COLUMNAS_COMPRAS, version_esperada)
+    _aplicar(directorio, agregar_cubo(previa["borradas"]), -1, previa["version"], version_nueva)
+    return df, version_nueva
+
+
+# =========================
+# CUBO: CONSULTAS
+# =========================
+def cortar_cubo(cubo, anio, mes=0):
+    # mes=0: todo el año
+    corte = cubo[cubo["anio"] == anio]
+    return corte if mes == 0 else corte[corte["mes"] == mes]
+
+
+def top_proveedores(cubo, anio, mes=0, n=10):
+    # Los n proveedores con más gasto, con su peso y el peso acumulado
+    # (concentración) sobre el total del periodo
+    por_proveedor = (
+        cortar_cubo(cubo, anio, mes)
+        .groupby("proveedor", as_index=False)[["coste_eur", "lineas"]]
+        .sum()
+        .sort_values("coste_eur", ascending=False)
+    )
+    total = por_proveedor["coste_eur"].sum()
+    por_proveedor["peso_pct"] = (por_proveedor["coste_eur"] / total * 100) if total else 0.0
+    por_proveedor["acumulado_pct"] = por_proveedor["peso_pct"].cumsum()
+    return por_proveedor.head(n).reset_index(drop=True)
+
+
+def peso_familias(cubo, anio, mes=0):
+    # Gasto y peso de cada familia (todas las FAMILIAS, aunque sean 0)
+    por_familia = (
+        cortar_cubo(cubo, anio, mes)
+        .groupby("familia")["coste_eur"]
+        .sum()
+    )
+    orden = FAMILIAS + sorted(set(por_familia.index) - set(FAMILIAS))
+    por_familia = por_familia.reindex(orden, fill_value=0).rename_axis("familia").reset_index()
+    total = por_familia["coste_eur"].sum()
+    por_familia["peso_pct"] = (por_familia["coste_eur"] / total * 100) if total else 0.0
+    return por_familia
+
+
+def variacion_mensual(cubo, anio, mes, dimension="proveedor"):
+    # Gasto del mes frente al mes anterior (enero compara con diciembre
+    # del año previo), por proveedor o por familia
+    anio_previo, mes_previo = (anio - 1, 12) if mes == 1 else (anio, mes - 1)
+
+    actual = cortar_cubo(cubo, anio, mes).groupby(dimension)["coste_eur"].sum()
+    anterior = cortar_cubo(cubo, anio_previo, mes_previo).groupby(dimension)["coste_eur"].sum()
+
+    tabla = pd.DataFrame({"actual_eur": actual, "anterior_eur": anterior}).fillna(0)
+    tabla["variacion_eur"] = (tabla["actual_eur"] - tabla["anterior_eur"]).round(2)
+    tabla["variacion_pct"] = (
+        tabla["variacion_eur"] / tabla["anterior_eur"].where(tabla["anterior_eur"] != 0) * 100
+    )
+    return (
+        tabla.rename_axis(dimension)
+        .reset_index()
+        .sort_values("variacion_eur", key=abs, ascending=False)
+        .reset_index(drop=True)
+    )
@@ -0,0 +1,421 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from oyken import db
+from oyken.compras import CUBO_FILE, actualizar_cubo
+from oyken.ebitda import actualizar_ebitda
+from oyken.grupo import escribir_grupo
+from oyken.locales import directorio_local, directorios_locales, listar_locales, raiz_datos
+from oyken.mensual import (
+    VENTAS_MENSUALES_FILE,
+    consolidar_ventas_mensuales,
+    leer_mensual,
+    leer_ventas_mensuales,
+    resumen_mensual,
+    version_mensual
+)
+from oyken.persistencia import cerrojo_hilo, escribir_atomico, leer_csv, version
+from oyken.rrhh import nomina_mensual
+from oyken.ventas import cargar_ventas, firma_ventas
+
+# =========================
+# CONSOLIDACIÓN CANÓNICA (WORKER)
+# =========================
+# Reconstruye en una sola pasada todas las tablas mensuales canónicas
+# (oyken.db) a partir de los registros brutos, para todos los años:
+#   ventas_mensuales.csv   <- almacén de ventas diarias
+#   compras_mensuales.csv  <- compras.csv
+#   gastos_mensuales.csv   <- gastos.csv
+#   rrhh_mensual.csv       <- rrhh_puestos.csv
+#   coste_producto.csv     <- compras / ventas (mes 0 = año completo)
+#   inventario_mensual.csv <- variación entre cierres de inventario
+#   compras_cubo.parquet   <- compras.csv (solo si el cubo está desfasado)
+# Las páginas solo leen estas salidas. De cada una solo se escriben los
+# (anio, mes) que cambian, conservando fecha_actualizacion en el resto
+# (EBITDA no relee lo que no ha cambiado).
+#   python -m oyken.consolidacion [raiz]            una pasada
+#   python -m oyken.consolidacion --vigilar [raiz]  vigila los brutos
+# Con particiones (oyken.locales) se recorren todos los locales y,
+# además, se pone al día la tabla EBITDA de cada uno y el consolidado
+# de grupo (grupo_mensual.parquet) que lee la página de Grupo.
+
+COMPRAS_FILE = "compras.csv"
+GASTOS_FILE = "gastos.csv"
+PUESTOS_FILE = "rrhh_puestos.csv"
+INVENTARIO_FILE = "inventario_mensual.csv"  # cierres (bruto) + variación, en oyken.db
+
+COMPRAS_MENSUALES_FILE = "compras_mensuales.csv"
+GASTOS_MENSUALES_FILE = "gastos_mensuales.csv"
+RRHH_MENSUAL_FILE = "rrhh_mensual.csv"
+COSTE_PRODUCTO_FILE = "coste_producto.csv"
+
+INTERVALO_VIGILANCIA = 2.0  # segundos entre comprobaciones
+
+# Firma de los brutos con la que se hizo la última pasada de grupo del
+# local: si no ha cambiado, el consolidado de grupo se salta el local
+FIRMA_FILE = "consolidacion.firma.json"
+
+# Directorios con una pasada pedida mientras corría otra; _estado hace
+# atómicos "comprobar pendiente + soltar el cerrojo" y "no poder
+# tomarlo + marcar pendiente"
+_pendientes = set()
+_estado = threading.Lock()
+
+# {directorio: (versión de la tabla de inventario, resumen de sus cierres)}
+_cierres = {}
+
+
+# =========================
+# FIRMA DE LOS REGISTROS BRUTOS
+# =========================
+def firma_brutos(directorio=Path(".")):
+    # Cambia en cuanto se modifica cualquier registro de origen
+    directorio = Path(directorio)
+    return (
+        firma_ventas(directorio),
+        version(directorio / COMPRAS_FILE),
+        version(directorio / GASTOS_FILE),
+        version(directorio / PUESTOS_FILE),
+        _firma_inventario(directorio),
+    )
+
+
+def _firma_inventario(directorio):
+    # La tabla de inventario guarda cierres (bruto) y variación
+    # (derivada): solo cuentan los cierres, o la propia pasada que
+    # reescribe la variación cambiaría la firma. Por versión de la
+    # tabla se reutiliza el resumen de la lectura anterior.
+    actual = version_mensual(INVENTARIO_FILE, directorio)
+    if actual is None:
+        return None
+
+    clave = str(directorio.resolve())
+    previa = _cierres.get(clave)
+    if previa is not None and previa[0] == actual:
+        return previa[1]
+
+    cierres = leer_mensual(INVENTARIO_FILE, directorio)[["anio", "mes", "inventario_cierre_eur"]]
+    resumen = hashlib.sha256(cierres.to_csv(index=False).encode()).hexdigest()
+    _cierres[clave] = (actual, resumen)
+    return resumen
+
+
+# =========================
+# ESCRITURA SOLO DE LO CAMBIADO
+# =========================
+def _reescribir_mensual(nuevo, directorio, archivo, columna):
+    # nuevo: (anio, mes, columna) completo. Upsert de los meses que
+    # cambian y baja de los que ya no están. Devuelve True si ha escrito.
+    tabla = db.tabla_de(archivo)
+    nuevo = nuevo[["anio", "mes", columna]].astype({"anio": int, "mes": int})
+    nuevo[columna] = nuevo[columna].round(4)
+
+    with closing(db.conectar(directorio)) as con, db.transaccion(con):
+        hist = db.leer_mensual(con, tabla)
+
+        comparado = nuevo.merge(
+            hist[["anio", "mes", columna]],
+            on=["anio", "mes"],
+            how="left",
+            suffixes=("", "_hist")
+        )
+        cambiados = comparado[comparado[f"{columna}_hist"].round(4) != comparado[columna]]
+        retirados = hist.merge(nuevo[["anio", "mes"]], on=["anio", "mes"], how="left", indicator=True)
+        retirados = retirados[retirados["_merge"] == "left_only"]
+
+        if cambiados.empty and retirados.empty:
+            return False
+
+        if not cambiados.empty:
+            db.upsert(con, tabla, cambiados.assign(fecha_actualizacion=datetime.now()))
+        if not retirados.empty:
+            db.borrar(con, tabla, retirados)
+        return True
+
+
+def _registros_fechados(directorio, archivo):
+    # Fecha en dd/mm/aaaa (formulario) y coste numérico
+    df, _ = leer_csv(Path(directorio) / archivo, ["Fecha", "Coste (€)"])
+    df["Fecha"] = pd.to_datetime(df["Fecha"], dayfirst=True, errors="coerce")
+    df["Coste (€)"] = pd.to_numeric(df["Coste (€)"], errors="coerce").fillna(0)
+    return df
+
+
+# =========================
+# CONSOLIDACIONES POR ARCHIVO
+# =========================
+def consolidar_ventas(directorio=Path(".")):
+    if not firma_ventas(directorio):
+        return False
+
+    df_diario = cargar_ventas(["fecha", "ventas_total_eur"], directorio=directorio)
+    return consolidar_ventas_mensuales(df_diario, directorio=directorio)
+
+
+def _consolidar_coste(directorio, archivo, destino, columna):
+    directorio = Path(directorio)
+    if not (directorio / archivo).exists():
+        return False
+
+    resumen = resumen_mensual(_registros_fechados(directorio, archivo), "Fecha", "Coste (€)")
+    resumen[columna] = resumen["Coste (€)"].round(2)
+    return _reescribir_mensual(resumen, directorio, destino, columna)
+
+
+def consolidar_compras(directorio=Path(".")):
+    return _consolidar_coste(directorio, COMPRAS_FILE, COMPRAS_MENSUALES_FILE, "compras_total_eur")
+
+
+def consolidar_gastos(directorio=Path(".")):
+    return _consolidar_coste(directorio, GASTOS_FILE, GASTOS_MENSUALES_FILE, "gastos_total_eur")
+
+
+def consolidar_rrhh(directorio=Path(".")):
+    directorio = Path(directorio)
+    if not (directorio / PUESTOS_FILE).exists():
+        return False
+
+    df_puestos, _ = leer_csv(directorio / PUESTOS_FILE)
+    df_puestos = df_puestos.dropna(subset=["Año"])
+    nomina = nomina_mensual(df_puestos).rename(columns={"coste_empresa_eur": "rrhh_total_eur"})
+    return _reescribir_mensual(nomina, directorio, RRHH_MENSUAL_FILE, "rrhh_total_eur")
+
+
+def consolidar_coste_producto(directorio=Path(".")):
+    # Compras / ventas por mes y por año completo (mes 0), solo donde
+    # hay ventas. Se lee de las salidas canónicas ya consolidadas.
+    directorio = Path(directorio)
+    if any(version_mensual(a, directorio) is None for a in (COMPRAS_MENSUALES_FILE, VENTAS_MENSUALES_FILE)):
+        return False
+
+    compras = leer_mensual(COMPRAS_MENSUALES_FILE, directorio)
+    ventas = leer_ventas_mensuales(directorio)
+
+    mensual = compras[["anio", "mes", "compras_total_eur"]].merge(
+        ventas[["anio", "mes", "ventas_total_eur"]], on=["anio", "mes"], how="inner"
+    )
+    anual = (
+        mensual.groupby("anio", as_index=False)[["compras_total_eur", "ventas_total_eur"]]
+        .sum()
+        .assign(mes=0)
+    )
+    df = pd.concat([mensual, anual], ignore_index=True)
+    df = df[df["ventas_total_eur"] > 0]
+    df["coste_producto_pct"] = df["compras_total_eur"] / df["ventas_total_eur"]
+
+    return _reescribir_mensual(df, directorio, COSTE_PRODUCTO_FILE, "coste_producto_pct")
+
+
+def variacion_inventario(df_inv):
+    # Cierre menos el cierre registrado anterior; el primero a 0
+    df = df_inv.copy()
+    df["anio"] = pd.to_numeric(df["anio"], errors="coerce")
+    df["mes"] = pd.to_numeric(df["mes"], errors="coerce")
+    df["inventario_cierre_eur"] = pd.to_numeric(df["inventario_cierre_eur"], errors="coerce").fillna(0)
+    df = df.sort_values(["anio", "mes"])
+
+    df["variacion_inventario_eur"] = df["inventario_cierre_eur"].diff().fillna(0).round(2)
+    return df
+
+
+def consolidar_inventario(directorio=Path(".")):
+    # Misma tabla de entrada y salida: solo se escriben los meses cuya
+    # variación no cuadra con los cierres (altas fuera de orden, cambios).
+    if version_mensual(INVENTARIO_FILE, directorio) is None:
+        return False
+
+    tabla = db.tabla_de(INVENTARIO_FILE)
+    with closing(db.conectar(directorio)) as con, db.transaccion(con):
+        df_inv = db.leer_mensual(con, tabla)
+        if df_inv.empty:
+            return False
+
+        df = variacion_inventario(df_inv)
+        previa = df_inv["variacion_inventario_eur"].round(2)
+        cambiados = df[previa.reindex(df.index) != df["variacion_inventario_eur"]]
+        if cambiados.empty:
+            return False
+
+        db.upsert(con, tabla, cambiados)
+        return True
+
+
+# Orden de la pasada: coste de producto depende de ventas y compras
+CONSOLIDACIONES = {
+    VENTAS_MENSUALES_FILE: consolidar_ventas,
+    COMPRAS_MENSUALES_FILE: consolidar_compras,
+    GASTOS_MENSUALES_FILE: consolidar_gastos,
+    RRHH_MENSUAL_FILE: consolidar_rrhh,
+    COSTE_PRODUCTO_FILE: consolidar_coste_producto,
+    INVENTARIO_FILE: consolidar_inventario,
+    CUBO_FILE: actualizar_cubo,
+}
+
+
+def consolidar_todo(directorio=Path(".")):
+    # {archivo: True si se ha reescrito}
+    return {archivo: bool(consolidar(directorio)) for archivo, consolidar in CONSOLIDACIONES.items()}
+
+
+def consolidar_todo_en_segundo_plano(directorio=Path(".")):
+    # Para las páginas tras registrar o borrar un dato bruto: la pasada
+    # corre fuera del render. Si ya hay una en curso devuelve None y la
+    # petición queda pendiente: esa pasada se repite al terminar, así un
+    # cambio hecho a mitad de ella no se queda sin consolidar.
+    cerrojo = cerrojo_hilo("consolidacion", directorio)
+    clave = str(Path(directorio).resolve())
+    with _estado:
+        if not cerrojo.acquire(blocking=False):
+            _pendientes.add(clave)
+            return None
+
+    def consolidar():
+        try:
+            while True:
+                consolidar_todo(directorio)
+                with _estado:
+                    if clave not in _pendientes:
+                        cerrojo.release()
+                        return
+                    _pendientes.discard(clave)
+        except BaseException:
+            cerrojo.release()
+            raise
+
+    hilo = threading.Thread(target=consolidar, daemon=True)
+    hilo.start()
+    return hilo
+
+
+# =========================
+# CONSOLIDADO DE GRUPO
+# =========================
+def consolidar_local(directorio=Path(".")):
+    # Pasada de un local con particiones: mensuales canónicos y su
+    # tabla EBITDA, que es lo que reúne el consolidado de grupo
+    cambios = consolidar_todo(directorio)
+    actualizar_ebitda(directorio)
+    return cambios
+
+
+def _firma_guardada(directorio):
+    ruta = directorio / FIRMA_FILE
+    if not ruta.exists():
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _guardar_firma(directorio, firma):
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(firma, f)
+
+    escribir_atomico(directorio / FIRMA_FILE, escribir)
+
+
+def consolidar_local_si_cambia(directorio=Path(".")):
+    # Pasada del local solo si sus brutos han cambiado desde la última
+    # (None si se salta). La firma se toma antes de la pasada y se
+    # guarda al terminarla: un cambio durante ella entra en la próxima.
+    # Las tuplas pasan a listas, como quedan al releer el JSON.
+    directorio = Path(directorio)
+    firma = json.loads(json.dumps(firma_brutos(directorio)))
+    if firma == _firma_guardada(directorio):
+        return None
+
+    cambios = consolidar_local(directorio)
+    _guardar_firma(directorio, firma)
+    return cambios
+
+
+def consolidar_grupo(raiz=None, procesos=None):
+    # Consolida los locales cuyos brutos han cambiado y reescribe
+    # grupo_mensual.parquet. Los locales no comparten archivos: cada uno
+    # va a un proceso del pool sin cerrojos que se pisen. procesos=1,
+    # sin pool. Para rehacerlo todo, python -m oyken rebuild.
+    raiz = Path(raiz or raiz_datos())
+    directorios = [directorio_local(local, raiz) for local in listar_locales(raiz)]
+    procesos = procesos or min(len(directorios), os.cpu_count() or 1)
+
+    if procesos <= 1:
+        for directorio in directorios:
+            consolidar_local_si_cambia(directorio)
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            list(pool.map(consolidar_local_si_cambia, directorios))
+
+    return escribir_grupo(raiz)
+
+
+# =========================
+# MODO VIGILANCIA
+# =========================
+def vigilar(raiz=None, intervalo=INTERVALO_VIGILANCIA):
+    # Sondea la firma de los brutos de cada local de la raíz (o de la
+    # raíz, si no hay particiones) y consolida el que cambia. La firma
+    # se toma antes de la pasada: un cambio durante ella se recoge en
+    # la siguiente comprobación. Los locales nuevos entran solos.
+    ultimas = {}
+
+    while True:
+        con_locales = bool(listar_locales(raiz))
+        cambiados = 0
+        for directorio in directorios_locales(raiz):
+            firma = firma_brutos(directorio)
+            if firma == ultimas.get(directorio):
+                continue
+
+            t0 = time.perf_counter()
+            cambios = consolidar_local(directorio) if con_locales else consolidar_todo(directorio)
+            cambiados += 1
+            reescritos = [a for a, cambiado in cambios.items() if cambiado]
+            print(
+                f"[{datetime.now():%H:%M:%S}] {directorio} · consolidado en "
+                f"{time.perf_counter() - t0:.2f}s · {', '.join(reescritos) or 'sin cambios'}",
+                flush=True
+            )
+            ultimas[directorio] = firma
+
+        if con_locales and cambiados:
+            escribir_grupo(raiz)
+        time.sleep(intervalo)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    modo_vigilancia = "--vigilar" in args
+    args = [a for a in args if a != "--vigilar"]
+
+    if len(args) > 1 or any(a.startswith("-") for a in args):
+        print("Uso: python -m oyken.consolidacion [--vigilar] [raiz]")
+        sys.exit(1)
+
+    raiz = Path(args[0]) if args else None
+
+    if modo_vigilancia:
+        try:
+            vigilar(raiz)
+        except KeyboardInterrupt:
+            pass
+    else:
+        t0 = time.perf_counter()
+        con_locales = bool(listar_locales(raiz))
+        for directorio in directorios_locales(raiz):
+            print(directorio)
+            cambios = consolidar_local(directorio) if con_locales else consolidar_todo(directorio)
+            for archivo, cambiado in cambios.items():
+                print(f"  {archivo}: {'reescrito' if cambiado else 'sin cambios'}")
+        if con_locales:
+            escribir_grupo(raiz)
+        print(f"Consolidación completa en {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,394 @@
+import sqlite3
+import sys
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from oyken.persistencia import bloqueo
+
+# =========================
+# ALMACÉN SQLITE (EMBEBIDO)
+# =========================
+# Un único oyken.db por local, en modo WAL, con el histórico de ventas
+# diarias y las tablas mensuales canónicas. Claves primarias en
+# fecha / (anio, mes): leer un día, un mes o un rango es una consulta
+# sobre el índice, y guardar es un upsert transaccional de las filas
+# afectadas, sin reescribir ningún archivo completo. Las fechas van en
+# ISO (YYYY-MM-DD) para que el orden de texto sea el orden temporal.
+#
+# Cada tabla mensual se llama como su antiguo CSV canónico sin la
+# extensión: las constantes *_FILE (ventas_mensuales.csv, ...) siguen
+# identificándolas en el resto del paquete.
+#
+# La primera conexión a un directorio sin oyken.db importa los CSV (y
+# ventas.parquet) que hubiera; a partir de ahí esos archivos ya no se
+# leen ni se escriben.
+#   python -m oyken.db importar [directorio]   vuelve a importarlos
+
+DB_FILE = "oyken.db"
+ESQUEMA = 1  # PRAGMA user_version
+
+COLUMNAS_VENTAS = [
+    "fecha",
+    "ventas_manana_eur", "ventas_tarde_eur", "ventas_noche_eur", "ventas_total_eur",
+    "comensales_manana", "comensales_tarde", "comensales_noche",
+    "tickets_manana", "tickets_tarde", "tickets_noche",
+    "observaciones"
+]
+
+# -------------------------
+# CATÁLOGO
+# -------------------------
+# origenes: archivos de los que se importa la tabla, por preferencia
+TABLAS = {
+    "ventas": {
+        "columnas": COLUMNAS_VENTAS,
+        "clave": ["fecha"],
+        "origenes": ["ventas.parquet", "ventas.csv"],
+    },
+    "ventas_mensuales": {
+        "columnas": ["anio", "mes", "ventas_total_eur", "fecha_actualizacion"],
+        "clave": ["anio", "mes"],
+        "origenes": ["ventas_mensuales.csv"],
+    },
+    "compras_mensuales": {
+        "columnas": ["anio", "mes", "compras_total_eur", "fecha_actualizacion"],
+        "clave": ["anio", "mes"],
+        "origenes": ["compras_mensuales.csv"],
+    },
+    "gastos_mensuales": {
+        "columnas": ["anio", "mes", "gastos_total_eur", "fecha_actualizacion"],
+        "clave": ["anio", "mes"],
+        "origenes": ["gastos_mensuales.csv"],
+    },
+    "rrhh_mensual": {
+        "columnas": ["anio", "mes", "rrhh_total_eur", "fecha_actualizacion"],
+        "clave": ["anio", "mes"],
+        "origenes": ["rrhh_mensual.csv"],
+    },
+    "coste_producto": {
+        "columnas": ["anio", "mes", "coste_producto_pct", "fecha_actualizacion"],
+        "clave": ["anio", "mes"],
+        "origenes": ["coste_producto.csv"],
+    },
+    "inventario_mensual": {
+        "columnas": [
+            "anio", "mes", "inventario_cierre_eur",
+            "variacion_inventario_eur", "fecha_actualizacion"
+        ],
+        "clave": ["anio", "mes"],
+        "origenes": ["inventario_mensual.csv"],
+    },
+}
+
+_TEXTO = {"fecha", "observaciones", "fecha_actualizacion"}
+_ENTERO = {
+    "anio", "mes",
+    "comensales_manana", "comensales_tarde", "comensales_noche",
+    "tickets_manana", "tickets_tarde", "tickets_noche",
+}
+
+
+def _tipo(columna):
+    if columna in _TEXTO:
+        return "TEXT"
+    if columna in _ENTERO:
+        return "INTEGER"
+    return "REAL"
+
+
+def _ddl(tabla, meta):
+    clave = meta["clave"]
+    definiciones = [
+        f"{col} {_tipo(col)}{' NOT NULL' if col in clave else ''}"
+        for col in meta["columnas"]
+    ]
+    definiciones.append(f"PRIMARY KEY ({', '.join(clave)})")
+    return f"CREATE TABLE IF NOT EXISTS {tabla} ({', '.join(definiciones)})"
+
+
+def tabla_de(archivo):
+    # "ventas_mensuales.csv" -> "ventas_mensuales"
+    tabla = Path(archivo).stem
+    if tabla not in TABLAS:
+        raise KeyError(f"{archivo} no es una tabla de {DB_FILE}")
+    return tabla
+
+
+# =========================
+# CONEXIÓN
+# =========================
+def _importables(directorio):
+    return any(
+        (directorio / archivo).exists()
+        for meta in TABLAS.values() for archivo in meta["origenes"]
+    )
+
+
+def existe(directorio=Path(".")):
+    # Hay almacén (o algo que importar en él). Las lecturas lo miran
+    # antes de conectar para no crear un oyken.db vacío en cada carpeta.
+    directorio = Path(directorio)
+    return (directorio / DB_FILE).exists() or _importables(directorio)
+
+
+def conectar(directorio=Path(".")):
+    # Autocommit: las escrituras abren su transacción (transaccion) y
+    # la lectura-comparación-escritura de un llamador puede ir dentro.
+    directorio = Path(directorio)
+    con = sqlite3.connect(directorio / DB_FILE, timeout=30, isolation_level=None)
+    con.execute("PRAGMA synchronous=NORMAL")
+
+    if con.execute("PRAGMA user_version").fetchone()[0] < ESQUEMA:
+        with bloqueo(directorio / DB_FILE):
+            _crear(con, directorio)
+
+    return con
+
+
+def _crear(con, directorio):
+    # Esquema + importación única de los CSV, en una sola transacción:
+    # otro proceso que llegue a la vez espera al cerrojo y ya lo ve hecho.
+    if con.execute("PRAGMA user_version").fetchone()[0] >= ESQUEMA:
+        return
+
+    con.execute("PRAGMA journal_mode=WAL")
+    with transaccion(con):
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS versiones "
+            "(tabla TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, filas INTEGER NOT NULL)"
+        )
+        for tabla, meta in TABLAS.items():
+            con.execute(_ddl(tabla, meta))
+        _importar(con, directorio)
+        con.execute(f"PRAGMA user_version = {ESQUEMA}")
+
+
+@contextmanager
+def transaccion(con):
+    # BEGIN IMMEDIATE toma el cerrojo de escritura al empezar: lo leído
+    # dentro no cambia hasta el COMMIT. Anidada no abre otra.
+    if con.in_transaction:
+        yield con
+        return
+
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        yield con
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+    con.execute("COMMIT")
+
+
+# =========================
+# VERSIÓN POR TABLA
+# =========================
+# Cada escritura anota (hora, filas) de la tabla en la misma
+# transacción: es la "firma" que usan cachés y consolidaciones en
+# lugar del mtime de un archivo.
+
+def _marcar(con, tabla):
+    con.execute(
+        "INSERT INTO versiones (tabla, mtime_ns, filas) "
+        f"VALUES (?, ?, (SELECT COUNT(*) FROM {tabla})) "
+        "ON CONFLICT (tabla) DO UPDATE SET mtime_ns = excluded.mtime_ns, filas = excluded.filas",
+        (tabla, time.time_ns())
+    )
+
+
+def version_tabla(directorio, tabla):
+    # (mtime_ns, filas) de la última escritura; None si nunca se ha escrito
+    if not existe(directorio):
+        return None
+
+    with closing(conectar(directorio)) as con:
+        return con.execute(
+            "SELECT mtime_ns, filas FROM versiones WHERE tabla = ?", (tabla,)
+        ).fetchone()
+
+
+# =========================
+# CONVERSIÓN DATAFRAME -> FILAS
+# =========================
+def _a_tabla(tabla, df):
+    meta = TABLAS[tabla]
+    df = df.copy()
+
+    for col in meta["columnas"]:
+        if col not in df.columns:
+            df[col] = None
+    df = df[meta["columnas"]]
+
+    if "fecha" in df.columns:
+        df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce").dt.strftime("%Y-%m-%d")
+    if "fecha_actualizacion" in df.columns:
+        df["fecha_actualizacion"] = df["fecha_actualizacion"].astype("string")
+
+    for col in meta["columnas"]:
+        if _tipo(col) == "INTEGER":
+            df[col] = pd.to_numeric(df[col], errors="coerce").round().astype("Int64")
+        elif _tipo(col) == "REAL":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+    df = df.dropna(subset=meta["clave"])
+
+    # NaN / NA -> NULL; escalares de Python para el driver
+    return [
+        tuple(None if pd.isna(v) else v.item() if hasattr(v, "item") else v for v in fila)
+        for fila in df.itertuples(index=False, name=None)
+    ]
+
+
+def _insertar(con, tabla, filas, verbo="INSERT"):
+    meta = TABLAS[tabla]
+    columnas = meta["columnas"]
+    sql = (
+        f"{verbo} INTO {tabla} ({', '.join(columnas)}) "
+        f"VALUES ({', '.join('?' for _ in columnas)})"
+    )
+    if verbo == "INSERT":
+        resto = [c for c in columnas if c not in meta["clave"]]
+        sql += (
+            f" ON CONFLICT ({', '.join(meta['clave'])}) DO UPDATE SET "
+            + ", ".join(f"{c} = excluded.{c}" for c in resto)
+        )
+    con.executemany(sql, filas)
+
+
+# =========================
+# ESCRITURA TRANSACCIONAL
+# =========================
+def upsert(con, tabla, df):
+    # INSERT ... ON CONFLICT (clave) DO UPDATE en una transacción: la
+    # fila entera se sustituye. Entre filas repetidas gana la última.
+    filas = _a_tabla(tabla, df)
+    with transaccion(con):
+        _insertar(con, tabla, filas)
+        _marcar(con, tabla)
+    return len(filas)
+
+
+def borrar(con, tabla, claves):
+    # claves: DataFrame con (al menos) las columnas de la clave primaria
+    meta = TABLAS[tabla]
+    posiciones = [meta["columnas"].index(c) for c in meta["clave"]]
+    filas = [tuple(fila[i] for i in posiciones) for fila in _a_tabla(tabla, claves[meta["clave"]])]
+
+    with transaccion(con):
+        con.executemany(
+            f"DELETE FROM {tabla} WHERE {' AND '.join(f'{c} = ?' for c in meta['clave'])}", filas
+        )
+        _marcar(con, tabla)
+    return len(filas)
+
+
+def reemplazar(con, tabla, df):
+    # Sustituye el contenido completo de la tabla de forma atómica
+    filas = _a_tabla(tabla, df)
+    with transaccion(con):
+        con.execute(f"DELETE FROM {tabla}")
+        _insertar(con, tabla, filas, verbo="INSERT OR REPLACE")
+        _marcar(con, tabla)
+    return len(filas)
+
+
+# =========================
+# LECTURA INDEXADA
+# =========================
+def _columnas(tabla, columnas=None):
+    return [c for c in (columnas or TABLAS[tabla]["columnas"]) if c in TABLAS[tabla]["columnas"]]
+
+
+def _tipar(df):
+    # Tipos fijos aunque no haya filas (sin filas todo llega como
+    # object). Los enteros fuera de la clave pueden ser NULL.
+    tipos = {"INTEGER": "Int64", "REAL": "float64", "TEXT": "object"}
+    tipos = {c: tipos[_tipo(c)] for c in df.columns}
+    tipos.update({c: "int64" for c in ("anio", "mes") if c in df.columns})
+    return df.astype(tipos)
+
+
+def vacia(tabla, columnas=None):
+    return _tipar(pd.DataFrame(columns=_columnas(tabla, columnas)))
+
+
+def _consulta(con, tabla, columnas, where="", parametros=()):
+    orden = ", ".join(TABLAS[tabla]["clave"])
+    return _tipar(pd.read_sql_query(
+        f"SELECT {', '.join(_columnas(tabla, columnas))} FROM {tabla}{where} ORDER BY {orden}",
+        con, params=list(parametros)
+    ))
+
+
+def leer(con, tabla, columnas=None):
+    return _consulta(con, tabla, columnas)
+
+
+def leer_rango_fechas(con, tabla, desde=None, hasta=None, columnas=None):
+    # Rango cerrado [desde, hasta] sobre la clave primaria fecha
+    condiciones, parametros = [], []
+    if desde is not None:
+        condiciones.append("fecha >= ?")
+        parametros.append(pd.Timestamp(desde).strftime("%Y-%m-%d"))
+    if hasta is not None:
+        condiciones.append("fecha <= ?")
+        parametros.append(pd.Timestamp(hasta).strftime("%Y-%m-%d"))
+
+    where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    return _consulta(con, tabla, columnas, where, parametros)
+
+
+def leer_mensual(con, tabla, desde=None, hasta=None):
+    # Rango de (anio, mes) sobre la clave primaria; desde/hasta son
+    # tuplas (anio, mes) inclusivas.
+    condiciones, parametros = [], []
+    if desde is not None:
+        condiciones.append("(anio, mes) >= (?, ?)")
+        parametros.extend(int(v) for v in desde)
+    if hasta is not None:
+        condiciones.append("(anio, mes) <= (?, ?)")
+        parametros.extend(int(v) for v in hasta)
+
+    where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    return _consulta(con, tabla, None, where, parametros)
+
+
+# =========================
+# IMPORTADOR DESDE CSV
+# =========================
+def _leer_origen(directorio, tabla):
+    for archivo in TABLAS[tabla]["origenes"]:
+        ruta = directorio / archivo
+        if ruta.exists():
+            return pd.read_parquet(ruta) if ruta.suffix == ".parquet" else pd.read_csv(ruta)
+    return None
+
+
+def _importar(con, directorio):
+    resultado = {}
+    for tabla in TABLAS:
+        df = _leer_origen(directorio, tabla)
+        if df is not None:
+            resultado[tabla] = reemplazar(con, tabla, df)
+    return resultado
+
+
+def importar_csvs(directorio=Path(".")):
+    # Vuelve a cargar las tablas que tengan archivo de origen (las demás
+    # no se tocan). Devuelve {tabla: filas importadas}.
+    directorio = Path(directorio)
+    with closing(conectar(directorio)) as con, transaccion(con):
+        return _importar(con, directorio)
+
+
+if __name__ == "__main__":
+    # python -m oyken.db importar [directorio]
+    if len(sys.argv) < 2 or sys.argv[1] != "importar":
+        print("Uso: python -m oyken.db importar [directorio]")
+        sys.exit(1)
+
+    destino = Path(sys.argv[2]) if len(sys.argv) > 2 else Path(".")
+    for tabla, filas in importar_csvs(destino).items():
+        print(f"{tabla:<20} {filas:>8} filas")
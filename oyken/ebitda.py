@@ -0,0 +1,216 @@
+import hashlib
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from oyken.mensual import leer_mensual, version_mensual
+from oyken.persistencia import bloqueo, escribir_atomico, escribir_csv
+
+# =========================
+# TABLA DE HECHOS EBITDA (MATERIALIZADA)
+# =========================
+# ebitda_mensual.csv guarda, por (anio, mes), las cinco magnitudes de
+# las tablas mensuales canónicas (oyken.db) y los dos EBITDA ya
+# calculados. Junto a ella, ebitda_mensual.fuentes.json registra
+# (última escritura, filas, hash) de cada fuente y los meses
+# (clave_mes) que contiene: solo se recalculan
+# las columnas cuyas fuentes han cambiado de verdad, y un mes que ya no
+# figura en ninguna fuente sale de la tabla.
+
+EBITDA_FILE = "ebitda_mensual.csv"
+FUENTES_FILE = "ebitda_mensual.fuentes.json"
+
+# columna de la tabla de hechos -> tabla mensual canónica de origen
+FUENTES = {
+    "ventas_total_eur": "ventas_mensuales.csv",
+    "compras_total_eur": "compras_mensuales.csv",
+    "rrhh_total_eur": "rrhh_mensual.csv",
+    "gastos_total_eur": "gastos_mensuales.csv",
+    "variacion_inventario_eur": "inventario_mensual.csv",
+}
+
+METRICAS_EBITDA = [*FUENTES.keys(), "ebitda_base_eur", "ebitda_ajustado_eur"]
+
+COLUMNAS_EBITDA = ["anio", "mes", *METRICAS_EBITDA]
+
+
+# =========================
+# SEGUIMIENTO DE FUENTES
+# =========================
+def _estado_fuente(directorio, archivo, previo=None):
+    version = version_mensual(archivo, directorio)
+    if version is None:
+        return None
+
+    estado = {"mtime_ns": version[0], "filas": version[1]}
+
+    # Sin escrituras desde la última vez: se reutiliza el hash sin leer la tabla
+    if previo and previo.get("mtime_ns") == estado["mtime_ns"] and previo.get("filas") == estado["filas"]:
+        estado["hash"] = previo.get("hash")
+    else:
+        contenido = leer_mensual(archivo, directorio).to_csv(index=False)
+        estado["hash"] = hashlib.sha256(contenido.encode()).hexdigest()
+
+    return estado
+
+
+def _leer_estado(directorio):
+    ruta = directorio / FUENTES_FILE
+    if not ruta.exists():
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _guardar_estado(directorio, estado):
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(estado, f, indent=2)
+
+    escribir_atomico(directorio / FUENTES_FILE, escribir)
+
+
+# =========================
+# CARGA DE FUENTES
+# =========================
+def _leer_fuente(directorio, archivo, columna):
+    # Una fila por (anio, mes) (la clave primaria de la tabla); fuera
+    # el mes 0 de los totales anuales
+    df = leer_mensual(archivo, directorio)
+    df = df[df["mes"].between(1, 12)]
+    df[columna] = df[columna].fillna(0)
+    return df[["anio", "mes", columna]]
+
+
+def _calcular_ebitda(df):
+    df = df.fillna(0)
+    df["ebitda_base_eur"] = (
+        df["ventas_total_eur"]
+        - df["compras_total_eur"]
+        - df["rrhh_total_eur"]
+        - df["gastos_total_eur"]
+    )
+    df["ebitda_ajustado_eur"] = df["ebitda_base_eur"] - df["variacion_inventario_eur"]
+    return df
+
+
+def leer_ebitda(directorio=Path(".")):
+    ruta = Path(directorio) / EBITDA_FILE
+    df = pd.read_csv(ruta) if ruta.exists() else pd.DataFrame(columns=COLUMNAS_EBITDA)
+    return df.astype({columna: float for columna in METRICAS_EBITDA})
+
+
+# =========================
+# MATERIALIZACIÓN INCREMENTAL
+# =========================
+def actualizar_ebitda(directorio=Path("."), forzar=False):
+    # Devuelve la tabla de hechos al día. Si ninguna fuente ha cambiado
+    # es una sola lectura; si no, solo se relee lo que ha cambiado.
+    directorio = Path(directorio)
+    ruta = directorio / EBITDA_FILE
+
+    with bloqueo(ruta):
+        previo = {} if forzar or not ruta.exists() else _leer_estado(directorio)
+
+        # Estado sin meses (formato anterior): se rehace todo
+        if any(fuente and "meses" not in fuente for fuente in previo.values()):
+            previo = {}
+
+        estado = {
+            columna: _estado_fuente(directorio, archivo, previo.get(columna))
+            for columna, archivo in FUENTES.items()
+        }
+        cambiadas = [
+            columna for columna in FUENTES
+            if (estado[columna] or {}).get("hash") != (previo.get(columna) or {}).get("hash")
+            or columna not in previo
+        ]
+        for columna in FUENTES:
+            if estado[columna] and columna not in cambiadas:
+                estado[columna]["meses"] = previo[columna]["meses"]
+
+        if not cambiadas:
+            if estado != previo:
+                _guardar_estado(directorio, estado)
+            return leer_ebitda(directorio)
+
+        df = leer_ebitda(directorio) if previo else pd.DataFrame(columns=COLUMNAS_EBITDA)
+        df = df.drop(columns=cambiadas + ["ebitda_base_eur", "ebitda_ajustado_eur"], errors="ignore")
+
+        for columna in cambiadas:
+            fuente = _leer_fuente(directorio, FUENTES[columna], columna)
+            if estado[columna]:
+                estado[columna]["meses"] = sorted(map(clave_mes, fuente["anio"], fuente["mes"]))
+            df = fuente if df.empty else df.merge(fuente, on=["anio", "mes"], how="outer")
+
+        for columna in FUENTES:
+            if columna not in df.columns:
+                df[columna] = 0.0
+
+        # Fuera los meses que ya no figuran en ninguna fuente
+        vigentes = set().union(*((fuente or {}).get("meses", []) for fuente in estado.values()))
+        df = df[(df["anio"].astype(int) * 12 + df["mes"].astype(int) - 1).isin(vigentes)]
+
+        df = _calcular_ebitda(df)
+        df[["anio", "mes"]] = df[["anio", "mes"]].astype(int)
+        df[METRICAS_EBITDA] = df[METRICAS_EBITDA].astype(float)
+        df = df[COLUMNAS_EBITDA].sort_values(["anio", "mes"]).reset_index(drop=True)
+
+        escribir_csv(df, ruta)
+        _guardar_estado(directorio, estado)
+        return df
+
+
+# =========================
+# CONSULTAS POR RANGO
+# =========================
+# Índice entero ordenado clave = anio * 12 + (mes - 1): un rango de
+# meses, cruce de año incluido, es un único slice contiguo.
+
+def clave_mes(anio, mes):
+    return int(anio) * 12 + int(mes) - 1
+
+
+def desde_clave(clave):
+    return clave // 12, clave % 12 + 1
+
+
+def indexar_ebitda(hechos):
+    df = hechos.copy()
+    df.index = df["anio"].astype(int) * 12 + df["mes"].astype(int) - 1
+    return df.sort_index()
+
+
+def rango_ultimos_12(anio, mes):
+    return desde_clave(clave_mes(anio, mes) - 11), (anio, mes)
+
+
+def rango_ytd(anio, mes):
+    return (anio, 1), (anio, mes)
+
+
+def rango_ejercicio(anio, mes_inicio=1):
+    # Ejercicio que termina en anio: con mes_inicio=9, el 2026 va de
+    # sep-2025 a ago-2026.
+    inicio = clave_mes(anio, mes_inicio) - (12 if mes_inicio > 1 else 0)
+    return desde_clave(inicio), desde_clave(inicio + 11)
+
+
+def consultar_ebitda(indexado, desde, hasta):
+    # Filas mensuales de [desde, hasta] ambos inclusive; los meses sin
+    # datos salen a cero. `indexado` viene de indexar_ebitda.
+    k0, k1 = clave_mes(*desde), clave_mes(*hasta)
+    claves = range(k0, k1 + 1)
+
+    df = indexado.loc[k0:k1].reindex(claves)
+    df[METRICAS_EBITDA] = df[METRICAS_EBITDA].astype(float).fillna(0)
+    df["anio"] = [k // 12 for k in claves]
+    df["mes"] = [k % 12 + 1 for k in claves]
+
+    return df[COLUMNAS_EBITDA].reset_index(drop=True)
+
+
+def totales_ebitda(mensual):
+    # Agregado del rango devuelto por consultar_ebitda
+    return mensual[METRICAS_EBITDA].astype(float).sum()
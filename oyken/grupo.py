@@ -0,0 +1,77 @@
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from oyken.ebitda import COLUMNAS_EBITDA, METRICAS_EBITDA, leer_ebitda
+from oyken.locales import listar_locales, directorio_local, raiz_datos
+from oyken.persistencia import escribir_atomico
+
+# =========================
+# CONSOLIDADO DE GRUPO
+# =========================
+# Tabla larga local × anio × mes con la tabla EBITDA de cada local,
+# persistida en la raíz. De ella salen la vista de grupo y el detalle
+# por local. La escribe el worker (oyken.consolidacion, que consolida
+# cada local en un pool de procesos, y python -m oyken); la página
+# solo la lee.
+#   python -m oyken.grupo [raiz]   reúne las tablas EBITDA ya calculadas
+
+GRUPO_FILE = "grupo_mensual.parquet"
+
+COLUMNAS_GRUPO = ["local", *COLUMNAS_EBITDA]
+
+
+def escribir_grupo(raiz=None):
+    # Reúne las tablas EBITDA de todos los locales, sin recalcularlas
+    raiz = Path(raiz or raiz_datos())
+    partes = [
+        leer_ebitda(directorio_local(local, raiz)).assign(local=local)[COLUMNAS_GRUPO]
+        for local in listar_locales(raiz)
+    ]
+    por_local = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUMNAS_GRUPO)
+    escribir_atomico(raiz / GRUPO_FILE, lambda tmp: por_local.to_parquet(tmp, index=False))
+    return por_local
+
+
+def leer_grupo(raiz=None):
+    ruta = Path(raiz or raiz_datos()) / GRUPO_FILE
+    if not ruta.exists():
+        return pd.DataFrame(columns=COLUMNAS_GRUPO)
+    return pd.read_parquet(ruta)
+
+
+def total_grupo(por_local):
+    # Suma de todos los locales por (anio, mes)
+    return (
+        por_local.groupby(["anio", "mes"], as_index=False)[METRICAS_EBITDA]
+        .sum()
+        .sort_values(["anio", "mes"])
+        .reset_index(drop=True)
+    )
+
+
+def ranking_locales(por_local, anio):
+    # Totales del año por local, de mayor a menor EBITDA ajustado
+    return (
+        por_local[por_local["anio"] == anio]
+        .groupby("local", as_index=False)[METRICAS_EBITDA]
+        .sum()
+        .sort_values("ebitda_ajustado_eur", ascending=False)
+        .reset_index(drop=True)
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        print("Uso: python -m oyken.grupo [raiz]")
+        sys.exit(1)
+
+    raiz = Path(sys.argv[1]) if len(sys.argv) > 1 else raiz_datos()
+    t0 = time.perf_counter()
+    tabla = escribir_grupo(raiz)
+    print(
+        f"{tabla['local'].nunique()} locales · {len(tabla):,} filas → "
+        f"{raiz / GRUPO_FILE} ({time.perf_counter() - t0:.2f}s)"
+    )
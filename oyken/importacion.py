@@ -0,0 +1,348 @@
+import shutil
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+import pandas as pd
+
+from oyken.compras import COLUMNAS_COMPRAS, FAMILIAS, anadir_compras
+from oyken.proveedores import alta_proveedores, cargar_proveedores, clave_proveedor
+from oyken.tickets import (
+    TURNOS,
+    anadir_bloque,
+    columnas_ventas,
+    preparar_tickets,
+    sumas_por_turno,
+    volcar_tickets
+)
+from oyken.ventas import upsert_ventas
+
+# =========================
+# IMPORTACIÓN MASIVA (TPV Y FACTURAS DE PROVEEDOR)
+# =========================
+# Exportaciones de TPV en CSV o JSON Lines, leídas por bloques
+# (chunksize) para no cargar millones de tickets en memoria. Cada
+# bloque se agrega al momento a (día, turno) y solo esas sumas
+# parciales se acumulan; al final se pivotan a las columnas de
+# las ventas diarias y se hace un único upsert por fecha (upsert_ventas).
+# Los tickets sueltos se guardan además en el almacén de tickets
+# (oyken.tickets) para el análisis por franja horaria: cada bloque se
+# vuelca a una partición temporal, sin acumularlos en memoria.
+#
+# Formatos reconocidos por las columnas del primer bloque:
+#   tickets  fecha_hora (o fecha + hora), importe[, comensales]
+#   turnos   fecha, turno, importe[, tickets][, comensales]
+#
+# Turnos y día operativo siguen oyken.tickets (INICIO_TURNOS,
+# CORTE_DIA): un ticket de la 01:30 es la noche del día anterior.
+#
+# Las líneas de factura (fecha, proveedor, familia, coste) van a
+# compras.csv (y al cubo de gasto) en una sola escritura; los proveedores se resuelven
+# contra el maestro con un índice por clave y los que faltan se dan
+# de alta (importar_compras).
+#   python -m oyken.importacion [--compras] <archivo> [directorio]
+
+TAMANO_BLOQUE = 500_000  # filas por chunk
+
+# Nombres de columna aceptados (sin tildes, en minúsculas y con "_"
+# en lugar de espacios o guiones)
+ALIAS = {
+    "fecha_hora": ["fecha_hora", "fecha_y_hora", "timestamp", "datetime"],
+    "fecha": ["fecha", "date", "dia"],
+    "hora": ["hora", "time"],
+    "importe": ["importe", "total", "amount", "ventas", "ventas_eur", "importe_eur"],
+    "comensales": ["comensales", "covers", "pax"],
+    "tickets": ["tickets", "num_tickets", "n_tickets"],
+    "turno": ["turno", "shift"],
+}
+
+ALIAS_COMPRAS = {
+    "fecha": ["fecha", "fecha_factura", "date", "dia"],
+    "proveedor": ["proveedor", "supplier", "vendor", "razon_social"],
+    "familia": ["familia", "categoria", "family", "category"],
+    "coste": ["coste_(€)", "coste", "coste_eur", "importe", "total", "amount"],
+}
+
+ALIAS_TURNO = {
+    "manana": "manana", "morning": "manana", "comida": "manana",
+    "tarde": "tarde", "afternoon": "tarde",
+    "noche": "noche", "night": "noche", "cena": "noche",
+}
+
+# Familia de la factura (sin tildes, en minúsculas) -> FAMILIAS; lo
+# que no se reconoce va a "Otros"
+ALIAS_FAMILIA = {
+    "materia prima": "Materia prima", "materia_prima": "Materia prima",
+    "comida": "Materia prima", "alimentacion": "Materia prima", "food": "Materia prima",
+    "bebidas": "Bebidas", "bebida": "Bebidas", "drinks": "Bebidas",
+    "limpieza": "Limpieza", "cleaning": "Limpieza",
+    "otros": "Otros",
+}
+
+
+class ErrorImportacion(Exception):
+    pass
+
+
+def _plano(texto):
+    # minúsculas, sin tildes ni espacios sobrantes
+    texto = unicodedata.normalize("NFKD", str(texto).strip().lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def _renombrar(chunk, alias_columnas=ALIAS):
+    columnas = {_plano(c).replace(" ", "_").replace("-", "_"): c for c in chunk.columns}
+    mapa = {}
+    for canonica, alias in alias_columnas.items():
+        for a in alias:
+            if a in columnas:
+                mapa[columnas[a]] = canonica
+                break
+    return chunk[list(mapa)].rename(columns=mapa)
+
+
+def _formato(chunk):
+    if "importe" not in chunk.columns:
+        raise ErrorImportacion("Falta la columna de importe")
+    if "turno" in chunk.columns and "fecha" in chunk.columns:
+        return "turnos"
+    if "fecha_hora" in chunk.columns or {"fecha", "hora"} <= set(chunk.columns):
+        return "tickets"
+    raise ErrorImportacion("No se reconoce el formato: se esperaba fecha_hora o fecha + turno")
+
+
+# =========================
+# AGREGACIÓN POR BLOQUE
+# =========================
+def _agregar_tickets(chunk):
+    if "fecha_hora" in chunk.columns:
+        momento = pd.to_datetime(chunk["fecha_hora"], errors="coerce")
+    else:
+        momento = pd.to_datetime(
+            chunk["fecha"].astype(str) + " " + chunk["hora"].astype(str), errors="coerce"
+        )
+    importe = pd.to_numeric(chunk["importe"], errors="coerce")
+    validas = momento.notna() & importe.notna()
+
+    detalle = pd.DataFrame({
+        "momento": momento[validas],
+        "importe": importe[validas],
+        "comensales": (
+            pd.to_numeric(chunk.loc[validas, "comensales"], errors="coerce").fillna(0)
+            if "comensales" in chunk.columns else 0
+        ),
+    })
+    return detalle, int((~validas).sum())
+
+
+def _agregar_turnos(chunk):
+    fecha = pd.to_datetime(chunk["fecha"], errors="coerce").dt.normalize()
+    turno = chunk["turno"].map(lambda t: ALIAS_TURNO.get(_plano(t)))
+    importe = pd.to_numeric(chunk["importe"], errors="coerce")
+    validas = fecha.notna() & turno.notna() & importe.notna()
+
+    def numerica(columna):
+        if columna not in chunk.columns:
+            return 0
+        return pd.to_numeric(chunk.loc[validas, columna], errors="coerce").fillna(0)
+
+    sumas = pd.DataFrame({
+        "fecha": fecha[validas],
+        "turno": turno[validas].map(TURNOS.index),
+        "ventas": importe[validas],
+        "tickets": numerica("tickets"),
+        "comensales": numerica("comensales"),
+    }).groupby(["fecha", "turno"]).sum()
+    return sumas, int((~validas).sum())
+
+
+def _bloques(origen, nombre, tamano):
+    # Lector por chunks según la extensión (.csv, .json/.jsonl/.ndjson)
+    extension = Path(nombre).suffix.lower()
+    if extension in (".json", ".jsonl", ".ndjson"):
+        return pd.read_json(origen, lines=True, chunksize=tamano, dtype=False)
+    if extension in (".csv", ".txt"):
+        return pd.read_csv(origen, chunksize=tamano)
+    raise ErrorImportacion(f"Extensión no soportada: {extension or nombre}")
+
+
+def agregar_pos(origen, nombre=None, tamano=TAMANO_BLOQUE, con_tickets=None):
+    # origen: ruta o archivo abierto. Devuelve (días en columnas de
+    # las ventas diarias, informe). Con una función en `con_tickets`, se le
+    # pasan los tickets válidos de cada bloque según se leen.
+    nombre = nombre or str(origen)
+    sumas = []
+    informe = {"filas": 0, "rechazadas": 0, "formato": None}
+
+    for chunk in _bloques(origen, nombre, tamano):
+        chunk = _renombrar(chunk)
+        informe["formato"] = informe["formato"] or _formato(chunk)
+
+        if informe["formato"] == "tickets":
+            tickets, rechazadas = _agregar_tickets(chunk)
+            # Solo (día, turno) sobrevive al bloque
+            sumas.append(sumas_por_turno(tickets["momento"], tickets["importe"], tickets["comensales"]))
+            if con_tickets is not None:
+                con_tickets(tickets)
+        else:
+            parcial, rechazadas = _agregar_turnos(chunk)
+            sumas.append(parcial)
+
+        informe["filas"] += len(chunk)
+        informe["rechazadas"] += rechazadas
+
+    if not sumas:
+        raise ErrorImportacion("El archivo está vacío")
+
+    total = pd.concat(sumas).groupby(level=["fecha", "turno"]).sum()
+    if total.empty:
+        raise ErrorImportacion("Ninguna fila válida")
+
+    dias = columnas_ventas(total)
+
+    informe["dias"] = len(dias)
+    informe["tickets"] = int(dias[[f"tickets_{t}" for t in TURNOS]].to_numpy().sum())
+    informe["desde"], informe["hasta"] = dias["fecha"].min(), dias["fecha"].max()
+    return dias, informe
+
+
+def importar_pos(origen, directorio=Path("."), nombre=None, tamano=TAMANO_BLOQUE):
+    # Agrega y hace el upsert por fecha en una sola escritura; si son
+    # tickets, también los sustituye en el almacén de tickets, y si son
+    # turnos, retira los tickets que hubiera de esos días
+    t0 = time.perf_counter()
+    temporal = preparar_tickets(directorio)
+    try:
+        dias, informe = agregar_pos(origen, nombre, tamano, lambda t: anadir_bloque(temporal, t))
+        # Los tickets solo se publican si el upsert de ventas termina
+        volcar_tickets(
+            temporal, directorio, lambda: upsert_ventas(dias, directorio), retirar=dias["fecha"]
+        )
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+    informe["segundos"] = time.perf_counter() - t0
+    return informe
+
+
+# =========================
+# COMPRAS DESDE FACTURAS DE PROVEEDOR
+# =========================
+def _importe(columna):
+    # Acepta 12.5 y también "1.234,50" (coma decimal)
+    numero = pd.to_numeric(columna, errors="coerce")
+    texto = columna[numero.isna() & columna.notna()].astype(str)
+    if not texto.empty:
+        numero[texto.index] = pd.to_numeric(
+            texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+            errors="coerce"
+        )
+    return numero
+
+
+def _lineas_compra(chunk):
+    faltan = {"fecha", "proveedor", "coste"} - set(chunk.columns)
+    if faltan:
+        raise ErrorImportacion(f"Faltan columnas: {', '.join(sorted(faltan))}")
+
+    fecha = pd.to_datetime(chunk["fecha"], dayfirst=True, errors="coerce")
+    proveedor = chunk["proveedor"].astype("string").str.strip()
+    coste = _importe(chunk["coste"])
+    # Misma regla que el formulario: proveedor y coste > 0
+    validas = fecha.notna() & proveedor.fillna("").ne("") & (coste > 0)
+
+    if "familia" in chunk.columns:
+        # _plano sobre los valores distintos, no sobre cada línea
+        familia = chunk.loc[validas, "familia"].astype(str)
+        mapa = {f: ALIAS_FAMILIA.get(_plano(f), "Otros") for f in familia.unique()}
+        familia = familia.map(mapa)
+    else:
+        familia = "Otros"
+
+    # strftime solo sobre las fechas distintas: muchas líneas por factura
+    codigos, dias = pd.factorize(fecha[validas])
+    lineas = pd.DataFrame({
+        "Fecha": pd.Series(dias.strftime("%d/%m/%Y").to_numpy()[codigos], index=fecha[validas].index),
+        "Proveedor": proveedor[validas].astype(object),
+        "Familia": familia,
+        "Coste (€)": coste[validas].round(2),
+    })
+    return lineas, int((~validas).sum())
+
+
+def importar_compras(origen, directorio=Path("."), nombre=None, tamano=TAMANO_BLOQUE):
+    # Añade las líneas válidas a compras.csv en una sola escritura.
+    # Los proveedores se escriben como en el maestro; los que no
+    # existen se dan de alta antes (también en una sola escritura).
+    t0 = time.perf_counter()
+    directorio = Path(directorio)
+    nombre = nombre or str(origen)
+    partes = []
+    informe = {"filas": 0, "rechazadas": 0}
+
+    for chunk in _bloques(origen, nombre, tamano):
+        lineas, rechazadas = _lineas_compra(_renombrar(chunk, ALIAS_COMPRAS))
+        partes.append(lineas)
+        informe["filas"] += len(chunk)
+        informe["rechazadas"] += rechazadas
+
+    if not partes:
+        raise ErrorImportacion("El archivo está vacío")
+
+    lineas = pd.concat(partes, ignore_index=True)
+    if lineas.empty:
+        raise ErrorImportacion("Ninguna fila válida")
+
+    # Resolución de proveedores: un lookup por clave en el índice del
+    # maestro, sin comparar cada línea contra la lista
+    claves = clave_proveedor(lineas["Proveedor"])
+    registro, _ = cargar_proveedores(directorio)
+
+    nuevos = lineas.loc[~claves.isin(list(registro["indice"])), "Proveedor"].groupby(claves).first()
+    if not nuevos.empty:
+        registro, _ = alta_proveedores(nuevos.tolist(), directorio)
+    lineas["Proveedor"] = claves.map(registro["indice"])
+    # Nombres tal como han quedado en el maestro (otra sesión pudo
+    # darlos de alta con otra grafía entre medias)
+    nuevos = [registro["indice"][c] for c in nuevos.index]
+
+    anadir_compras(lineas[COLUMNAS_COMPRAS], directorio)
+
+    informe["lineas"] = len(lineas)
+    informe["coste"] = float(lineas["Coste (€)"].sum())
+    informe["proveedores_nuevos"] = nuevos
+    informe["familias"] = lineas.groupby("Familia")["Coste (€)"].sum().reindex(FAMILIAS, fill_value=0).to_dict()
+    informe["segundos"] = time.perf_counter() - t0
+    return informe
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    compras = "--compras" in args
+    if compras:
+        args.remove("--compras")
+
+    if len(args) not in (1, 2):
+        print("Uso: python -m oyken.importacion [--compras] <archivo> [directorio]")
+        sys.exit(1)
+
+    destino = Path(args[1]) if len(args) > 1 else Path(".")
+    try:
+        r = (importar_compras if compras else importar_pos)(Path(args[0]), destino)
+    except ErrorImportacion as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if compras:
+        print(
+            f"{r['filas']:,} filas · {r['rechazadas']:,} rechazadas · "
+            f"{r['lineas']:,} compras ({r['coste']:,.2f} €) · "
+            f"{len(r['proveedores_nuevos'])} proveedores nuevos · "
+            f"{r['segundos']:.2f}s ({r['filas'] / r['segundos']:,.0f} filas/s)"
+        )
+    else:
+        print(
+            f"{r['filas']:,} filas ({r['formato']}) · {r['rechazadas']:,} rechazadas · "
+            f"{r['dias']:,} días ({r['desde']:%d/%m/%Y} → {r['hasta']:%d/%m/%Y}) · "
+            f"{r['segundos']:.2f}s ({r['filas'] / r['segundos']:,.0f} filas/s)"
+        )
@@ -0,0 +1,77 @@
+import os
+import re
+import sys
+from pathlib import Path
+
+# =========================
+# PARTICIONES POR LOCAL
+# =========================
+# Cada local (restaurante) tiene su propio directorio de datos,
+# locales/<id>/, con los mismos archivos que una instalación de un
+# solo local. Todo el núcleo ya recibe `directorio`: particionar es
+# elegir el directorio, y cerrojos, firmas y cachés quedan separados
+# por local sin más cambios.
+#
+# La raíz de datos es OYKEN_DATOS (por defecto, el directorio actual).
+# Sin carpeta locales/ la raíz es el único local: las instalaciones
+# existentes siguen funcionando igual.
+#   python -m oyken.locales                 lista los locales
+#   python -m oyken.locales crear <id>      crea la partición
+
+LOCALES_DIR = "locales"
+
+# Identificador de local: minúsculas, dígitos, guion y guion bajo
+PATRON_LOCAL = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+
+def raiz_datos():
+    return Path(os.environ.get("OYKEN_DATOS", "."))
+
+
+def listar_locales(raiz=None):
+    # Ids de las particiones existentes (vacío = instalación de un local)
+    carpeta = Path(raiz or raiz_datos()) / LOCALES_DIR
+    if not carpeta.is_dir():
+        return []
+    return sorted(d.name for d in carpeta.iterdir() if d.is_dir() and PATRON_LOCAL.match(d.name))
+
+
+def directorio_local(local=None, raiz=None):
+    # Directorio de datos del local; sin local, la raíz
+    raiz = Path(raiz or raiz_datos())
+    if local is None:
+        return raiz
+    if not PATRON_LOCAL.match(local):
+        raise ValueError(f"Identificador de local no válido: {local!r}")
+    return raiz / LOCALES_DIR / local
+
+
+def directorios_locales(raiz=None):
+    # Todos los directorios de datos: uno por local, o la raíz
+    locales = listar_locales(raiz)
+    if not locales:
+        return [directorio_local(raiz=raiz)]
+    return [directorio_local(local, raiz) for local in locales]
+
+
+def crear_local(local, raiz=None):
+    directorio = directorio_local(local, raiz)
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if not args:
+        for local in listar_locales():
+            print(local)
+    elif args[0] == "crear" and len(args) == 2:
+        try:
+            print(crear_local(args[1]))
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+    else:
+        print("Uso: python -m oyken.locales [crear <id>]")
+        sys.exit(1)
@@ -0,0 +1,180 @@
+import threading
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from oyken import db
+from oyken.persistencia import cerrojo_hilo
+from oyken.ventas import cargar_ventas
+
+# =========================
+# CONSOLIDACIÓN MENSUAL · VENTAS
+# =========================
+# ventas_mensuales es la salida canónica que leen Compras, Breakeven y
+# EBITDA (una tabla de oyken.db, como el resto de mensuales). Se
+# calcula con un único groupby y solo se escriben los (anio, mes) que
+# cambian.
+
+VENTAS_MENSUALES_FILE = "ventas_mensuales.csv"
+
+# =========================
+# ROLLUP MENSUAL GENÉRICO
+# =========================
+def resumen_mensual(df, col_fecha, columnas, anios=None):
+    # Tabla año × mes × métrica en una sola pasada (groupby) y reindex
+    # para que los meses sin movimientos aparezcan a 0. Sirve para
+    # ventas, compras, gastos o cualquier registro fechado.
+    columnas = [columnas] if isinstance(columnas, str) else list(columnas)
+
+    fechas = pd.to_datetime(df[col_fecha], errors="coerce")
+    anio = fechas.dt.year
+
+    # Con años explícitos se descarta el resto antes de agrupar
+    filas = anio.isin(list(anios)) if anios is not None else anio.notna()
+    fechas = fechas[filas]
+
+    datos = df.loc[filas, columnas].apply(pd.to_numeric, errors="coerce").fillna(0)
+    datos["anio"] = fechas.dt.year.astype(int)
+    datos["mes"] = fechas.dt.month.astype(int)
+
+    if anios is None:
+        anios = datos["anio"].unique()
+    anios = sorted(int(a) for a in anios)
+
+    indice = pd.MultiIndex.from_product([anios, range(1, 13)], names=["anio", "mes"])
+
+    return (
+        datos.groupby(["anio", "mes"])[columnas]
+        .sum()
+        .reindex(indice, fill_value=0.0)
+        .reset_index()
+    )
+
+
+def ventas_por_mes(df_diario, buckets=None):
+    # Todos los meses de los años con datos (huecos a 0), o solo los
+    # buckets (anio, mes) pedidos.
+    if buckets is None:
+        resumen = resumen_mensual(df_diario, "fecha", "ventas_total_eur")
+    else:
+        resumen = resumen_mensual(
+            df_diario, "fecha", "ventas_total_eur",
+            anios={a for a, _ in buckets}
+        )
+        resumen = resumen[
+            pd.MultiIndex.from_frame(resumen[["anio", "mes"]]).isin(list(buckets))
+        ].copy()
+
+    resumen["ventas_total_eur"] = resumen["ventas_total_eur"].round(2)
+    return resumen.reset_index(drop=True)
+
+
+def leer_ventas_mensuales(directorio=Path("."), desde=None, hasta=None):
+    df = leer_mensual(VENTAS_MENSUALES_FILE, directorio, desde, hasta)
+    df["ventas_total_eur"] = df["ventas_total_eur"].fillna(0)
+    return df
+
+
+def consolidar_ventas_mensuales(df_diario, buckets=None, directorio=Path(".")):
+    # Devuelve True si la tabla canónica ha cambiado.
+    nuevo = ventas_por_mes(df_diario, buckets)
+
+    # Lectura, comparación y upsert en la misma transacción
+    with closing(db.conectar(directorio)) as con, db.transaccion(con):
+        return _fusionar_ventas_mensuales(con, nuevo)
+
+
+def _fusionar_ventas_mensuales(con, nuevo):
+    hist = db.leer_mensual(con, "ventas_mensuales")
+
+    comparado = nuevo.merge(
+        hist[["anio", "mes", "ventas_total_eur"]],
+        on=["anio", "mes"],
+        how="left",
+        suffixes=("", "_hist")
+    )
+    cambiados = comparado[
+        comparado["ventas_total_eur_hist"].isna() |
+        (comparado["ventas_total_eur_hist"].round(2) != comparado["ventas_total_eur"])
+    ][["anio", "mes", "ventas_total_eur"]].copy()
+
+    if cambiados.empty:
+        return False
+
+    cambiados["fecha_actualizacion"] = datetime.now()
+    db.upsert(con, "ventas_mensuales", cambiados)
+    return True
+
+
+def consolidar_en_segundo_plano(directorio=Path(".")):
+    # Consolidación completa fuera del render de la página. Si ya hay
+    # una en curso no se lanza otra (devuelve None).
+    directorio = Path(directorio)
+    cerrojo = cerrojo_hilo("ventas_mensuales", directorio)
+    if not cerrojo.acquire(blocking=False):
+        return None
+
+    def consolidar():
+        try:
+            df_diario = cargar_ventas(["fecha", "ventas_total_eur"], directorio=directorio)
+            consolidar_ventas_mensuales(df_diario, directorio=directorio)
+        finally:
+            cerrojo.release()
+
+    hilo = threading.Thread(target=consolidar, daemon=True)
+    hilo.start()
+    return hilo
+
+
+def consolidar_registro(df_diario, registro, directorio=Path(".")):
+    # Recalcula solo el (anio, mes) de una venta nueva o editada,
+    # aplicando el upsert por fecha sobre el mes en memoria.
+    fecha = pd.Timestamp(registro["fecha"]).normalize()
+
+    mismo_mes = df_diario[
+        (df_diario["fecha"].dt.year == fecha.year) &
+        (df_diario["fecha"].dt.month == fecha.month) &
+        (df_diario["fecha"] != fecha)
+    ][["fecha", "ventas_total_eur"]]
+
+    df_mes = pd.concat(
+        [mismo_mes, pd.DataFrame([{"fecha": fecha, "ventas_total_eur": registro["ventas_total_eur"]}])],
+        ignore_index=True
+    )
+
+    return consolidar_ventas_mensuales(
+        df_mes,
+        buckets={(fecha.year, fecha.month)},
+        directorio=directorio
+    )
+
+
+# =========================
+# TABLAS MENSUALES CANÓNICAS
+# =========================
+# archivo: el nombre canónico (VENTAS_MENSUALES_FILE, INVENTARIO_FILE,
+# ...), que identifica su tabla en oyken.db.
+
+def leer_mensual(archivo, directorio=Path("."), desde=None, hasta=None):
+    # Una fila por (anio, mes), ordenada; desde/hasta: (anio, mes)
+    # inclusivos, resueltos sobre la clave primaria.
+    tabla = db.tabla_de(archivo)
+    if not db.existe(directorio):
+        return db.vacia(tabla)
+
+    with closing(db.conectar(directorio)) as con:
+        return db.leer_mensual(con, tabla, desde, hasta)
+
+
+def version_mensual(archivo, directorio=Path(".")):
+    # (mtime_ns, filas) de la última escritura; None si nunca se ha escrito
+    return db.version_tabla(directorio, db.tabla_de(archivo))
+
+
+def guardar_mensual(archivo, df_nuevo, directorio=Path(".")):
+    # Overwrite limpio por (anio, mes): upsert transaccional de esas
+    # filas, sin tocar el resto de meses.
+    with closing(db.conectar(directorio)) as con:
+        return db.upsert(con, db.tabla_de(archivo), df_nuevo)
@@ -0,0 +1,135 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# =========================
+# PERSISTENCIA CONCURRENTE
+# =========================
+# Varias sesiones de Streamlit (y procesos batch) escriben los mismos
+# CSV. Reglas:
+#   1. Todo read-modify-write se hace bajo un cerrojo de archivo
+#      (advisory lock en .<archivo>.lock).
+#   2. Se escribe a un temporal del mismo directorio y se hace
+#      os.replace: un lector ve el archivo anterior o el nuevo, nunca
+#      uno a medias.
+#   3. Las copias en sesión guardan la versión (inodo, mtime, tamaño) con la
+#      que se leyeron; si al escribir no coincide, hay conflicto y la
+#      sesión recarga antes de aplicar el cambio.
+
+
+class ConflictoVersion(Exception):
+    pass
+
+
+def version(ruta):
+    ruta = Path(ruta)
+    if not ruta.exists():
+        return None
+    # os.replace crea un inodo nuevo: cambia aunque mtime/tamaño coincidan
+    info = ruta.stat()
+    return (info.st_ino, info.st_mtime_ns, info.st_size)
+
+
+@contextmanager
+def bloqueo(ruta):
+    ruta = Path(ruta)
+    lock = ruta.with_name(f".{ruta.name}.lock")
+
+    with open(lock, "a+") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+_cerrojos_hilo = {}
+
+
+def cerrojo_hilo(tarea, directorio):
+    # threading.Lock por (tarea, directorio): las tareas en segundo
+    # plano de locales distintos no se bloquean entre sí
+    clave = (tarea, str(Path(directorio).resolve()))
+    return _cerrojos_hilo.setdefault(clave, threading.Lock())
+
+
+def escribir_atomico(ruta, escritor):
+    # escritor(ruta_temporal) escribe el contenido completo
+    ruta = Path(ruta)
+    fd, tmp = tempfile.mkstemp(prefix=f".{ruta.name}.", suffix=".tmp", dir=ruta.parent)
+    os.close(fd)
+    try:
+        escritor(tmp)
+        os.replace(tmp, ruta)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def escribir_csv(df, ruta):
+    escribir_atomico(ruta, lambda tmp: df.to_csv(tmp, index=False))
+
+
+def leer_csv(ruta, columnas=None):
+    # (df, versión) leídos de forma consistente
+    ruta = Path(ruta)
+    with bloqueo(ruta):
+        if ruta.exists():
+            return pd.read_csv(ruta), version(ruta)
+        return pd.DataFrame(columns=columnas or []), None
+
+
+def modificar_csv(ruta, cambio, columnas=None, version_esperada=False):
+    # Read-modify-write bajo cerrojo sobre el contenido ACTUAL del
+    # archivo. cambio(df) -> df. Si se pasa version_esperada y el
+    # archivo ha cambiado desde entonces, lanza ConflictoVersion sin
+    # escribir. Devuelve (df_final, nueva_versión).
+    ruta = Path(ruta)
+    with bloqueo(ruta):
+        if version_esperada is not False and version(ruta) != version_esperada:
+            raise ConflictoVersion(str(ruta))
+
+        if ruta.exists():
+            df = pd.read_csv(ruta)
+        else:
+            df = pd.DataFrame(columns=columnas or [])
+
+        df = cambio(df)
+        escribir_csv(df, ruta)
+        return df, version(ruta)
+
+
+def anadir_filas(ruta, filas, columnas=None):
+    # Alta de registros: se añaden al archivo actual, no a una copia
+    # de sesión posiblemente desfasada.
+    nuevas = pd.DataFrame(filas)
+    return modificar_csv(
+        ruta,
+        lambda df: nuevas if df.empty else pd.concat([df, nuevas], ignore_index=True),
+        columnas=columnas
+    )
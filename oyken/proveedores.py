@@ -0,0 +1,181 @@
+import bisect
+import sys
+import time
+import unicodedata
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+
+from oyken.persistencia import leer_csv, modificar_csv
+
+# =========================
+# MAESTRO DE PROVEEDORES
+# =========================
+# proveedores.csv guarda los nombres tal como se dieron de alta. Dos
+# nombres son el mismo proveedor si coincide su clave: sin tildes, en
+# mayúsculas y con los espacios colapsados ("Frutas López" = "FRUTAS
+# LOPEZ"). El registro se construye una vez por versión del archivo:
+#   indice     {clave: nombre}  -> duplicados en O(1)
+#   claves     claves ordenadas -> búsqueda por prefijo con bisect
+#   nombres    nombres en el orden de las claves (listado)
+#   trigramas  {trigrama: [posiciones]} -> búsqueda aproximada
+#   python -m oyken.proveedores <texto> [directorio]
+
+PROVEEDORES_FILE = "proveedores.csv"
+
+RESULTADOS_BUSQUEDA = 20
+
+# Fracción de los trigramas de la consulta que debe tener un nombre
+# para salir en la búsqueda aproximada (solo con consultas de
+# LONGITUD_APROXIMADA letras o más; con menos, prefijo o subcadena)
+SIMILITUD_MINIMA = 0.5
+LONGITUD_APROXIMADA = 4
+
+
+def clave(nombre):
+    texto = unicodedata.normalize("NFKD", str(nombre))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.upper().split())
+
+
+def clave_proveedor(nombres):
+    # Serie de nombres -> serie de claves (una llamada a clave() por
+    # nombre distinto, no por fila)
+    nombres = nombres.astype(str)
+    unicos = nombres.unique()
+    return nombres.map(dict(zip(unicos, map(clave, unicos))))
+
+
+def _trigramas(texto):
+    # Por palabra y con relleno, para que el inicio de palabra pese
+    trigramas = set()
+    for palabra in texto.split():
+        palabra = f"  {palabra} "
+        trigramas.update(palabra[i:i + 3] for i in range(len(palabra) - 2))
+    return trigramas
+
+
+def indice_proveedores(nombres):
+    # {clave: nombre tal como figura en el maestro}; gana el primero
+    nombres = pd.Series(nombres, dtype=object).dropna().astype(str).str.strip()
+    nombres = nombres[nombres != ""]
+    indice = {}
+    for c, nombre in zip(clave_proveedor(nombres), nombres):
+        indice.setdefault(c, nombre)
+    return indice
+
+
+def registro_proveedores(nombres):
+    indice = indice_proveedores(nombres)
+    claves = sorted(indice)
+
+    trigramas = {}
+    for i, c in enumerate(claves):
+        for t in _trigramas(c):
+            trigramas.setdefault(t, []).append(i)
+
+    return {
+        "indice": indice,
+        "claves": claves,
+        "nombres": [indice[c] for c in claves],
+        "trigramas": trigramas,
+    }
+
+
+def cargar_proveedores(directorio=Path(".")):
+    # (registro, versión) del maestro actual
+    df, version_leida = leer_csv(Path(directorio) / PROVEEDORES_FILE, ["Proveedor"])
+    return registro_proveedores(df["Proveedor"]), version_leida
+
+
+def proveedor_existente(registro, nombre):
+    # Nombre ya registrado con la misma clave (None si es nuevo)
+    return registro["indice"].get(clave(nombre))
+
+
+# =========================
+# BÚSQUEDA
+# =========================
+def buscar_proveedores(registro, texto, limite=RESULTADOS_BUSQUEDA):
+    # Primero los que empiezan por el texto (orden alfabético); después
+    # los que lo contienen o se le parecen, por similitud de trigramas
+    q = clave(texto)
+    claves, nombres = registro["claves"], registro["nombres"]
+    if not q:
+        return nombres[:limite]
+
+    inicio = bisect.bisect_left(claves, q)
+    fin = bisect.bisect_left(claves, q + "\uffff")
+    posiciones = list(range(inicio, min(fin, inicio + limite)))
+    if len(posiciones) == limite:
+        return [nombres[i] for i in posiciones]
+
+    prefijo = set(posiciones)
+    if len(q) < LONGITUD_APROXIMADA:
+        # Los trigramas con relleno no ven "OP" a media palabra
+        # (GALOPE): con tan pocas letras, barrido lineal de subcadena
+        contienen = [i for i, c in enumerate(claves) if i not in prefijo and q in c]
+        posiciones += contienen[:limite - len(posiciones)]
+        return [nombres[i] for i in posiciones]
+
+    consulta = _trigramas(q)
+    comunes = Counter()
+    for t in consulta:
+        comunes.update(registro["trigramas"].get(t, ()))
+
+    candidatos = []
+    for i, n in comunes.items():
+        if i in prefijo:
+            continue
+        contiene = q in claves[i]
+        similitud = n / len(consulta)
+        if contiene or similitud >= SIMILITUD_MINIMA:
+            candidatos.append((not contiene, -similitud, i))
+
+    posiciones += [i for *_, i in sorted(candidatos)[:limite - len(posiciones)]]
+    return [nombres[i] for i in posiciones]
+
+
+# =========================
+# ALTAS
+# =========================
+def alta_proveedores(nombres, directorio=Path(".")):
+    # Añade al final del maestro los nombres cuya clave aún no existe,
+    # en una sola escritura bajo cerrojo. Las filas existentes no se
+    # tocan (tampoco las que ya compartían clave): la clave solo sirve
+    # para rechazar nombres nuevos. Devuelve (registro, versión).
+    def alta(df):
+        indice = indice_proveedores(df["Proveedor"] if not df.empty else [])
+        nuevos = {}
+        for nombre in nombres:
+            nombre = " ".join(str(nombre).split())
+            if nombre and clave(nombre) not in indice:
+                nuevos.setdefault(clave(nombre), nombre)
+
+        if not nuevos:
+            return df
+        altas = pd.DataFrame({"Proveedor": list(nuevos.values())})
+        return altas if df.empty else pd.concat([df, altas], ignore_index=True)
+
+    df, version_escrita = modificar_csv(Path(directorio) / PROVEEDORES_FILE, alta, ["Proveedor"])
+    return registro_proveedores(df["Proveedor"]), version_escrita
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Uso: python -m oyken.proveedores <texto> [directorio]")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    registro, _ = cargar_proveedores(Path(sys.argv[2]) if len(sys.argv) > 2 else Path("."))
+    t1 = time.perf_counter()
+    resultados = buscar_proveedores(registro, sys.argv[1])
+    t2 = time.perf_counter()
+
+    for nombre in resultados:
+        print(nombre)
+    print(
+        f"{len(registro['claves']):,} proveedores · registro {1000 * (t1 - t0):.1f} ms · "
+        f"búsqueda {1000 * (t2 - t1):.2f} ms"
+    )
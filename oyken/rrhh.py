@@ -0,0 +1,51 @@
+import pandas as pd
+
+from oyken.calendario import MESES
+
+# =========================
+# MOTOR DE NÓMINA RRHH
+# =========================
+# Coste de personal de todos los puestos × 12 meses como una sola
+# operación matricial:
+#   nómina = bruto anual / 12 × personas del mes
+#   SS     = nómina × SS_EMPRESA
+#   coste  = nómina + SS
+
+SS_EMPRESA = 0.33
+
+COLUMNAS_NOMINA = ["anio", "mes", "nomina_eur", "ss_eur", "coste_empresa_eur"]
+
+
+def nomina_mensual(df_puestos, ss_empresa=SS_EMPRESA):
+    # Una fila por (anio, mes) de cada año presente en df_puestos
+    if df_puestos.empty:
+        return pd.DataFrame(columns=COLUMNAS_NOMINA)
+
+    bruto = pd.to_numeric(df_puestos["Bruto anual (€)"], errors="coerce").fillna(0).to_numpy()
+    personas = (
+        df_puestos[MESES]
+        .apply(pd.to_numeric, errors="coerce")
+        .fillna(0)
+        .to_numpy(dtype=float)
+    )
+
+    # (puestos × 12): salario mensual de cada puesto escalado por plantilla
+    nomina = (bruto / 12)[:, None] * personas
+
+    por_anio = (
+        pd.DataFrame(nomina, columns=range(1, 13))
+        .groupby(df_puestos["Año"].astype(int).to_numpy())
+        .sum()
+    )
+
+    df = por_anio.stack().rename("nomina_eur").reset_index()
+    df.columns = ["anio", "mes", "nomina_eur"]
+
+    df["ss_eur"] = df["nomina_eur"] * ss_empresa
+    df["coste_empresa_eur"] = df["nomina_eur"] + df["ss_eur"]
+
+    df[["nomina_eur", "ss_eur", "coste_empresa_eur"]] = (
+        df[["nomina_eur", "ss_eur", "coste_empresa_eur"]].round(2)
+    )
+    return df[COLUMNAS_NOMINA]
+
@@ -0,0 +1,211 @@
+import hashlib
+import json
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+from oyken.persistencia import bloqueo, escribir_atomico
+
+# =========================
+# HUELLA HUMANA ESTRUCTURAL
+# =========================
+# Barrido por eventos (sweep-line): cada intervalo aporta +1 al
+# empezar y -1 al terminar; ordenando los eventos y acumulando se
+# obtiene la cobertura simultánea exacta a resolución de minuto en
+# O(n log n). El día es cíclico: un tramo 22:00–02:00 cubre el final
+# y el principio del mismo día modelo.
+
+MINUTOS_DIA = 24 * 60
+
+
+def minutos(hora):
+    # "HH:MM" -> minutos desde medianoche. ValueError si no es válida.
+    hh, mm = map(int, hora.strip().split(":"))
+    if not (0 <= hh <= 24 and 0 <= mm < 60) or hh * 60 + mm > MINUTOS_DIA:
+        raise ValueError(f"Hora fuera de rango: {hora}")
+    return hh * 60 + mm
+
+
+def intervalo(inicio, fin):
+    # (inicio, fin) en minutos; si fin <= inicio el tramo cruza medianoche
+    i, f = minutos(inicio), minutos(fin)
+    if i == f:
+        return (i, i)
+    if f < i:
+        f += MINUTOS_DIA
+    return (i, f)
+
+
+def duracion_horas(inicio, fin):
+    i, f = intervalo(inicio, fin)
+    return (f - i) / 60
+
+
+def _partir_en_dia(intervalos):
+    # Los tramos que pasan de medianoche se parten en dos dentro del día
+    partes = []
+    for i, f in intervalos:
+        if f <= i:
+            continue
+        i, f = i % MINUTOS_DIA, i % MINUTOS_DIA + (f - i)
+        if f > MINUTOS_DIA:
+            partes.append((i, MINUTOS_DIA))
+            partes.append((0, f - MINUTOS_DIA))
+        else:
+            partes.append((i, f))
+    return partes
+
+
+def perfil_cobertura(intervalos):
+    # Segmentos (inicio, fin, activos) que cubren el día completo
+    partes = _partir_en_dia(intervalos)
+    if not partes:
+        return [(0, MINUTOS_DIA, 0)]
+
+    arr = np.asarray(partes, dtype=int)
+    posiciones = np.concatenate([arr[:, 0], arr[:, 1], [0, MINUTOS_DIA]])
+    deltas = np.concatenate([np.ones(len(arr), int), -np.ones(len(arr), int), [0, 0]])
+
+    # Intervalos semiabiertos [inicio, fin): a igual minuto, las
+    # salidas (-1) se procesan antes que las entradas (+1).
+    orden = np.lexsort((deltas, posiciones))
+    posiciones = posiciones[orden]
+    activos = np.cumsum(deltas[orden])
+
+    segmentos = []
+    for k in range(len(posiciones) - 1):
+        ini, fin = posiciones[k], posiciones[k + 1]
+        if fin == ini:
+            continue
+        if segmentos and segmentos[-1][2] == activos[k] and segmentos[-1][1] == ini:
+            segmentos[-1] = (segmentos[-1][0], int(fin), segmentos[-1][2])
+        else:
+            segmentos.append((int(ini), int(fin), int(activos[k])))
+
+    return segmentos
+
+
+def huella_estructural(intervalos):
+    perfil = perfil_cobertura(intervalos)
+    pico = max(a for _, _, a in perfil)
+
+    return {
+        "pico_simultaneo": pico,
+        "horas_diarias": sum(max(f - i, 0) for i, f in intervalos) / 60,
+        "franjas_pico": [(i, f) for i, f, a in perfil if a == pico and pico > 0],
+        "perfil": perfil
+    }
+
+
+def huellas_estructurales(modelos):
+    # Cálculo en bloque: {clave: [intervalos]} -> {clave: huella}
+    return {clave: huella_estructural(intervalos) for clave, intervalos in modelos.items()}
+
+
+def formato_hora(minuto):
+    # Minutos del día (0–1440) -> "HH:MM"; 1440 se muestra como 24:00
+    minuto = int(minuto)
+    return f"{minuto // 60:02d}:{minuto % 60:02d}"
+
+
+# =========================
+# MODELO PERSISTENTE (VERSIONADO)
+# =========================
+# Un JSON por fecha_modelo dentro de rrhh_core/. Listar versiones no
+# lee ningún archivo; solo se abre la versión que se pide. Cada
+# instantánea guarda un hash del contenido para detectar cambios sin
+# comparar el modelo completo (salida.fecha_modelo no cuenta como
+# contenido). Una instantánea nunca se sobrescribe: otra versión con
+# la misma fecha lleva sufijo (2026-03-01-02).
+
+MODELO_DIR = "rrhh_core"
+
+
+def _hash_modelo(modelo):
+    modelo = dict(modelo)
+    if isinstance(modelo.get("salida"), dict):
+        modelo["salida"] = {k: v for k, v in modelo["salida"].items() if k != "fecha_modelo"}
+    contenido = json.dumps(modelo, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def versiones_modelo(directorio=Path(".")):
+    carpeta = Path(directorio) / MODELO_DIR
+    if not carpeta.exists():
+        return []
+    return sorted(p.stem for p in carpeta.glob("*.json"))
+
+
+def cargar_modelo(version=None, directorio=Path(".")):
+    # Última versión por defecto; None si todavía no hay ninguna
+    versiones = versiones_modelo(directorio)
+    if not versiones:
+        return None
+
+    version = version or versiones[-1]
+    ruta = Path(directorio) / MODELO_DIR / f"{version}.json"
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)["modelo"]
+
+
+def guardar_modelo(modelo, fecha_modelo=None, directorio=Path(".")):
+    # Devuelve la versión escrita, o None si no hay cambios respecto
+    # a la última instantánea.
+    carpeta = Path(directorio) / MODELO_DIR
+    carpeta.mkdir(exist_ok=True)
+
+    huella = _hash_modelo(modelo)
+
+    with bloqueo(carpeta):
+        versiones = versiones_modelo(directorio)
+        if versiones:
+            with open(carpeta / f"{versiones[-1]}.json", encoding="utf-8") as f:
+                if json.load(f).get("hash") == huella:
+                    return None
+
+        fecha = fecha_modelo or date.today().isoformat()
+        version, n = fecha, 2
+        while (carpeta / f"{version}.json").exists():
+            version, n = f"{fecha}-{n:02d}", n + 1
+
+        snapshot = {
+            "version": version,
+            "guardado": datetime.now().isoformat(timespec="seconds"),
+            "hash": huella,
+            "modelo": modelo
+        }
+
+        def escribir(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+
+        escribir_atomico(carpeta / f"{version}.json", escribir)
+        return version
+
+
+def salida_vigente(directorio=Path(".")):
+    # Lo que consumen Breakeven y los procesos batch, sin pasar por la UI
+    modelo = cargar_modelo(directorio=directorio)
+    return (modelo or {}).get("salida", {})
+
+
+def _aplanar(valor, prefijo=""):
+    if isinstance(valor, dict):
+        plano = {}
+        for clave, sub in valor.items():
+            plano.update(_aplanar(sub, f"{prefijo}.{clave}" if prefijo else str(clave)))
+        return plano
+    if isinstance(valor, list):
+        return {prefijo: json.dumps(valor, sort_keys=True, ensure_ascii=False)}
+    return {prefijo: valor}
+
+
+def diferencias_modelo(antes, despues):
+    # [(ruta, valor_antes, valor_despues)] de las hojas que cambian
+    a, d = _aplanar(antes or {}), _aplanar(despues or {})
+    return [
+        (ruta, a.get(ruta), d.get(ruta))
+        for ruta in sorted(set(a) | set(d))
+        if a.get(ruta) != d.get(ruta)
+    ]
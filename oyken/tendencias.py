@@ -0,0 +1,359 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from math import isnan, nan, sqrt
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from oyken.persistencia import bloqueo, escribir_atomico
+from oyken.ventas import cargar_ventas, firma_ventas
+
+# =========================
+# MOTOR DE ESTADÍSTICAS MÓVILES (STREAMING)
+# =========================
+# Ventanas deslizantes con media/varianza de Welford: al entrar un día
+# se suma su valor y, si la ventana está llena, se resta el que sale.
+# Cada actualización es O(1) (O(tamaño) solo en dependencia de picos,
+# con ventana fija de 10), así que recorrer todo el histórico da la
+# serie completa de cada indicador en una sola pasada.
+#
+# Los indicadores replican los de Tendencias:
+#   cv_ventas      CV (%) de ventas_total_eur, últimos 7 días
+#   cv_ticket      CV (%) del ticket medio, últimos 7 días (sin NaN)
+#   vol_<turno>    desviación del ticket medio por turno, últimos 7 días
+#   pct_picos      % de ventas en días > media + 2σ, últimos 10 días
+
+TURNOS = ["manana", "tarde", "noche"]
+
+VENTANA_CV = 7
+VENTANA_PICOS = 10
+
+INDICADORES = ["cv_ventas", "cv_ticket", *[f"vol_{t}" for t in TURNOS], "pct_picos"]
+
+
+def ventana(tamano):
+    return {"tamano": tamano, "valores": deque(), "n": 0, "media": 0.0, "m2": 0.0}
+
+
+def _sumar(v, x):
+    if isnan(x):
+        return
+    v["n"] += 1
+    d = x - v["media"]
+    v["media"] += d / v["n"]
+    v["m2"] += d * (x - v["media"])
+
+
+def _restar(v, x):
+    if isnan(x):
+        return
+    v["n"] -= 1
+    if v["n"] == 0:
+        v["media"], v["m2"] = 0.0, 0.0
+        return
+    d = x - v["media"]
+    v["media"] -= d / v["n"]
+    v["m2"] = max(v["m2"] - d * (x - v["media"]), 0.0)
+
+
+def ventana_anadir(v, x):
+    x = float(x)
+    v["valores"].append(x)
+    _sumar(v, x)
+    if len(v["valores"]) > v["tamano"]:
+        _restar(v, v["valores"].popleft())
+
+
+def ventana_llena(v):
+    return len(v["valores"]) == v["tamano"]
+
+
+def ventana_std(v, ddof=1):
+    return sqrt(v["m2"] / (v["n"] - ddof)) if v["n"] > ddof else nan
+
+
+def ventana_cv(v):
+    # En %, NaN si la media no es positiva
+    if v["media"] <= 0:
+        return nan
+    return ventana_std(v) / v["media"] * 100
+
+
+# =========================
+# INDICADORES DE TENDENCIAS
+# =========================
+def estado_tendencias():
+    return {
+        "ventas": ventana(VENTANA_CV),
+        "ticket": ventana(VENTANA_CV),
+        "turnos": {t: ventana(VENTANA_CV) for t in TURNOS},
+        "picos": ventana(VENTANA_PICOS),
+    }
+
+
+def actualizar_tendencias(estado, fila):
+    # Incorpora un día (fila de ventas enriquecidas) y devuelve los
+    # indicadores a esa fecha; NaN mientras la ventana no esté llena.
+    ventana_anadir(estado["ventas"], fila["ventas_total_eur"])
+    ventana_anadir(estado["ticket"], fila["ticket_medio"])
+    ventana_anadir(estado["picos"], fila["ventas_total_eur"])
+
+    for t in TURNOS:
+        tickets = fila[f"tickets_{t}"]
+        ventana_anadir(estado["turnos"][t], fila[f"ventas_{t}_eur"] / tickets if tickets > 0 else nan)
+
+    indicadores = {
+        "cv_ventas": ventana_cv(estado["ventas"]) if ventana_llena(estado["ventas"]) else nan,
+        "cv_ticket": ventana_cv(estado["ticket"]) if ventana_llena(estado["ticket"]) else nan,
+    }
+    for t in TURNOS:
+        v = estado["turnos"][t]
+        indicadores[f"vol_{t}"] = ventana_std(v, ddof=0) if ventana_llena(v) else nan
+
+    indicadores["pct_picos"] = _pct_picos(estado["picos"]) if ventana_llena(estado["picos"]) else nan
+
+    return indicadores
+
+
+def _pct_picos(v):
+    media, desv = v["media"], ventana_std(v)
+    total = media * v["n"]
+    if media <= 0 or not desv > 0:
+        return 0.0
+    umbral = media + 2 * desv
+    return sum(x for x in v["valores"] if x > umbral) / total * 100
+
+
+def serie_tendencias(df, estado=None):
+    # Serie diaria de todos los indicadores sobre df (ordenado por
+    # fecha). Con un estado previo continúa donde se quedó.
+    estado = estado or estado_tendencias()
+    columnas = ["fecha", "ventas_total_eur", "ticket_medio",
+                *[f"ventas_{t}_eur" for t in TURNOS], *[f"tickets_{t}" for t in TURNOS]]
+
+    filas = [
+        {"fecha": fila["fecha"], **actualizar_tendencias(estado, fila)}
+        for fila in df[columnas].to_dict("records")
+    ]
+    return pd.DataFrame(filas, columns=["fecha", *INDICADORES])
+
+
+# =========================
+# BACKFILL HISTÓRICO (VECTORIZADO)
+# =========================
+# Mismos indicadores para todos los días en una sola pasada de
+# ventanas rolling de pandas, persistidos en una tabla compacta
+# (Parquet, float32). La página lee la tabla; solo se toca cuando el
+# almacén de ventas es más reciente que ella.
+#   python -m oyken.tendencias backfill [directorio]
+
+INDICADORES_FILE = "tendencias_indicadores.parquet"
+
+# Umbrales de alerta (por encima = alerta)
+UMBRALES_ALERTA = {
+    "cv_ventas": 40.0,
+    "cv_ticket": 25.0,
+    "pct_picos": 25.0,
+}
+
+
+def _cv_rolling(serie, tamano):
+    # Ventana de `tamano` filas; media y σ sobre los valores no nulos
+    ventana_ = serie.rolling(tamano, min_periods=1)
+    media = ventana_.mean()
+    cv = ventana_.std() / media.where(media > 0) * 100
+    cv.iloc[:tamano - 1] = nan
+    return cv
+
+
+def calcular_indicadores(df):
+    df = df.reset_index(drop=True)
+    ventas = df["ventas_total_eur"].astype(float)
+
+    out = pd.DataFrame({"fecha": df["fecha"]})
+    out["cv_ventas"] = _cv_rolling(ventas, VENTANA_CV)
+    out["cv_ticket"] = _cv_rolling(df["ticket_medio"].astype(float), VENTANA_CV)
+
+    for t in TURNOS:
+        tickets = df[f"tickets_{t}"]
+        tm = (df[f"ventas_{t}_eur"] / tickets.where(tickets > 0)).astype(float)
+        vol = tm.rolling(VENTANA_CV, min_periods=1).std(ddof=0)
+        vol.iloc[:VENTANA_CV - 1] = nan
+        out[f"vol_{t}"] = vol
+
+    # Dependencia de picos: matriz (días × 10) de la ventana de cada día
+    out["pct_picos"] = nan
+    if len(ventas) >= VENTANA_PICOS:
+        matriz = np.lib.stride_tricks.sliding_window_view(ventas.to_numpy(), VENTANA_PICOS)
+        media = matriz.mean(axis=1)
+        desv = matriz.std(axis=1, ddof=1)
+        umbral = (media + 2 * desv)[:, None]
+        picos = np.where(matriz > umbral, matriz, 0).sum(axis=1)
+
+        valido = (media > 0) & (desv > 0)
+        pct = np.zeros(len(matriz))
+        pct[valido] = picos[valido] / matriz.sum(axis=1)[valido] * 100
+        out.loc[VENTANA_PICOS - 1:, "pct_picos"] = pct
+
+    out[INDICADORES] = out[INDICADORES].astype("float32")
+    return out
+
+
+# =========================
+# TABLA PERSISTIDA (INCREMENTAL)
+# =========================
+# Junto a la tabla, tendencias_estado.json guarda el estado del motor
+# streaming tras el último día de la tabla, ese día y una huella de
+# las ventas hasta él. Si la huella coincide, los días nuevos entran
+# por actualizar_tendencias y se añaden al final; el backfill completo
+# queda para el arranque en frío y para cambios en días ya calculados.
+
+ESTADO_FILE = "tendencias_estado.json"
+
+COLUMNAS_ORIGEN = [
+    "ventas_total_eur",
+    *[f"ventas_{t}_eur" for t in TURNOS],
+    *[f"tickets_{t}" for t in TURNOS],
+]
+
+
+def ventas_tendencias(directorio=Path(".")):
+    # Solo las columnas de los indicadores (sin cruce de calendario);
+    # ticket_medio igual que en enriquecer_ventas
+    df = cargar_ventas(COLUMNAS_ORIGEN, directorio)
+    tickets = sum(df[f"tickets_{t}"] for t in TURNOS)
+    df["ticket_medio"] = df["ventas_total_eur"] / tickets.where(tickets > 0)
+    return df
+
+
+def _huella(df):
+    filas = pd.util.hash_pandas_object(df[["fecha", *COLUMNAS_ORIGEN]], index=False)
+    return hashlib.sha256(filas.to_numpy().tobytes()).hexdigest()
+
+
+def _estado_a_json(estado):
+    def plano(v):
+        return {**v, "valores": list(v["valores"])}
+
+    return {
+        "ventas": plano(estado["ventas"]),
+        "ticket": plano(estado["ticket"]),
+        "turnos": {t: plano(v) for t, v in estado["turnos"].items()},
+        "picos": plano(estado["picos"]),
+    }
+
+
+def _estado_de_json(datos):
+    def ventana_(v):
+        return {**v, "valores": deque(v["valores"])}
+
+    return {
+        "ventas": ventana_(datos["ventas"]),
+        "ticket": ventana_(datos["ticket"]),
+        "turnos": {t: ventana_(v) for t, v in datos["turnos"].items()},
+        "picos": ventana_(datos["picos"]),
+    }
+
+
+def _leer_estado(directorio):
+    ruta = directorio / ESTADO_FILE
+    if not ruta.exists():
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _guardar(directorio, indicadores, estado, df):
+    guardado = {
+        "ultima_fecha": df["fecha"].max().isoformat() if not df.empty else None,
+        "huella": _huella(df),
+        "motor": _estado_a_json(estado),
+    }
+
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(guardado, f)
+
+    escribir_atomico(directorio / ESTADO_FILE, escribir)
+    escribir_atomico(directorio / INDICADORES_FILE, lambda tmp: indicadores.to_parquet(tmp, index=False))
+
+
+def backfill_indicadores(directorio=Path("."), df=None):
+    directorio = Path(directorio)
+    df = ventas_tendencias(directorio) if df is None else df
+    indicadores = calcular_indicadores(df)
+
+    # Las ventanas solo dependen de los últimos días: el estado del
+    # motor sale de pasarle la cola del histórico
+    estado = estado_tendencias()
+    serie_tendencias(df.tail(max(VENTANA_CV, VENTANA_PICOS)), estado)
+
+    _guardar(directorio, indicadores, estado, df)
+    return indicadores
+
+
+def _marcar(ruta, firma):
+    # La tabla toma el mtime de las ventas que ha leído (no el de ahora):
+    # una venta guardada mientras se calculaba sigue siendo más reciente
+    if firma:
+        mtime = max(m for _, m, _ in firma)
+        os.utime(ruta, ns=(mtime, mtime))
+
+
+def leer_indicadores(directorio=Path(".")):
+    # Tabla persistida; con ventas más recientes se le añaden los días
+    # nuevos (o se rehace si ha cambiado un día ya calculado)
+    directorio = Path(directorio)
+    ruta = directorio / INDICADORES_FILE
+
+    with bloqueo(ruta):
+        firma = firma_ventas(directorio)
+        if ruta.exists() and all(mtime <= ruta.stat().st_mtime_ns for _, mtime, _ in firma):
+            return pd.read_parquet(ruta)
+
+        df = ventas_tendencias(directorio)
+        tabla = _actualizar_tabla(directorio, df)
+        _marcar(ruta, firma)
+        return tabla
+
+
+def _actualizar_tabla(directorio, df):
+    ruta = directorio / INDICADORES_FILE
+    guardado = _leer_estado(directorio)
+    if not ruta.exists() or not guardado or guardado["ultima_fecha"] is None:
+        return backfill_indicadores(directorio, df)
+
+    tabla = pd.read_parquet(ruta)
+    ultima = pd.Timestamp(guardado["ultima_fecha"])
+    previas = df["fecha"] <= ultima
+    if tabla.empty or tabla["fecha"].iloc[-1] != ultima or _huella(df[previas]) != guardado["huella"]:
+        return backfill_indicadores(directorio, df)
+
+    nuevas = df[~previas]
+    if nuevas.empty:
+        # Ventas reescritas sin cambios (compactación)
+        return tabla
+
+    estado = _estado_de_json(guardado["motor"])
+    serie = serie_tendencias(nuevas, estado)
+    serie[INDICADORES] = serie[INDICADORES].astype("float32")
+    tabla = pd.concat([tabla, serie], ignore_index=True)
+
+    _guardar(directorio, tabla, estado, df)
+    return tabla
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "backfill":
+        print("Uso: python -m oyken.tendencias backfill [directorio]")
+        sys.exit(1)
+
+    destino = Path(sys.argv[2]) if len(sys.argv) > 2 else Path(".")
+    t0 = time.perf_counter()
+    tabla = backfill_indicadores(destino)
+    print(f"{len(tabla):,} días → {destino / INDICADORES_FILE} ({time.perf_counter() - t0:.2f}s)")
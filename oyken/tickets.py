@@ -0,0 +1,323 @@
+import os
+import shutil
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from oyken.persistencia import bloqueo
+from oyken.ventas import COLUMNAS, upsert_ventas
+
+# =========================
+# ALMACÉN DE TICKETS (HECHOS)
+# =========================
+# Un ticket por fila (momento, importe, comensales) en Parquet,
+# particionado por mes del día operativo: tickets/AAAA-MM.parquet.
+# Un día vive entero en una partición, así que reimportar un periodo
+# solo reescribe los meses afectados y sustituye sus días completos.
+#
+# Las columnas por turno de las ventas diarias y cualquier franja horaria se
+# derivan de aquí bajo demanda. El agregado de cada partición se
+# guarda en memoria por (ruta, mtime, tamaño, criterio): al añadir un
+# mes solo se agrega ese mes, y cambiar los límites de turno no exige
+# volver a introducir datos (reagregar_ventas).
+
+TICKETS_DIR = "tickets"
+
+COLUMNAS_TICKETS = ["momento", "importe", "comensales"]
+
+TURNOS = ["manana", "tarde", "noche"]
+
+# Hora de inicio de cada turno (el último llega hasta CORTE_DIA)
+INICIO_TURNOS = {"manana": 6, "tarde": 16, "noche": 20}
+
+# El día operativo empieza a esta hora: la 01:30 es la noche anterior
+CORTE_DIA = 6
+
+
+def dia_operativo(momentos):
+    return (momentos - pd.Timedelta(hours=CORTE_DIA)).dt.normalize()
+
+
+def turno_de_hora(horas, inicio_turnos=INICIO_TURNOS):
+    # Array de horas (0-23) -> índice en TURNOS
+    limites = [inicio_turnos[t] for t in TURNOS]
+    idx = np.searchsorted(limites, horas, side="right") - 1
+    return np.where(idx < 0, len(TURNOS) - 1, idx)  # madrugada = noche
+
+
+# =========================
+# AGREGACIÓN A COLUMNAS DE VENTAS
+# =========================
+def sumas_por_turno(momento, importe, comensales=0, inicio_turnos=INICIO_TURNOS):
+    # (fecha, turno) -> ventas, tickets, comensales. Las devoluciones
+    # (importe negativo) restan ventas pero no cuentan como ticket.
+    return pd.DataFrame({
+        "fecha": dia_operativo(momento),
+        "turno": turno_de_hora(momento.dt.hour.to_numpy(), inicio_turnos),
+        "ventas": importe,
+        "tickets": (importe > 0).astype(int),
+        "comensales": comensales,
+    }).groupby(["fecha", "turno"]).sum()
+
+
+def columnas_ventas(sumas):
+    # Sumas (fecha, turno) -> una fila por día con las columnas de las ventas diarias
+    ancho = sumas.unstack("turno", fill_value=0).reindex(
+        columns=pd.MultiIndex.from_product([sumas.columns, range(len(TURNOS))]), fill_value=0
+    )
+
+    dias = pd.DataFrame(index=ancho.index)
+    for i, t in enumerate(TURNOS):
+        dias[f"ventas_{t}_eur"] = ancho[("ventas", i)].round(2)
+        dias[f"comensales_{t}"] = ancho[("comensales", i)].astype(int)
+        dias[f"tickets_{t}"] = ancho[("tickets", i)].astype(int)
+    dias["ventas_total_eur"] = dias[[f"ventas_{t}_eur" for t in TURNOS]].sum(axis=1).round(2)
+    dias["observaciones"] = ""
+    return dias.rename_axis("fecha").reset_index()[COLUMNAS]
+
+
+# =========================
+# PARTICIONES
+# =========================
+def _ruta_particion(directorio, anio, mes):
+    return Path(directorio) / TICKETS_DIR / f"{anio:04d}-{mes:02d}.parquet"
+
+
+def particiones(directorio=Path("."), desde=None, hasta=None):
+    # Partición = mes; el filtro por fecha se aplica por nombre
+    carpeta = Path(directorio) / TICKETS_DIR
+    if not carpeta.is_dir():
+        return []
+
+    rutas = sorted(carpeta.glob("????-??.parquet"))
+    if desde is not None:
+        rutas = [r for r in rutas if r.stem >= f"{pd.Timestamp(desde):%Y-%m}"]
+    if hasta is not None:
+        rutas = [r for r in rutas if r.stem <= f"{pd.Timestamp(hasta):%Y-%m}"]
+    return rutas
+
+
+def firma_tickets(directorio=Path(".")):
+    firma = []
+    for ruta in particiones(directorio):
+        info = ruta.stat()
+        firma.append((ruta.name, info.st_mtime_ns, info.st_size))
+    return tuple(firma)
+
+
+def _tipar(df):
+    return pd.DataFrame({
+        "momento": pd.to_datetime(df["momento"]).astype("datetime64[ms]"),
+        "importe": pd.to_numeric(df["importe"], errors="coerce").fillna(0).astype("float32"),
+        "comensales": pd.to_numeric(df["comensales"], errors="coerce").fillna(0).astype("int16"),
+    })
+
+
+def _fusionar(ruta, nuevos):
+    # Partición actual sin los días operativos que trae `nuevos`, más
+    # `nuevos`, en orden de momento
+    if ruta.exists():
+        previos = pd.read_parquet(ruta)
+        sustituidos = dia_operativo(previos["momento"]).isin(dia_operativo(nuevos["momento"]).unique())
+        nuevos = pd.concat([previos[~sustituidos], nuevos], ignore_index=True)
+    return nuevos.sort_values("momento", kind="stable").reset_index(drop=True)
+
+
+def _sin_dias(ruta, dias):
+    # Partición actual sin esos días operativos; None si no tenía ninguno
+    previos = pd.read_parquet(ruta)
+    retirados = dia_operativo(previos["momento"]).isin(dias)
+    if not retirados.any():
+        return None
+    return previos[~retirados].reset_index(drop=True)
+
+
+# =========================
+# ESCRITURA POR BLOQUES
+# =========================
+# Una importación no acumula los tickets en memoria: cada bloque se
+# vuelca a tickets/.importando-XXXX/AAAA-MM/parte-N.parquet y, al
+# final, cada mes se fusiona con su partición de uno en uno (en
+# memoria, como mucho un mes de tickets). Las particiones fusionadas
+# se preparan en la misma carpeta y se publican con os.replace solo
+# cuando el upsert de ventas ha ido bien, bajo el cerrojo del almacén:
+# tickets y ventas no quedan nunca a medias el uno del otro.
+
+# Carpetas temporales de importaciones interrumpidas que se limpian
+ANTIGUEDAD_TEMPORAL = 24 * 3600  # segundos
+
+
+def preparar_tickets(directorio=Path(".")):
+    # Carpeta temporal de la importación (dentro de tickets/, fuera
+    # del patrón de particiones)
+    carpeta = Path(directorio) / TICKETS_DIR
+    carpeta.mkdir(exist_ok=True)
+
+    limite = time.time() - ANTIGUEDAD_TEMPORAL
+    for vieja in carpeta.glob(".importando-*"):
+        if vieja.stat().st_mtime < limite:
+            shutil.rmtree(vieja, ignore_errors=True)
+
+    return Path(tempfile.mkdtemp(prefix=".importando-", dir=carpeta))
+
+
+def anadir_bloque(temporal, df):
+    df = _tipar(df)
+    dias = dia_operativo(df["momento"])
+    for (anio, mes), parte in df.groupby([dias.dt.year, dias.dt.month]):
+        carpeta = Path(temporal) / f"{anio:04d}-{mes:02d}"
+        carpeta.mkdir(exist_ok=True)
+        n = sum(1 for _ in carpeta.iterdir())
+        parte.to_parquet(carpeta / f"parte-{n:05d}.parquet", index=False)
+
+
+def volcar_tickets(temporal, directorio=Path("."), antes_de_publicar=None, retirar=()):
+    # Sustituye, en cada partición afectada, los días operativos que
+    # trae la importación. antes_de_publicar (el upsert de ventas) se
+    # ejecuta con todo preparado y antes de tocar el almacén: si falla,
+    # las particiones quedan como estaban. retirar: días cuyas ventas
+    # pasan a no venir de tickets (importación por turnos, registro a
+    # mano); sus tickets salen del almacén o reagregar_ventas pisaría
+    # esos totales con los de los tickets antiguos. Devuelve el número
+    # de particiones reescritas.
+    temporal = Path(temporal)
+    retirar = pd.DatetimeIndex(retirar).normalize().unique()
+    with bloqueo(Path(directorio) / TICKETS_DIR):
+        preparadas = []
+        importados = set()
+        for carpeta in sorted(p for p in temporal.iterdir() if p.is_dir()):
+            anio, mes = map(int, carpeta.name.split("-"))
+            importados.add((anio, mes))
+            nuevos = pd.concat(
+                [pd.read_parquet(p) for p in sorted(carpeta.glob("parte-*.parquet"))], ignore_index=True
+            )
+            ruta = _ruta_particion(directorio, anio, mes)
+            preparada = temporal / ruta.name
+            _fusionar(ruta, nuevos).to_parquet(preparada, index=False)
+            preparadas.append((preparada, ruta))
+
+        for anio, mes in sorted({(d.year, d.month) for d in retirar} - importados):
+            ruta = _ruta_particion(directorio, anio, mes)
+            restantes = _sin_dias(ruta, retirar) if ruta.exists() else None
+            if restantes is None:
+                continue
+            # Partición que se queda sin tickets: se borra al publicar
+            preparada = None
+            if not restantes.empty:
+                preparada = temporal / ruta.name
+                restantes.to_parquet(preparada, index=False)
+            preparadas.append((preparada, ruta))
+
+        if antes_de_publicar is not None:
+            antes_de_publicar()
+
+        for preparada, ruta in preparadas:
+            if preparada is None:
+                ruta.unlink()
+            else:
+                os.replace(preparada, ruta)
+    return len(preparadas)
+
+
+def guardar_tickets(df, directorio=Path(".")):
+    # Un lote ya en memoria: mismo camino que la importación por bloques
+    temporal = preparar_tickets(directorio)
+    try:
+        anadir_bloque(temporal, df)
+        return volcar_tickets(temporal, directorio)
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+def retirar_tickets(fechas, directorio=Path("."), antes_de_publicar=None):
+    # Días con ventas que ya no salen de tickets: antes_de_publicar
+    # (el guardado de esas ventas) y la baja de sus tickets van bajo el
+    # mismo cerrojo, como en la importación
+    temporal = preparar_tickets(directorio)
+    try:
+        return volcar_tickets(temporal, directorio, antes_de_publicar, retirar=fechas)
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+def leer_tickets(directorio=Path("."), desde=None, hasta=None):
+    rutas = particiones(directorio, desde, hasta)
+    if not rutas:
+        return pd.DataFrame(columns=COLUMNAS_TICKETS)
+
+    df = pd.concat([pd.read_parquet(r) for r in rutas], ignore_index=True)
+    return _entre(df, dia_operativo(df["momento"]), desde, hasta)
+
+
+def _entre(df, fechas, desde, hasta):
+    filas = pd.Series(True, index=df.index)
+    if desde is not None:
+        filas &= fechas >= pd.Timestamp(desde)
+    if hasta is not None:
+        filas &= fechas <= pd.Timestamp(hasta)
+    return df[filas].reset_index(drop=True)
+
+
+# =========================
+# AGREGADOS BAJO DEMANDA
+# =========================
+@lru_cache(maxsize=512)
+def _turnos_particion(ruta, mtime, tamano, inicios):
+    t = pd.read_parquet(ruta)
+    return sumas_por_turno(t["momento"], t["importe"].astype(float), t["comensales"], dict(inicios))
+
+
+@lru_cache(maxsize=512)
+def _franjas_particion(ruta, mtime, tamano, minutos):
+    t = pd.read_parquet(ruta)
+    momento = t["momento"]
+    minuto_dia = momento.dt.hour * 60 + momento.dt.minute
+    return pd.DataFrame({
+        "fecha": dia_operativo(momento),
+        "franja": (minuto_dia // minutos * minutos).astype("int16"),
+        "ventas_eur": t["importe"].astype(float),
+        "tickets": (t["importe"] > 0).astype(int),
+        "comensales": t["comensales"].astype(int),
+    }).groupby(["fecha", "franja"], as_index=False).sum().round({"ventas_eur": 2})
+
+
+def _por_particion(funcion, directorio, desde, hasta, criterio):
+    partes = []
+    for ruta in particiones(directorio, desde, hasta):
+        info = ruta.stat()
+        partes.append(funcion(str(ruta), info.st_mtime_ns, info.st_size, criterio))
+    return partes
+
+
+def ventas_por_turno(directorio=Path("."), desde=None, hasta=None, inicio_turnos=INICIO_TURNOS):
+    # Días con las columnas de las ventas diarias derivadas de los tickets
+    partes = _por_particion(
+        _turnos_particion, directorio, desde, hasta, tuple(sorted(inicio_turnos.items()))
+    )
+    if not partes:
+        return pd.DataFrame(columns=COLUMNAS)
+
+    dias = columnas_ventas(pd.concat(partes))
+    return _entre(dias, dias["fecha"], desde, hasta)
+
+
+def ventas_por_franja(directorio=Path("."), desde=None, hasta=None, minutos=60):
+    # (fecha, franja) con franja = minuto de inicio del tramo (0-1439)
+    partes = _por_particion(_franjas_particion, directorio, desde, hasta, minutos)
+    if not partes:
+        return pd.DataFrame(columns=["fecha", "franja", "ventas_eur", "tickets", "comensales"])
+
+    df = pd.concat(partes, ignore_index=True)
+    return _entre(df, df["fecha"], desde, hasta)
+
+
+def reagregar_ventas(directorio=Path("."), inicio_turnos=INICIO_TURNOS, desde=None, hasta=None):
+    # Rehace las columnas por turno de las ventas diarias con otros límites
+    dias = ventas_por_turno(directorio, desde, hasta, inicio_turnos)
+    if not dias.empty:
+        upsert_ventas(dias, directorio)
+    return len(dias)
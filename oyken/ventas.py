@@ -0,0 +1,267 @@
+import os
+import threading
+from contextlib import closing
+from pathlib import Path
+
+import pandas as pd
+
+from oyken import db
+from oyken.calendario import con_calendario
+from oyken.persistencia import bloqueo, cerrojo_hilo
+
+# =========================
+# ALMACÉN DE VENTAS DIARIAS
+# =========================
+# La base es la tabla `ventas` de oyken.db (clave primaria fecha, ver
+# oyken.db). Guardar una venta solo añade una línea al diario
+# (append-only) y el upsert por fecha se resuelve al leer: la última
+# línea de cada fecha gana sobre la base. La compactación congela el
+# diario y lo vuelca con un único upsert transaccional de esas filas;
+# no reescribe el histórico, así que su coste depende del diario y no
+# de los años guardados. Se lanza cuando el diario pasa de
+# MAX_BYTES_DIARIO o al abrir la app (compactar_si_conviene).
+
+JOURNAL_FILE = "ventas_journal.csv"              # diario append-only
+PENDIENTE_FILE = "ventas_journal.compactando.csv"  # diario en compactación
+
+MAX_BYTES_DIARIO = 64 * 1024  # ~500 días de diario
+
+COLUMNAS = db.COLUMNAS_VENTAS
+
+COLUMNAS_NUMERICAS = [c for c in COLUMNAS if c not in ("fecha", "observaciones")]
+COLUMNAS_CONTEO = [c for c in COLUMNAS_NUMERICAS if c.startswith(("comensales_", "tickets_"))]
+
+
+# =========================
+# NORMALIZACIÓN
+# =========================
+def _normalizar(df, columnas=None):
+    columnas = columnas or COLUMNAS
+
+    for col in columnas:
+        if col not in df.columns:
+            df[col] = 0 if col in COLUMNAS_NUMERICAS else ""
+
+    df = df[columnas].copy()
+
+    if "fecha" in columnas:
+        df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce")
+    for col in columnas:
+        if col in COLUMNAS_NUMERICAS:
+            # Conteos enteros e importes en float, vengan de la base o del diario
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+            df[col] = df[col].round().astype("int64") if col in COLUMNAS_CONTEO else df[col].astype(float)
+    if "observaciones" in columnas:
+        df["observaciones"] = df["observaciones"].fillna("").astype(str)
+
+    return df
+
+
+def _leer_base(directorio, columnas, desde=None, hasta=None):
+    # Consulta por rango sobre la clave primaria fecha
+    if not db.existe(directorio):
+        return pd.DataFrame(columns=columnas)
+
+    with closing(db.conectar(directorio)) as con:
+        return db.leer_rango_fechas(con, "ventas", desde, hasta, columnas)
+
+
+def _leer_diario(ruta, columnas):
+    if not ruta.exists() or ruta.stat().st_size == 0:
+        return None
+
+    df = pd.read_csv(ruta)
+    return df[[c for c in columnas if c in df.columns]]
+
+
+# =========================
+# LECTURA
+# =========================
+def cargar_ventas(columnas=None, directorio=Path("."), desde=None, hasta=None):
+    # Lectura con poda de columnas; "fecha" siempre se incluye
+    # porque es la clave del upsert. desde/hasta (inclusivos) acotan
+    # la consulta a la base y el diario.
+    directorio = Path(directorio)
+    columnas = list(columnas) if columnas else list(COLUMNAS)
+    if "fecha" not in columnas:
+        columnas = ["fecha", *columnas]
+
+    # Si una compactación termina a mitad de lectura (la base cambia y
+    # el diario congelado desaparece) se vuelve a leer.
+    for _ in range(5):
+        firma = firma_ventas(directorio)
+        partes = [_leer_base(directorio, columnas, desde, hasta)]
+        for nombre in (PENDIENTE_FILE, JOURNAL_FILE):
+            diario = _leer_diario(directorio / nombre, columnas)
+            if diario is not None:
+                partes.append(diario)
+        if firma_ventas(directorio) == firma:
+            break
+
+    partes = [_normalizar(p, columnas) for p in partes]
+    df = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+
+    df = df.dropna(subset=["fecha"])
+    if desde is not None:
+        df = df[df["fecha"] >= pd.Timestamp(desde)]
+    if hasta is not None:
+        df = df[df["fecha"] <= pd.Timestamp(hasta)]
+    df = df.drop_duplicates(subset=["fecha"], keep="last")
+    return df.sort_values("fecha").reset_index(drop=True)
+
+
+# =========================
+# ESCRITURA (O(1))
+# =========================
+def registrar_venta(registro, directorio=Path(".")):
+    # Añade una sola línea al diario; no reescribe el histórico.
+    ruta = Path(directorio) / JOURNAL_FILE
+
+    fila = _normalizar(pd.DataFrame([registro]))
+    fila["fecha"] = fila["fecha"].dt.strftime("%Y-%m-%d")
+
+    # El cerrojo evita que la línea caiga en un diario que la
+    # compactación acaba de congelar.
+    with bloqueo(ruta):
+        nuevo = not ruta.exists() or ruta.stat().st_size == 0
+        fila.to_csv(ruta, mode="a", header=nuevo, index=False)
+
+
+# =========================
+# COMPACTACIÓN
+# =========================
+def _volcar(directorio, extra=None):
+    # Diario congelado (+ extra, que gana por fecha) -> upsert en la
+    # base. Se llama con los dos cerrojos tomados.
+    diario = directorio / JOURNAL_FILE
+    pendiente = directorio / PENDIENTE_FILE
+
+    if diario.exists() and not pendiente.exists():
+        with bloqueo(diario):
+            os.replace(diario, pendiente)
+
+    partes = []
+    congelado = _leer_diario(pendiente, COLUMNAS)
+    if congelado is not None:
+        partes.append(_normalizar(congelado))
+    if extra is not None:
+        partes.append(extra)
+
+    # La transacción es el punto de confirmación: si falla antes, el
+    # diario congelado sigue ahí y se vuelca en la siguiente
+    if partes:
+        df = pd.concat(partes, ignore_index=True).dropna(subset=["fecha"])
+        df = df.drop_duplicates(subset=["fecha"], keep="last")
+        with closing(db.conectar(directorio)) as con:
+            db.upsert(con, "ventas", df)
+
+    if pendiente.exists():
+        pendiente.unlink()
+
+
+def compactar_ventas(directorio=Path(".")):
+    directorio = Path(directorio)
+    diario = directorio / JOURNAL_FILE
+    pendiente = directorio / PENDIENTE_FILE
+
+    # Cerrojo de hilo (para no lanzar dos desde la misma app) y de
+    # archivo (para otros procesos que compacten el mismo directorio).
+    with cerrojo_hilo("compactacion", directorio), bloqueo(pendiente):
+        # Mientras haya diario, se congela (rename atómico) y se vuelca.
+        # Las ventas guardadas durante el volcado van a un diario nuevo.
+        while diario.exists() or pendiente.exists():
+            _volcar(directorio)
+
+
+def upsert_ventas(df_dias, directorio=Path(".")):
+    # Alta/sustitución en bloque de días completos (importaciones): el
+    # diario se vuelca antes y los días del bloque van en el mismo
+    # upsert, ganando a él. Si un día ya existía conserva sus
+    # observaciones cuando el bloque no trae.
+    directorio = Path(directorio)
+    nuevos = _normalizar(df_dias.copy()).dropna(subset=["fecha"])
+
+    with cerrojo_hilo("compactacion", directorio), bloqueo(directorio / PENDIENTE_FILE):
+        if not nuevos.empty:
+            previas = cargar_ventas(
+                ["observaciones"], directorio=directorio,
+                desde=nuevos["fecha"].min(), hasta=nuevos["fecha"].max()
+            ).set_index("fecha")["observaciones"]
+            sin_obs = nuevos["observaciones"] == ""
+            nuevos.loc[sin_obs, "observaciones"] = (
+                nuevos.loc[sin_obs, "fecha"].map(previas).fillna("").to_numpy()
+            )
+        _volcar(directorio, nuevos)
+        return nuevos
+
+
+def compactar_en_segundo_plano(directorio=Path(".")):
+    # Si ya hay una compactación en curso no se lanza otra: el diario
+    # pendiente se vuelca en la siguiente y la lectura ya lo incluye.
+    if cerrojo_hilo("compactacion", directorio).locked():
+        return None
+
+    hilo = threading.Thread(
+        target=compactar_ventas,
+        kwargs={"directorio": Path(directorio)},
+        daemon=True
+    )
+    hilo.start()
+    return hilo
+
+
+def bytes_diario(directorio=Path(".")):
+    ruta = Path(directorio) / JOURNAL_FILE
+    return ruta.stat().st_size if ruta.exists() else 0
+
+
+def compactar_si_conviene(directorio=Path("."), al_abrir=False):
+    # Tras un guardado solo compensa volcar si el diario ya es grande;
+    # al abrir la app (al_abrir=True) se vuelca cualquier diario.
+    tamano = bytes_diario(directorio)
+    if al_abrir:
+        if tamano == 0 and not (Path(directorio) / PENDIENTE_FILE).exists():
+            return None
+    elif tamano < MAX_BYTES_DIARIO:
+        return None
+    return compactar_en_segundo_plano(directorio)
+
+
+# =========================
+# FIRMA Y ENRIQUECIMIENTO
+# =========================
+def firma_ventas(directorio=Path(".")):
+    # (origen, mtime, tamaño) de todo lo que compone el histórico: la
+    # última escritura de la base (hora, filas) y los diarios. Cambia
+    # en cuanto se guarda o compacta una venta.
+    directorio = Path(directorio)
+    firma = []
+    base = db.version_tabla(directorio, "ventas")
+    if base:
+        firma.append((db.DB_FILE, *base))
+    for nombre in (PENDIENTE_FILE, JOURNAL_FILE):
+        ruta = directorio / nombre
+        if ruta.exists():
+            info = ruta.stat()
+            firma.append((nombre, info.st_mtime_ns, info.st_size))
+    return tuple(firma)
+
+
+def enriquecer_ventas(df, directorio=Path(".")):
+    # Columnas derivadas que todas las páginas temporales necesitan:
+    # las de calendario se cruzan desde la dimensión, no se recalculan
+    df = df.sort_values("fecha").reset_index(drop=True)
+    df = con_calendario(df, directorio)
+
+    df["tickets_total"] = (
+        df["tickets_manana"] +
+        df["tickets_tarde"] +
+        df["tickets_noche"]
+    )
+
+    # NaN (no 0) en días sin tickets, para no sesgar medias ni CV
+    df["ticket_medio"] = (
+        df["ventas_total_eur"] / df["tickets_total"].where(df["tickets_total"] > 0)
+    )
+
+    return df
@@ -1,8 +1,20 @@
 import streamlit as st
 import pandas as pd
-from pathlib import Path
 from datetime import date
 
+from oyken.cache import local_activo, venta_del_dia, ventas_enriquecidas
+from oyken.calendario import DOW_ES, MESES_ES, fecha_comparable
+from oyken.consolidacion import consolidar_todo_en_segundo_plano
+from oyken.importacion import ErrorImportacion, importar_pos
+from oyken.mensual import (
+    consolidar_en_segundo_plano,
+    consolidar_registro,
+    consolidar_ventas_mensuales,
+    leer_ventas_mensuales
+)
+from oyken.tickets import retirar_tickets
+from oyken.ventas import compactar_si_conviene, firma_ventas, registrar_venta
+
 # =========================
 # CONFIGURACIÓN
 # =========================
@@ -12,35 +24,14 @@ st.title("OYKEN · Control Operativo")
 st.markdown("**Entra en Oyken. En 30 segundos entiendes mejor tu negocio.**")
 st.caption("Sistema automático basado en criterio operativo")
 
-DATA_FILE = Path("ventas.csv")
-
-DOW_ES = {
-    0: "Lunes", 1: "Martes", 2: "Miércoles",
-    3: "Jueves", 4: "Viernes", 5: "Sábado", 6: "Domingo"
-
-}
-
-COLUMNAS = [
-    "fecha",
-    "ventas_manana_eur", "ventas_tarde_eur", "ventas_noche_eur", "ventas_total_eur",
-    "comensales_manana", "comensales_tarde", "comensales_noche",
-    "tickets_manana", "tickets_tarde", "tickets_noche",
-    "observaciones"
-]
+DIRECTORIO = local_activo()
 
 # =========================
 # CARGA DE DATOS
 # =========================
-if DATA_FILE.exists():
-    df = pd.read_csv(DATA_FILE, parse_dates=["fecha"])
-else:
-    df = pd.DataFrame(columns=COLUMNAS)
-
-for col in COLUMNAS:
-    if col not in df.columns:
-        df[col] = 0 if col not in ["fecha", "observaciones"] else ""
-
-df["observaciones"] = df["observaciones"].fillna("")
+# Cada bloque es un fragmento (st.fragment) que pide a la caché solo
+# lo que necesita: interactuar con un bloque no vuelve a ejecutar
+# los demás. Guardar una venta sí relanza la página completa.
 
 # =========================
 # REGISTRO DIARIO
@@ -88,7 +79,7 @@ with st.form("form_ventas", clear_on_submit=True):
 if guardar:
     total = vm + vt + vn
 
-    nueva = pd.DataFrame([{
+    registro = {
         "fecha": pd.to_datetime(fecha),
         "ventas_manana_eur": vm,
         "ventas_tarde_eur": vt,
@@ -101,461 +92,461 @@ if guardar:
         "tickets_tarde": tt,
         "tickets_noche": tn,
         "observaciones": observaciones.strip()
-    }])
-
-    df = pd.concat([df, nueva], ignore_index=True)
-    df = df.drop_duplicates(subset=["fecha"], keep="last")
-    df.to_csv(DATA_FILE, index=False)
+    }
+
+    # Histórico en memoria (acierto de caché: aún no ha cambiado la
+    # firma); se toma antes de guardar para no releer el almacén
+    historico = ventas_enriquecidas(DIRECTORIO)
+    # El día deja de venir de tickets: los que hubiera se retiran junto
+    # con el guardado, o una reagregación por turnos lo pisaría
+    retirar_tickets([registro["fecha"]], DIRECTORIO, lambda: registrar_venta(registro, DIRECTORIO))
+
+    # Solo se recalcula el (anio, mes) de la venta guardada, con el
+    # registro superpuesto al histórico. Con la firma ya al día, el
+    # rerun no lanza además la consolidación completa.
+    consolidar_registro(historico, registro, DIRECTORIO)
+    st.session_state.firma_ventas_mensuales = (str(DIRECTORIO), firma_ventas(DIRECTORIO))
+
+    # Guardado O(1): el volcado a oyken.db se hace en segundo plano
+    # y solo cuando el diario ha crecido lo bastante
+    compactar_si_conviene(DIRECTORIO)
     st.success("Venta guardada correctamente")
     st.rerun()
 
-if df.empty:
+# =========================
+# IMPORTACIÓN MASIVA (TPV)
+# =========================
+# Exportación de tickets o de turnos: se agrega por bloques y se
+# sustituyen los días importados en una sola escritura.
+with st.expander("Importación masiva desde TPV"):
+    archivo_tpv = st.file_uploader(
+        "Exportación del TPV (CSV o JSON Lines)",
+        type=["csv", "json", "jsonl", "ndjson"]
+    )
+    st.caption(
+        "Tickets: fecha_hora, importe, comensales · "
+        "Turnos: fecha, turno, importe, tickets, comensales"
+    )
+
+    if archivo_tpv is not None and st.button("Importar ventas"):
+        try:
+            with st.spinner("Importando…"):
+                informe = importar_pos(archivo_tpv, DIRECTORIO, nombre=archivo_tpv.name)
+        except ErrorImportacion as e:
+            st.error(f"No se ha importado nada: {e}")
+        else:
+            consolidar_todo_en_segundo_plano(DIRECTORIO)
+            st.success(
+                f"{informe['dias']:,} días importados "
+                f"({informe['desde']:%d/%m/%Y} → {informe['hasta']:%d/%m/%Y}) · "
+                f"{informe['filas']:,} filas en {informe['segundos']:.1f}s"
+            )
+            if informe["rechazadas"]:
+                st.warning(f"{informe['rechazadas']:,} filas descartadas (fecha o importe no válidos)")
+
+if not firma_ventas(DIRECTORIO):
     st.info("Aún no hay ventas registradas.")
     st.stop()
 
-# =========================
-# PREPARACIÓN ISO (REGLA CORRECTA GRANDES CADENAS)
-# =========================
-df = df.sort_values("fecha")
-iso = df["fecha"].dt.isocalendar()
-df["iso_year"] = iso.year
-df["iso_week"] = iso.week
-df["weekday"] = df["fecha"].dt.weekday
-df["dow"] = df["weekday"].map(DOW_ES)
+fecha_hoy = pd.to_datetime(date.today())
 
 # =========================
 # BLOQUE HOY
 # =========================
-st.divider()
-st.subheader("HOY")
-
-fecha_hoy = pd.to_datetime(date.today())
-iso_hoy = fecha_hoy.isocalendar()
-
-inicio_dia = fecha_hoy.normalize()
-fin_dia = inicio_dia + pd.Timedelta(days=1)
+# Fragmento independiente: solo lee la fila de hoy y la de su
+# comparable (venta_del_dia), no el histórico completo.
+@st.fragment
+def bloque_hoy():
+    st.divider()
+    st.subheader("HOY")
+
+    fila = venta_del_dia(fecha_hoy, DIRECTORIO)
+
+    def fila_o_cero(col):
+        return fila[col] if fila else 0
+
+    # --- HOY ---
+    vm_h = fila_o_cero("ventas_manana_eur")
+    vt_h = fila_o_cero("ventas_tarde_eur")
+    vn_h = fila_o_cero("ventas_noche_eur")
+    total_h = fila_o_cero("ventas_total_eur")
+
+    cm_h = fila_o_cero("comensales_manana")
+    ct_h = fila_o_cero("comensales_tarde")
+    cn_h = fila_o_cero("comensales_noche")
+
+    tm_h = fila_o_cero("tickets_manana")
+    tt_h = fila_o_cero("tickets_tarde")
+    tn_h = fila_o_cero("tickets_noche")
+
+    # Ticket medio HOY
+    tmed_m_h = vm_h / tm_h if tm_h > 0 else 0
+    tmed_t_h = vt_h / tt_h if tt_h > 0 else 0
+    tmed_n_h = vn_h / tn_h if tn_h > 0 else 0
+    tmed_tot_h = total_h / (tm_h + tt_h + tn_h) if (tm_h + tt_h + tn_h) > 0 else 0
+
+    # =========================
+    # DOW AÑO ANTERIOR (MISMA SEMANA ISO)
+    # =========================
+    # Misma clave de comparable que Comparables (oyken.calendario)
+    comp = venta_del_dia(fecha_comparable([fecha_hoy])[0], DIRECTORIO)
+
+    if comp is None:
+        fecha_dow_txt = "Sin histórico comparable"
+
+        vm_a = vt_a = vn_a = total_a = 0.0
+        cm_a = ct_a = cn_a = 0
+        tm_a = tt_a = tn_a = 0
+    else:
+        fecha_dow_txt = f"{DOW_ES[comp['weekday']]} · {comp['fecha'].strftime('%d/%m/%Y')}"
+
+        vm_a = comp["ventas_manana_eur"]
+        vt_a = comp["ventas_tarde_eur"]
+        vn_a = comp["ventas_noche_eur"]
+        total_a = comp["ventas_total_eur"]
+
+        cm_a = comp["comensales_manana"]
+        ct_a = comp["comensales_tarde"]
+        cn_a = comp["comensales_noche"]
+
+        tm_a = comp["tickets_manana"]
+        tt_a = comp["tickets_tarde"]
+        tn_a = comp["tickets_noche"]
+
+    # Ticket medio DOW
+    tmed_m_a = vm_a / tm_a if tm_a > 0 else 0
+    tmed_t_a = vt_a / tt_a if tt_a > 0 else 0
+    tmed_n_a = vn_a / tn_a if tn_a > 0 else 0
+    tmed_tot_a = total_a / (tm_a + tt_a + tn_a) if (tm_a + tt_a + tn_a) > 0 else 0
+
+    # =========================
+    # FUNCIONES VARIACIÓN
+    # =========================
+    def diff_pct(actual, base):
+        d = actual - base
+        p = (d / base * 100) if base > 0 else (100.0 if actual > 0 else 0.0)
+        return d, p
+
+    def color(v):
+        return "green" if v > 0 else "red" if v < 0 else "gray"
+
+    def icono(p):
+        if p > 25:
+            return "👁️"
+        elif 1 <= p <= 25:
+            return "↑"
+        elif -25 <= p <= -1:
+            return "↓"
+        elif p < -25:
+            return "⚠️"
+        else:
+            return ""
+
+
+    # =========================
+    # CÁLCULOS VARIACIÓN
+    # =========================
+    # Ventas
+    d_vm, p_vm = diff_pct(vm_h, vm_a)
+    d_vt, p_vt = diff_pct(vt_h, vt_a)
+    d_vn, p_vn = diff_pct(vn_h, vn_a)
+    d_tot, p_tot = diff_pct(total_h, total_a)
+
+    # Comensales
+    d_cm = cm_h - cm_a
+    d_ct = ct_h - ct_a
+    d_cn = cn_h - cn_a
+
+    # Tickets
+    d_tm = tm_h - tm_a
+    d_tt = tt_h - tt_a
+    d_tn = tn_h - tn_a
+
+    # Ticket medio
+    d_tmed_m, p_tmed_m = diff_pct(tmed_m_h, tmed_m_a)
+    d_tmed_t, p_tmed_t = diff_pct(tmed_t_h, tmed_t_a)
+    d_tmed_n, p_tmed_n = diff_pct(tmed_n_h, tmed_n_a)
+    d_tmed_tot, p_tmed_tot = diff_pct(tmed_tot_h, tmed_tot_a)
+
+    # =========================
+    # DISPOSICIÓN VISUAL
+    # =========================
+    c1, c2, c3 = st.columns(3)
 
-venta_hoy = df[
-    (df["fecha"] >= inicio_dia) &
-    (df["fecha"] < fin_dia)
-]
+    # HOY
+    with c1:
+        st.markdown("**HOY**")
+        st.caption(f"{DOW_ES[fecha_hoy.weekday()]} · {fecha_hoy.strftime('%d/%m/%Y')}")
 
-def fila_o_cero(col):
-    return fila[col] if not venta_hoy.empty else 0
+        st.write("**Mañana**")
+        st.write(f"{vm_h:,.2f} €")
+        st.caption(f"{cm_h} comensales · {tm_h} tickets")
+        st.caption(f"Ticket medio: {tmed_m_h:,.2f} €")
 
-if not venta_hoy.empty:
-    fila = venta_hoy.iloc[0]
+        st.write("**Tarde**")
+        st.write(f"{vt_h:,.2f} €")
+        st.caption(f"{ct_h} comensales · {tt_h} tickets")
+        st.caption(f"Ticket medio: {tmed_t_h:,.2f} €")
 
-# --- HOY ---
-vm_h = fila_o_cero("ventas_manana_eur")
-vt_h = fila_o_cero("ventas_tarde_eur")
-vn_h = fila_o_cero("ventas_noche_eur")
-total_h = fila_o_cero("ventas_total_eur")
+        st.write("**Noche**")
+        st.write(f"{vn_h:,.2f} €")
+        st.caption(f"{cn_h} comensales · {tn_h} tickets")
+        st.caption(f"Ticket medio: {tmed_n_h:,.2f} €")
 
-cm_h = fila_o_cero("comensales_manana")
-ct_h = fila_o_cero("comensales_tarde")
-cn_h = fila_o_cero("comensales_noche")
+        st.markdown("---")
+        st.markdown(f"### TOTAL HOY\n{total_h:,.2f} €")
+        st.caption(f"Ticket medio: {tmed_tot_h:,.2f} €")
 
-tm_h = fila_o_cero("tickets_manana")
-tt_h = fila_o_cero("tickets_tarde")
-tn_h = fila_o_cero("tickets_noche")
+    # DOW
+    with c2:
+        st.markdown("**DOW (Año anterior)**")
+        st.caption(fecha_dow_txt)
 
-# Ticket medio HOY
-tmed_m_h = vm_h / tm_h if tm_h > 0 else 0
-tmed_t_h = vt_h / tt_h if tt_h > 0 else 0
-tmed_n_h = vn_h / tn_h if tn_h > 0 else 0
-tmed_tot_h = total_h / (tm_h + tt_h + tn_h) if (tm_h + tt_h + tn_h) > 0 else 0
+        st.write("**Mañana**")
+        st.write(f"{vm_a:,.2f} €")
+        st.caption(f"{cm_a} comensales · {tm_a} tickets")
+        st.caption(f"Ticket medio: {tmed_m_a:,.2f} €")
 
-# =========================
-# DOW AÑO ANTERIOR (MISMA SEMANA ISO)
-# =========================
-dow_ant = df[
-    (df["iso_year"] == iso_hoy.year - 1) &
-    (df["iso_week"] == iso_hoy.week) &
-    (df["weekday"] == fecha_hoy.weekday())
-]
-
-if dow_ant.empty:
-    fecha_dow_txt = "Sin histórico comparable"
-
-    vm_a = vt_a = vn_a = total_a = 0.0
-    cm_a = ct_a = cn_a = 0
-    tm_a = tt_a = tn_a = 0
-else:
-    comp = dow_ant.iloc[0]
-    fecha_dow_txt = f"{DOW_ES[comp['weekday']]} · {comp['fecha'].strftime('%d/%m/%Y')}"
-
-    vm_a = comp["ventas_manana_eur"]
-    vt_a = comp["ventas_tarde_eur"]
-    vn_a = comp["ventas_noche_eur"]
-    total_a = comp["ventas_total_eur"]
-
-    cm_a = comp["comensales_manana"]
-    ct_a = comp["comensales_tarde"]
-    cn_a = comp["comensales_noche"]
-
-    tm_a = comp["tickets_manana"]
-    tt_a = comp["tickets_tarde"]
-    tn_a = comp["tickets_noche"]
-
-# Ticket medio DOW
-tmed_m_a = vm_a / tm_a if tm_a > 0 else 0
-tmed_t_a = vt_a / tt_a if tt_a > 0 else 0
-tmed_n_a = vn_a / tn_a if tn_a > 0 else 0
-tmed_tot_a = total_a / (tm_a + tt_a + tn_a) if (tm_a + tt_a + tn_a) > 0 else 0
+        st.write("**Tarde**")
+        st.write(f"{vt_a:,.2f} €")
+        st.caption(f"{ct_a} comensales · {tt_a} tickets")
+        st.caption(f"Ticket medio: {tmed_t_a:,.2f} €")
 
-# =========================
-# FUNCIONES VARIACIÓN
-# =========================
-def diff_pct(actual, base):
-    d = actual - base
-    p = (d / base * 100) if base > 0 else (100.0 if actual > 0 else 0.0)
-    return d, p
-
-def color(v):
-    return "green" if v > 0 else "red" if v < 0 else "gray"
-
-def icono(p):
-    if p > 25:
-        return "👁️"
-    elif 1 <= p <= 25:
-        return "↑"
-    elif -25 <= p <= -1:
-        return "↓"
-    elif p < -25:
-        return "⚠️"
-    else:
-        return ""
+        st.write("**Noche**")
+        st.write(f"{vn_a:,.2f} €")
+        st.caption(f"{cn_a} comensales · {tn_a} tickets")
+        st.caption(f"Ticket medio: {tmed_n_a:,.2f} €")
 
+        st.markdown("---")
+        st.markdown(f"### TOTAL DOW\n{total_a:,.2f} €")
+        st.caption(f"Ticket medio: {tmed_tot_a:,.2f} €")
 
-# =========================
-# CÁLCULOS VARIACIÓN
-# =========================
-# Ventas
-d_vm, p_vm = diff_pct(vm_h, vm_a)
-d_vt, p_vt = diff_pct(vt_h, vt_a)
-d_vn, p_vn = diff_pct(vn_h, vn_a)
-d_tot, p_tot = diff_pct(total_h, total_a)
-
-# Comensales
-d_cm = cm_h - cm_a
-d_ct = ct_h - ct_a
-d_cn = cn_h - cn_a
-
-# Tickets
-d_tm = tm_h - tm_a
-d_tt = tt_h - tt_a
-d_tn = tn_h - tn_a
-
-# Ticket medio
-d_tmed_m, p_tmed_m = diff_pct(tmed_m_h, tmed_m_a)
-d_tmed_t, p_tmed_t = diff_pct(tmed_t_h, tmed_t_a)
-d_tmed_n, p_tmed_n = diff_pct(tmed_n_h, tmed_n_a)
-d_tmed_tot, p_tmed_tot = diff_pct(tmed_tot_h, tmed_tot_a)
+    # VARIACIÓN
+    with c3:
+        st.markdown("**VARIACIÓN**")
+        st.caption("Vs. DOW año anterior")
+
+        st.write("**Mañana**")
+        st.markdown(
+            f"<span style='color:{color(d_vm)}'>{d_vm:+,.2f} € ({p_vm:+.1f}%) {icono(p_vm)}</span>",
+            unsafe_allow_html=True
+        )
+        st.caption(f"{d_cm:+} comensales · {d_tm:+} tickets")
+        st.caption(
+            f"Ticket medio: {d_tmed_m:+.2f} € ({p_tmed_m:+.1f}%) {icono(p_tmed_m)}"
+        )
+
+        st.write("**Tarde**")
+        st.markdown(
+            f"<span style='color:{color(d_vt)}'>{d_vt:+,.2f} € ({p_vt:+.1f}%) {icono(p_vt)}</span>",
+            unsafe_allow_html=True
+        )
+        st.caption(f"{d_ct:+} comensales · {d_tt:+} tickets")
+        st.caption(
+            f"Ticket medio: {d_tmed_t:+.2f} € ({p_tmed_t:+.1f}%) {icono(p_tmed_t)}"
+        )
+
+        st.write("**Noche**")
+        st.markdown(
+            f"<span style='color:{color(d_vn)}'>{d_vn:+,.2f} € ({p_vn:+.1f}%) {icono(p_vn)}</span>",
+            unsafe_allow_html=True
+        )
+        st.caption(f"{d_cn:+} comensales · {d_tn:+} tickets")
+        st.caption(
+            f"Ticket medio: {d_tmed_n:+.2f} € ({p_tmed_n:+.1f}%) {icono(p_tmed_n)}"
+        )
+
+        st.markdown("---")
+        st.markdown(
+            f"<span style='color:{color(d_tot)}'>"
+            f" TOTAL {d_tot:+,.2f} € ({p_tot:+.1f}%)"
+            f"</span>",
+            unsafe_allow_html=True
+        )
+        st.caption(
+            f"Ticket medio: {d_tmed_tot:+.2f} € ({p_tmed_tot:+.1f}%) {icono(p_tmed_tot)}"
+        )
+
+
+bloque_hoy()
 
 # =========================
-# DISPOSICIÓN VISUAL
+# BITÁCORA DEL MES
 # =========================
-c1, c2, c3 = st.columns(3)
-
-# HOY
-with c1:
-    st.markdown("**HOY**")
-    st.caption(f"{DOW_ES[fecha_hoy.weekday()]} · {fecha_hoy.strftime('%d/%m/%Y')}")
-
-    st.write("**Mañana**")
-    st.write(f"{vm_h:,.2f} €")
-    st.caption(f"{cm_h} comensales · {tm_h} tickets")
-    st.caption(f"Ticket medio: {tmed_m_h:,.2f} €")
-
-    st.write("**Tarde**")
-    st.write(f"{vt_h:,.2f} €")
-    st.caption(f"{ct_h} comensales · {tt_h} tickets")
-    st.caption(f"Ticket medio: {tmed_t_h:,.2f} €")
-
-    st.write("**Noche**")
-    st.write(f"{vn_h:,.2f} €")
-    st.caption(f"{cn_h} comensales · {tn_h} tickets")
-    st.caption(f"Ticket medio: {tmed_n_h:,.2f} €")
-
-    st.markdown("---")
-    st.markdown(f"### TOTAL HOY\n{total_h:,.2f} €")
-    st.caption(f"Ticket medio: {tmed_tot_h:,.2f} €")
-
-# DOW
-with c2:
-    st.markdown("**DOW (Año anterior)**")
-    st.caption(fecha_dow_txt)
-
-    st.write("**Mañana**")
-    st.write(f"{vm_a:,.2f} €")
-    st.caption(f"{cm_a} comensales · {tm_a} tickets")
-    st.caption(f"Ticket medio: {tmed_m_a:,.2f} €")
-
-    st.write("**Tarde**")
-    st.write(f"{vt_a:,.2f} €")
-    st.caption(f"{ct_a} comensales · {tt_a} tickets")
-    st.caption(f"Ticket medio: {tmed_t_a:,.2f} €")
-
-    st.write("**Noche**")
-    st.write(f"{vn_a:,.2f} €")
-    st.caption(f"{cn_a} comensales · {tn_a} tickets")
-    st.caption(f"Ticket medio: {tmed_n_a:,.2f} €")
-
-    st.markdown("---")
-    st.markdown(f"### TOTAL DOW\n{total_a:,.2f} €")
-    st.caption(f"Ticket medio: {tmed_tot_a:,.2f} €")
-
-# VARIACIÓN
-with c3:
-    st.markdown("**VARIACIÓN**")
-    st.caption("Vs. DOW año anterior")
-
-    st.write("**Mañana**")
-    st.markdown(
-        f"<span style='color:{color(d_vm)}'>{d_vm:+,.2f} € ({p_vm:+.1f}%) {icono(p_vm)}</span>",
-        unsafe_allow_html=True
-    )
-    st.caption(f"{d_cm:+} comensales · {d_tm:+} tickets")
-    st.caption(
-        f"Ticket medio: {d_tmed_m:+.2f} € ({p_tmed_m:+.1f}%) {icono(p_tmed_m)}"
-    )
-
-    st.write("**Tarde**")
-    st.markdown(
-        f"<span style='color:{color(d_vt)}'>{d_vt:+,.2f} € ({p_vt:+.1f}%) {icono(p_vt)}</span>",
-        unsafe_allow_html=True
-    )
-    st.caption(f"{d_ct:+} comensales · {d_tt:+} tickets")
-    st.caption(
-        f"Ticket medio: {d_tmed_t:+.2f} € ({p_tmed_t:+.1f}%) {icono(p_tmed_t)}"
+@st.fragment
+def bloque_bitacora():
+    st.divider()
+    st.subheader("Ventas del mes (bitácora viva)")
+
+    df = ventas_enriquecidas(DIRECTORIO)
+    df["dow"] = df["dow_es"]
+
+    df_mes = df[
+        (df["mes"] == fecha_hoy.month) &
+        (df["anio"] == fecha_hoy.year)
+    ].copy()
+
+    df_mes["fecha_display"] = df_mes["fecha"].dt.strftime("%d-%m-%Y")
+    df_mes["fecha_display"] = df_mes.apply(
+        lambda r: f"{r['fecha_display']} 👁️" if r["observaciones"].strip() else r["fecha_display"],
+        axis=1
     )
 
-    st.write("**Noche**")
-    st.markdown(
-        f"<span style='color:{color(d_vn)}'>{d_vn:+,.2f} € ({p_vn:+.1f}%) {icono(p_vn)}</span>",
-        unsafe_allow_html=True
-    )
-    st.caption(f"{d_cn:+} comensales · {d_tn:+} tickets")
-    st.caption(
-        f"Ticket medio: {d_tmed_n:+.2f} € ({p_tmed_n:+.1f}%) {icono(p_tmed_n)}"
+    st.dataframe(
+        df_mes[[
+            "fecha_display", "dow",
+            "ventas_manana_eur", "ventas_tarde_eur", "ventas_noche_eur",
+            "ventas_total_eur",
+            "comensales_manana", "comensales_tarde", "comensales_noche",
+            "tickets_manana", "tickets_tarde", "tickets_noche",
+            "observaciones"
+        ]].rename(columns={"fecha_display": "fecha"}),
+        hide_index=True,
+        use_container_width=True
     )
 
-    st.markdown("---")
-    st.markdown(
-        f"<span style='color:{color(d_tot)}'>"
-        f" TOTAL {d_tot:+,.2f} € ({p_tot:+.1f}%)"
-        f"</span>",
-        unsafe_allow_html=True
-    )
-    st.caption(
-        f"Ticket medio: {d_tmed_tot:+.2f} € ({p_tmed_tot:+.1f}%) {icono(p_tmed_tot)}"
-    )
 
-# =========================
-# BITÁCORA DEL MES
-# =========================
-st.divider()
-st.subheader("Ventas del mes (bitácora viva)")
-
-df_mes = df[
-    (df["fecha"].dt.month == fecha_hoy.month) &
-    (df["fecha"].dt.year == fecha_hoy.year)
-].copy()
-
-df_mes["fecha_display"] = df_mes["fecha"].dt.strftime("%d-%m-%Y")
-df_mes["fecha_display"] = df_mes.apply(
-    lambda r: f"{r['fecha_display']} 👁️" if r["observaciones"].strip() else r["fecha_display"],
-    axis=1
-)
+bloque_bitacora()
 
-st.dataframe(
-    df_mes[[
-        "fecha_display", "dow",
-        "ventas_manana_eur", "ventas_tarde_eur", "ventas_noche_eur",
-        "ventas_total_eur",
-        "comensales_manana", "comensales_tarde", "comensales_noche",
-        "tickets_manana", "tickets_tarde", "tickets_noche",
-        "observaciones"
-    ]].rename(columns={"fecha_display": "fecha"}),
-    hide_index=True,
-    use_container_width=True
-)
 # =========================
 # CIERRE MENSUAL · VENTAS
 # =========================
-st.divider()
-st.subheader("Cierre mensual · Ventas")
-
-c_mes, c_ano = st.columns(2)
-
-with c_mes:
-    mes_sel = st.selectbox(
-        "Mes",
-        options=list(range(1, 13)),
-        index=fecha_hoy.month - 1,
-        format_func=lambda x: date(1900, x, 1).strftime("%B"),
-        key="mes_cierre_mensual"
-    )
-
-with c_ano:
-    ano_sel = st.selectbox(
-        "Año",
-        options=sorted(df["fecha"].dt.year.unique()),
-        index=len(sorted(df["fecha"].dt.year.unique())) - 1,
-        key="anio_cierre_mensual"
+# Los selectores solo vuelven a ejecutar este fragmento
+@st.fragment
+def bloque_cierre_mensual():
+    st.divider()
+    st.subheader("Cierre mensual · Ventas")
+
+    df = ventas_enriquecidas(DIRECTORIO)
+    if df.empty:
+        return
+
+    c_mes, c_ano = st.columns(2)
+
+    with c_mes:
+        mes_sel = st.selectbox(
+            "Mes",
+            options=list(range(1, 13)),
+            index=fecha_hoy.month - 1,
+            format_func=lambda x: MESES_ES[x],
+            key="mes_cierre_mensual"
+        )
+
+    with c_ano:
+        ano_sel = st.selectbox(
+            "Año",
+            options=sorted(df["anio"].unique()),
+            index=len(sorted(df["anio"].unique())) - 1,
+            key="anio_cierre_mensual"
+        )
+
+
+    df_cierre = df[
+        (df["mes"] == mes_sel) &
+        (df["anio"] == ano_sel)
+    ]
+
+    ventas_mes = df_cierre["ventas_total_eur"].sum()
+    dias_operados = df_cierre["fecha"].nunique()
+    ticket_medio_mes = (
+        ventas_mes / df_cierre[["tickets_manana", "tickets_tarde", "tickets_noche"]].sum().sum()
+        if df_cierre[["tickets_manana", "tickets_tarde", "tickets_noche"]].sum().sum() > 0
+        else 0
     )
 
+    c1, c2, c3 = st.columns(3)
 
-df_cierre = df[
-    (df["fecha"].dt.month == mes_sel) &
-    (df["fecha"].dt.year == ano_sel)
-]
-
-ventas_mes = df_cierre["ventas_total_eur"].sum()
-dias_operados = df_cierre["fecha"].nunique()
-ticket_medio_mes = (
-    ventas_mes / df_cierre[["tickets_manana", "tickets_tarde", "tickets_noche"]].sum().sum()
-    if df_cierre[["tickets_manana", "tickets_tarde", "tickets_noche"]].sum().sum() > 0
-    else 0
-)
+    with c1:
+        st.metric("Ventas del mes", f"{ventas_mes:,.2f} €")
 
-c1, c2, c3 = st.columns(3)
+    with c2:
+        st.metric("Días operados", dias_operados)
 
-with c1:
-    st.metric("Ventas del mes", f"{ventas_mes:,.2f} €")
+    with c3:
+        st.metric("Ticket medio mes", f"{ticket_medio_mes:,.2f} €")
 
-with c2:
-    st.metric("Días operados", dias_operados)
 
-with c3:
-    st.metric("Ticket medio mes", f"{ticket_medio_mes:,.2f} €")
+bloque_cierre_mensual()
 
 # =========================
 # TABLA DE VENTAS POR MES
 # =========================
-
-st.divider()
-st.subheader("Ventas mensuales")
-
-from datetime import datetime
-
-VENTAS_MENSUALES_FILE = Path("ventas_mensuales.csv")
-
-# Crear CSV mensual si no existe (OUTPUT consolidado)
-if not VENTAS_MENSUALES_FILE.exists():
-    pd.DataFrame(
-        columns=["anio", "mes", "ventas_total_eur", "fecha_actualizacion"]
-    ).to_csv(VENTAS_MENSUALES_FILE, index=False)
-
-# Mapa meses español (NO locale)
-MESES_ES = {
-    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril",
-    5: "Mayo", 6: "Junio", 7: "Julio", 8: "Agosto",
-    9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
-}
-
-# -------------------------
-# SELECTORES
-# -------------------------
-
-col1, col2 = st.columns(2)
-
-with col1:
-    anios_disponibles = sorted(df["fecha"].dt.year.unique())
-    anio_sel = st.selectbox(
-        "Año",
-        anios_disponibles,
-        index=len(anios_disponibles) - 1,
-        key="anio_tabla_mensual"
-    )
-
-with col2:
-    mes_sel = st.selectbox(
-        "Mes",
-        options=[0] + list(MESES_ES.keys()),
-        format_func=lambda x: "Todos los meses" if x == 0 else MESES_ES[x],
-        key="mes_tabla_mensual"
+@st.fragment
+def bloque_ventas_mensuales():
+    st.divider()
+    st.subheader("Ventas mensuales")
+
+    df = ventas_enriquecidas(DIRECTORIO)
+    if df.empty:
+        return
+
+    # -------------------------
+    # SELECTORES
+    # -------------------------
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        anios_disponibles = sorted(df["anio"].unique())
+        anio_sel = st.selectbox(
+            "Año",
+            anios_disponibles,
+            index=len(anios_disponibles) - 1,
+            key="anio_tabla_mensual"
+        )
+
+    with col2:
+        mes_sel = st.selectbox(
+            "Mes",
+            options=[0] + list(MESES_ES.keys()),
+            format_func=lambda x: "Todos los meses" if x == 0 else MESES_ES[x],
+            key="mes_tabla_mensual"
+        )
+
+    # -------------------------
+    # CONSOLIDACIÓN (SOLO SI CAMBIAN LOS DATOS)
+    # -------------------------
+    # Al guardar ya se consolida el mes afectado. Si la firma de ventas
+    # cambia por otra vía (importación, otra sesión), la consolidación
+    # completa va en segundo plano; solo la primera vez, sin tabla
+    # canónica, se hace aquí.
+
+    # Por local: la firma guardada en sesión no vale para otra partición
+    firma = (str(DIRECTORIO), firma_ventas(DIRECTORIO))
+
+    if st.session_state.get("firma_ventas_mensuales") != firma:
+        if leer_ventas_mensuales(DIRECTORIO).empty:
+            consolidar_ventas_mensuales(df, directorio=DIRECTORIO)
+            st.session_state.firma_ventas_mensuales = firma
+        elif consolidar_en_segundo_plano(DIRECTORIO) is not None:
+            st.session_state.firma_ventas_mensuales = firma
+
+    # -------------------------
+    # LECTURA CANÓNICA
+    # -------------------------
+
+    df_vm = leer_ventas_mensuales(DIRECTORIO)
+
+    df_vm = df_vm[df_vm["anio"] == anio_sel]
+
+    if mes_sel != 0:
+        df_vm = df_vm[df_vm["mes"] == mes_sel]
+
+    df_vm["Mes"] = df_vm["mes"].map(MESES_ES)
+    df_vm["Ventas del mes (€)"] = df_vm["ventas_total_eur"].round(2)
+
+    tabla_meses = df_vm[["Mes", "Ventas del mes (€)"]]
+
+    st.dataframe(
+        tabla_meses,
+        hide_index=True,
+        use_container_width=True
     )
 
-# -------------------------
-# FILTRADO (BASE OPERATIVA)
-# -------------------------
-
-df_base = df.copy()
-df_base["fecha"] = pd.to_datetime(df_base["fecha"])
-df_base["ventas_total_eur"] = pd.to_numeric(
-    df_base["ventas_total_eur"],
-    errors="coerce"
-).fillna(0)
-
-df_filtrado = df_base[df_base["fecha"].dt.year == anio_sel]
-
-if mes_sel != 0:
-    df_filtrado = df_filtrado[df_filtrado["fecha"].dt.month == mes_sel]
-
-# -------------------------
-# CONSOLIDACIÓN Y GUARDADO
-# -------------------------
-
-df_vm = pd.read_csv(VENTAS_MENSUALES_FILE)
-
-df_vm["anio"] = pd.to_numeric(df_vm.get("anio"), errors="coerce")
-df_vm["mes"] = pd.to_numeric(df_vm.get("mes"), errors="coerce")
-
-for mes in range(1, 13):
-    if mes_sel != 0 and mes != mes_sel:
-        continue
-
-    ventas_mes = df_filtrado[
-        df_filtrado["fecha"].dt.month == mes
-    ]["ventas_total_eur"].sum()
-
-    # Overwrite por año + mes
-    df_vm = df_vm[~(
-        (df_vm["anio"] == anio_sel) &
-        (df_vm["mes"] == mes)
-    )]
-
-    df_vm = pd.concat(
-        [
-            df_vm,
-            pd.DataFrame([{
-                "anio": int(anio_sel),
-                "mes": int(mes),
-                "ventas_total_eur": float(ventas_mes),
-                "fecha_actualizacion": datetime.now()
-            }])
-        ],
-        ignore_index=True
+    st.metric(
+        "Total ventas período",
+        f"{tabla_meses['Ventas del mes (€)'].sum():,.2f} €"
     )
 
-df_vm = df_vm.sort_values(["anio", "mes"])
-df_vm.to_csv(VENTAS_MENSUALES_FILE, index=False)
 
-# -------------------------
-# LECTURA CANÓNICA (CSV)
-# -------------------------
-
-df_vm = pd.read_csv(VENTAS_MENSUALES_FILE)
-
-df_vm = df_vm[df_vm["anio"] == anio_sel]
-
-if mes_sel != 0:
-    df_vm = df_vm[df_vm["mes"] == mes_sel]
-
-df_vm["Mes"] = df_vm["mes"].map(MESES_ES)
-df_vm["Ventas del mes (€)"] = df_vm["ventas_total_eur"].round(2)
-
-tabla_meses = df_vm[["Mes", "Ventas del mes (€)"]]
-
-st.dataframe(
-    tabla_meses,
-    hide_index=True,
-    use_container_width=True
-)
-
-st.metric(
-    "Total ventas período",
-    f"{tabla_meses['Ventas del mes (€)'].sum():,.2f} €"
-)
+bloque_ventas_mensuales()
@@ -1,7 +1,18 @@
 import streamlit as st
 import pandas as pd
-from pathlib import Path
-from datetime import date, datetime
+from datetime import date
+
+from oyken.cache import local_activo
+from oyken.calendario import MESES_ES
+from oyken.consolidacion import consolidar_todo_en_segundo_plano
+from oyken.mensual import resumen_mensual
+from oyken.persistencia import (
+    ConflictoVersion,
+    anadir_filas,
+    leer_csv,
+    modificar_csv,
+    version
+)
 
 # =====================================================
 # CABECERA
@@ -13,26 +24,33 @@ st.caption("Aquí se captura la estructura fija y variable del negocio.")
 # =====================================================
 # ARCHIVO DE DATOS
 # =====================================================
-DATA_FILE = Path("gastos.csv")
+DIRECTORIO = local_activo()
+DATA_FILE = DIRECTORIO / "gastos.csv"
 
 # =====================================================
 # ESTADO
 # =====================================================
-if "gastos" not in st.session_state:
-    if DATA_FILE.exists():
-        st.session_state.gastos = pd.read_csv(DATA_FILE)
-    else:
-        st.session_state.gastos = pd.DataFrame(
-            columns=[
-                "Fecha",
-                "Mes",
-                "Concepto",
-                "Categoria",
-                "Tipo_Gasto",   # ⬅ OYKEN
-                "Rol_Gasto",    # ⬅ OYKEN
-                "Coste (€)"
-            ]
-        )
+COLUMNAS_GASTOS = [
+    "Fecha",
+    "Mes",
+    "Concepto",
+    "Categoria",
+    "Tipo_Gasto",   # ⬅ OYKEN
+    "Rol_Gasto",    # ⬅ OYKEN
+    "Coste (€)"
+]
+
+def recargar_gastos():
+    st.session_state.gastos, st.session_state.gastos_version = leer_csv(
+        DATA_FILE, COLUMNAS_GASTOS
+    )
+
+# La copia de sesión se recarga si otra sesión ha cambiado el archivo
+if (
+    "gastos" not in st.session_state
+    or st.session_state.get("gastos_version") != version(DATA_FILE)
+):
+    recargar_gastos()
 
 # =====================================================
 # CATEGORÍAS BASE OYKEN
@@ -149,12 +167,11 @@ with st.form("registro_gastos", clear_on_submit=True):
             "Coste (€)": round(coste, 2)
         }
 
-        st.session_state.gastos = pd.concat(
-            [st.session_state.gastos, pd.DataFrame([nuevo])],
-            ignore_index=True
+        # Alta sobre el archivo actual (bajo cerrojo, escritura atómica)
+        st.session_state.gastos, st.session_state.gastos_version = anadir_filas(
+            DATA_FILE, [nuevo], COLUMNAS_GASTOS
         )
-
-        st.session_state.gastos.to_csv(DATA_FILE, index=False)
+        consolidar_todo_en_segundo_plano(DIRECTORIO)
         st.success("Gasto registrado correctamente.")
 
 # =====================================================
@@ -190,11 +207,21 @@ idx = st.selectbox(
 )
 
 if st.button("Eliminar gasto"):
-    st.session_state.gastos = (
-        st.session_state.gastos.drop(idx).reset_index(drop=True)
-    )
-    st.session_state.gastos.to_csv(DATA_FILE, index=False)
-    st.success("Gasto eliminado correctamente.")
+    # Control optimista: el índice solo vale si el archivo no ha cambiado
+    try:
+        st.session_state.gastos, st.session_state.gastos_version = modificar_csv(
+            DATA_FILE,
+            lambda df: df.drop(idx).reset_index(drop=True),
+            version_esperada=st.session_state.gastos_version
+        )
+        consolidar_todo_en_segundo_plano(DIRECTORIO)
+        st.success("Gasto eliminado correctamente.")
+    except ConflictoVersion:
+        recargar_gastos()
+        st.warning(
+            "Otra sesión ha modificado los gastos. "
+            "Se han recargado los datos: revisa la selección y repite."
+        )
 
 # =====================================================
 # GASTOS MENSUALES · CONSOLIDADO (SIN CAMBIOS)
@@ -202,14 +229,6 @@ if st.button("Eliminar gasto"):
 st.divider()
 st.subheader("Gastos mensuales")
 
-GASTOS_MENSUALES_FILE = Path("gastos_mensuales.csv")
-
-MESES_ES = {
-    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril",
-    5: "Mayo", 6: "Junio", 7: "Julio", 8: "Agosto",
-    9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
-}
-
 df_gastos = st.session_state.gastos.copy()
 df_gastos["Fecha"] = pd.to_datetime(df_gastos["Fecha"], dayfirst=True, errors="coerce")
 df_gastos["Coste (€)"] = pd.to_numeric(df_gastos["Coste (€)"], errors="coerce").fillna(0)
@@ -230,46 +249,20 @@ with c2:
         format_func=lambda x: "Todos los meses" if x == 0 else MESES_ES[x]
     )
 
-df_filtrado = df_gastos[df_gastos["Fecha"].dt.year == anio_sel]
+resumen = resumen_mensual(df_gastos, "Fecha", "Coste (€)", anios=[anio_sel])
 if mes_sel != 0:
-    df_filtrado = df_filtrado[df_gastos["Fecha"].dt.month == mes_sel]
+    resumen = resumen[resumen["mes"] == mes_sel]
 
-datos_meses = []
-for mes in range(1, 13):
-    if mes_sel != 0 and mes != mes_sel:
-        continue
-
-    gasto_mes = df_filtrado[df_filtrado["Fecha"].dt.month == mes]["Coste (€)"].sum()
-    datos_meses.append({
-        "Mes": MESES_ES[mes],
-        "Gastos del mes (€)": round(gasto_mes, 2)
-    })
-
-tabla_gastos = pd.DataFrame(datos_meses)
+tabla_gastos = pd.DataFrame({
+    "Mes": resumen["mes"].map(MESES_ES),
+    "Gastos del mes (€)": resumen["Coste (€)"].round(2)
+})
 
 st.dataframe(tabla_gastos, hide_index=True, use_container_width=True)
 st.metric("Total período seleccionado", f"{tabla_gastos['Gastos del mes (€)'].sum():,.2f} €")
 
 # =====================================================
-# CSV MENSUAL CANÓNICO (SIN CAMBIOS)
+# TABLA MENSUAL CANÓNICA
 # =====================================================
-if not GASTOS_MENSUALES_FILE.exists():
-    pd.DataFrame(
-        columns=["anio", "mes", "gastos_total_eur", "fecha_actualizacion"]
-    ).to_csv(GASTOS_MENSUALES_FILE, index=False)
-
-df_csv = tabla_gastos.copy()
-df_csv["mes"] = df_csv["Mes"].map({v: k for k, v in MESES_ES.items()})
-df_csv["anio"] = anio_sel
-df_csv["gastos_total_eur"] = df_csv["Gastos del mes (€)"]
-df_csv["fecha_actualizacion"] = datetime.now()
-df_csv = df_csv[["anio", "mes", "gastos_total_eur", "fecha_actualizacion"]]
-
-df_hist = pd.read_csv(GASTOS_MENSUALES_FILE)
-df_hist = df_hist[
-    ~((df_hist["anio"] == anio_sel) & (df_hist["mes"].isin(df_csv["mes"])))
-]
-
-df_final = pd.concat([df_hist, df_csv], ignore_index=True)
-df_final = df_final.sort_values(["anio", "mes"])
-df_final.to_csv(GASTOS_MENSUALES_FILE, index=False)
+# gastos_mensuales (oyken.db) la escribe el worker de consolidación
+# (oyken.consolidacion) para todos los años; la página no lo escribe.
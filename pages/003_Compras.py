@@ -1,8 +1,30 @@
 import streamlit as st
 import pandas as pd
-from pathlib import Path
 from datetime import date
 
+from oyken.cache import cubo, local_activo
+from oyken.calendario import MESES_ES
+from oyken.compras import (
+    COLUMNAS_COMPRAS,
+    FAMILIAS,
+    anadir_compras,
+    borrar_compras,
+    cortar_cubo,
+    peso_familias,
+    top_proveedores,
+    variacion_mensual
+)
+from oyken.consolidacion import consolidar_todo_en_segundo_plano
+from oyken.importacion import ErrorImportacion, importar_compras
+from oyken.mensual import VENTAS_MENSUALES_FILE, leer_ventas_mensuales, resumen_mensual, version_mensual
+from oyken.persistencia import ConflictoVersion, leer_csv, version
+from oyken.proveedores import (
+    alta_proveedores,
+    buscar_proveedores,
+    cargar_proveedores,
+    proveedor_existente
+)
+
 # =========================
 # CONFIGURACIÓN
 # =========================
@@ -13,43 +35,45 @@ st.divider()
 # =========================
 # ARCHIVOS
 # =========================
-COMPRAS_FILE = Path("compras.csv")
-PROVEEDORES_FILE = Path("proveedores.csv")
+DIRECTORIO = local_activo()
+COMPRAS_FILE = DIRECTORIO / "compras.csv"
+PROVEEDORES_FILE = DIRECTORIO / "proveedores.csv"
 
 # =========================
 # ESTADO: PROVEEDORES (MAESTRO)
 # =========================
-if "proveedores" not in st.session_state:
-    if PROVEEDORES_FILE.exists():
-        st.session_state.proveedores = (
-            pd.read_csv(PROVEEDORES_FILE)["Proveedor"]
-            .dropna()
-            .astype(str)
-            .str.strip()
-            .unique()
-            .tolist()
-        )
-    else:
-        st.session_state.proveedores = []
+# Registro indexado (oyken.proveedores): se construye, ordenado, solo
+# cuando cambia el archivo (p. ej. si lo ha tocado otra sesión), no
+# en cada rerun
+def recargar_proveedores():
+    st.session_state.registro_proveedores, st.session_state.proveedores_version = (
+        cargar_proveedores(DIRECTORIO)
+    )
 
-# Normalizar y ordenar siempre
-st.session_state.proveedores = sorted(
-    set(st.session_state.proveedores),
-    key=lambda x: x.upper()
-)
+if (
+    "registro_proveedores" not in st.session_state
+    or st.session_state.get("proveedores_version") != version(PROVEEDORES_FILE)
+):
+    recargar_proveedores()
+
+registro = st.session_state.registro_proveedores
+
+PROVEEDORES_SELECTOR = 50
+PROVEEDORES_POR_PAGINA = 30
 
 # =========================
 # ESTADO: COMPRAS
 # =========================
-if "compras" not in st.session_state:
-    if COMPRAS_FILE.exists():
-        st.session_state.compras = pd.read_csv(COMPRAS_FILE)
-    else:
-        st.session_state.compras = pd.DataFrame(
-            columns=["Fecha", "Proveedor", "Familia", "Coste (€)"]
-        )
+def recargar_compras():
+    st.session_state.compras, st.session_state.compras_version = leer_csv(
+        COMPRAS_FILE, COLUMNAS_COMPRAS
+    )
 
-FAMILIAS = ["Materia prima", "Bebidas", "Limpieza", "Otros"]
+if (
+    "compras" not in st.session_state
+    or st.session_state.get("compras_version") != version(COMPRAS_FILE)
+):
+    recargar_compras()
 
 # =========================================================
 # REGISTRAR COMPRA
@@ -57,6 +81,18 @@ FAMILIAS = ["Materia prima", "Bebidas", "Limpieza", "Otros"]
 st.subheader("Registrar compra")
 
 with st.container(border=True):
+    # Fuera del formulario: el selector se filtra al escribir
+    busqueda = st.text_input(
+        "Buscar proveedor",
+        placeholder="Nombre o parte del nombre",
+        key="buscar_proveedor_compra"
+    )
+    if not busqueda.strip() and len(registro["nombres"]) > PROVEEDORES_SELECTOR:
+        st.caption(
+            f"El selector muestra los {PROVEEDORES_SELECTOR} primeros de "
+            f"{len(registro['nombres']):,} proveedores: escribe para buscar el resto."
+        )
+
     with st.form("form_compras", clear_on_submit=True):
 
         c1, c2, c3 = st.columns(3)
@@ -71,7 +107,7 @@ with st.container(border=True):
         with c2:
             proveedor = st.selectbox(
                 "Proveedor",
-                st.session_state.proveedores,
+                buscar_proveedores(registro, busqueda, PROVEEDORES_SELECTOR),
                 placeholder="Seleccionar proveedor"
             )
 
@@ -101,14 +137,47 @@ with st.container(border=True):
                 "Coste (€)": round(coste, 2)
             }
 
-            st.session_state.compras = pd.concat(
-                [st.session_state.compras, pd.DataFrame([nueva_compra])],
-                ignore_index=True
+            # Se añade sobre el archivo actual (bajo cerrojo), no sobre
+            # la copia de sesión: no se pierden altas de otras sesiones.
+            # El cubo de gasto suma solo esta línea.
+            st.session_state.compras, st.session_state.compras_version = anadir_compras(
+                [nueva_compra], DIRECTORIO
             )
-
-            st.session_state.compras.to_csv(COMPRAS_FILE, index=False)
+            consolidar_todo_en_segundo_plano(DIRECTORIO)
             st.success("Compra registrada")
 
+with st.expander("Importar facturas de proveedor"):
+    archivo_facturas = st.file_uploader(
+        "Líneas de factura (CSV o JSON Lines)",
+        type=["csv", "json", "jsonl", "ndjson"],
+        key="archivo_facturas"
+    )
+    st.caption(
+        "Columnas: fecha, proveedor, familia, coste · "
+        "Los proveedores que no existan se dan de alta"
+    )
+
+    if archivo_facturas is not None and st.button("Importar compras"):
+        try:
+            with st.spinner("Importando…"):
+                informe = importar_compras(archivo_facturas, DIRECTORIO, nombre=archivo_facturas.name)
+        except ErrorImportacion as e:
+            st.error(f"No se ha importado nada: {e}")
+        else:
+            recargar_compras()
+            recargar_proveedores()
+            registro = st.session_state.registro_proveedores
+            consolidar_todo_en_segundo_plano(DIRECTORIO)
+            st.success(
+                f"{informe['lineas']:,} compras importadas ({informe['coste']:,.2f} €) · "
+                f"{informe['filas']:,} filas en {informe['segundos']:.1f}s "
+                f"({informe['filas'] / informe['segundos']:,.0f} filas/s)"
+            )
+            if informe["proveedores_nuevos"]:
+                st.info("Proveedores dados de alta: " + ", ".join(informe["proveedores_nuevos"]))
+            if informe["rechazadas"]:
+                st.warning(f"{informe['rechazadas']:,} filas descartadas (fecha, proveedor o coste no válidos)")
+
 # =========================================================
 # GESTIÓN DE PROVEEDORES
 # =========================================================
@@ -129,31 +198,48 @@ with st.container(border=True):
         if not nombre:
             st.stop()
 
-        existentes_upper = [p.upper() for p in st.session_state.proveedores]
-
-        if nombre.upper() in existentes_upper:
-            st.warning("Este proveedor ya existe. No se ha guardado.")
+        # Misma clave sin tildes ni mayúsculas: consulta al índice
+        existente = proveedor_existente(registro, nombre)
+        if existente:
+            st.warning(f"Este proveedor ya existe como «{existente}». No se ha guardado.")
             st.stop()
 
-        st.session_state.proveedores.append(nombre)
-
-        # Normalizar, ordenar y persistir
-        st.session_state.proveedores = sorted(
-            set(st.session_state.proveedores),
-            key=lambda x: x.upper()
+        # Alta sobre el maestro actual (bajo cerrojo)
+        st.session_state.registro_proveedores, st.session_state.proveedores_version = (
+            alta_proveedores([nombre], DIRECTORIO)
         )
+        registro = st.session_state.registro_proveedores
 
-        pd.DataFrame(
-            {"Proveedor": st.session_state.proveedores}
-        ).to_csv(PROVEEDORES_FILE, index=False)
-
-        st.success("Proveedor guardado")
+        # Otra sesión pudo darlo de alta entre medias con otra grafía
+        guardado = proveedor_existente(registro, nombre)
+        if guardado != " ".join(nombre.split()):
+            st.warning(f"Este proveedor ya existe como «{guardado}». No se ha guardado.")
+        else:
+            st.success("Proveedor guardado")
 
-if st.session_state.proveedores:
+if registro["nombres"]:
     st.markdown("**Proveedores existentes**")
 
-    proveedores = st.session_state.proveedores
-    filas = [proveedores[i:i+3] for i in range(0, len(proveedores), 3)]
+    filtro = st.text_input("Filtrar", placeholder="Buscar en el listado", key="filtro_proveedores")
+    proveedores = (
+        buscar_proveedores(registro, filtro, len(registro["nombres"]))
+        if filtro.strip() else registro["nombres"]
+    )
+
+    # Solo se pinta una página de tarjetas
+    paginas = max(1, -(-len(proveedores) // PROVEEDORES_POR_PAGINA))
+    if st.session_state.get("pagina_proveedores", 1) > paginas:
+        st.session_state.pagina_proveedores = 1
+
+    if paginas > 1:
+        pagina = st.number_input("Página", min_value=1, max_value=paginas, step=1, key="pagina_proveedores")
+    else:
+        pagina = 1
+    st.caption(f"{len(proveedores):,} proveedores · página {pagina} de {paginas}")
+
+    inicio = (pagina - 1) * PROVEEDORES_POR_PAGINA
+    pagina_actual = proveedores[inicio:inicio + PROVEEDORES_POR_PAGINA]
+    filas = [pagina_actual[i:i+3] for i in range(0, len(pagina_actual), 3)]
 
     for fila in filas:
         cols = st.columns(3)
@@ -227,14 +313,22 @@ with st.container(border=True):
 
         if st.button("Eliminar compra", use_container_width=True):
 
-            st.session_state.compras = (
-                st.session_state.compras
-                .drop(idx)
-                .reset_index(drop=True)
-            )
-
-            st.session_state.compras.to_csv(COMPRAS_FILE, index=False)
-            st.success("Compra eliminada")
+            # El índice seleccionado solo es válido si nadie ha tocado
+            # el archivo desde que se cargó (control optimista)
+            try:
+                st.session_state.compras, st.session_state.compras_version = borrar_compras(
+                    [idx],
+                    DIRECTORIO,
+                    version_esperada=st.session_state.compras_version
+                )
+                consolidar_todo_en_segundo_plano(DIRECTORIO)
+                st.success("Compra eliminada")
+            except ConflictoVersion:
+                recargar_compras()
+                st.warning(
+                    "Otra sesión ha modificado las compras. "
+                    "Se han recargado los datos: revisa la selección y repite."
+                )
 
 # =========================================================
 # COMPRAS MENSUALES · CONSOLIDADO (FASE 1)
@@ -243,20 +337,6 @@ with st.container(border=True):
 st.divider()
 st.subheader("Compras mensuales")
 
-from pathlib import Path
-from datetime import datetime
-
-COMPRAS_MENSUALES_FILE = Path("compras_mensuales.csv")
-
-# -------------------------
-# MAPA MESES ESPAÑOL
-# -------------------------
-MESES_ES = {
-    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril",
-    5: "Mayo", 6: "Junio", 7: "Julio", 8: "Agosto",
-    9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
-}
-
 # -------------------------
 # PREPARAR DATOS OPERATIVOS
 # -------------------------
@@ -297,37 +377,19 @@ with c2:
         key="mes_compras_mensual"
     )
 
-# -------------------------
-# FILTRADO OPERATIVO
-# -------------------------
-df_filtrado = df_compras[
-    df_compras["Fecha"].dt.year == anio_sel
-]
-
-if mes_sel != 0:
-    df_filtrado = df_filtrado[
-        df_filtrado["Fecha"].dt.month == mes_sel
-    ]
-
 # -------------------------
 # CONSTRUCCIÓN TABLA MENSUAL (VISIBLE)
 # -------------------------
-datos_meses = []
-
-for mes in range(1, 13):
-    if mes_sel != 0 and mes != mes_sel:
-        continue
-
-    total_mes = df_filtrado[
-        df_filtrado["Fecha"].dt.month == mes
-    ]["Coste (€)"].sum()
+# Un solo groupby (año, mes) con los 12 meses garantizados
+resumen = resumen_mensual(df_compras, "Fecha", "Coste (€)", anios=[anio_sel])
 
-    datos_meses.append({
-        "Mes": MESES_ES[mes],
-        "Compras del mes (€)": round(total_mes, 2)
-    })
+if mes_sel != 0:
+    resumen = resumen[resumen["mes"] == mes_sel]
 
-tabla_compras_mensuales = pd.DataFrame(datos_meses)
+tabla_compras_mensuales = pd.DataFrame({
+    "Mes": resumen["mes"].map(MESES_ES),
+    "Compras del mes (€)": resumen["Coste (€)"].round(2)
+})
 
 st.dataframe(
     tabla_compras_mensuales,
@@ -340,6 +402,74 @@ st.metric(
     f"{tabla_compras_mensuales['Compras del mes (€)'].sum():,.2f} €"
 )
 
+# =========================================================
+# GASTO POR PROVEEDOR Y FAMILIA
+# =========================================================
+# Cortes del cubo de gasto (oyken.compras): no se reagrupa el
+# histórico de compras en cada render
+
+st.divider()
+st.subheader("Gasto por proveedor y familia")
+
+df_cubo = cubo(DIRECTORIO)
+periodo_txt = f"{MESES_ES[mes_sel]} {anio_sel}" if mes_sel != 0 else f"Año {anio_sel}"
+
+corte = cortar_cubo(df_cubo, anio_sel, mes_sel)
+
+if corte.empty:
+    st.info(f"Sin compras en {periodo_txt}.")
+else:
+    n_top = st.selectbox("Proveedores a mostrar", [5, 10, 20], key="top_proveedores_compras")
+    top = top_proveedores(df_cubo, anio_sel, mes_sel, n_top)
+    familias = peso_familias(df_cubo, anio_sel, mes_sel)
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Proveedor principal", top.loc[0, "proveedor"], f"{top.loc[0, 'peso_pct']:.1f} % del gasto", delta_color="off")
+    c2.metric(f"Peso top {min(5, len(top))}", f"{top['acumulado_pct'].iloc[min(5, len(top)) - 1]:.1f} %")
+    c3.metric("Proveedores con compras", corte["proveedor"].nunique())
+
+    st.markdown(f"**Top proveedores · {periodo_txt}**")
+    st.dataframe(
+        pd.DataFrame({
+            "Proveedor": top["proveedor"],
+            "Gasto (€)": top["coste_eur"].round(2),
+            "Líneas": top["lineas"].astype(int),
+            "Peso %": top["peso_pct"].round(1),
+            "Acumulado %": top["acumulado_pct"].round(1)
+        }),
+        hide_index=True,
+        use_container_width=True
+    )
+
+    st.markdown(f"**Peso por familia · {periodo_txt}**")
+    st.dataframe(
+        pd.DataFrame({
+            "Familia": familias["familia"],
+            "Gasto (€)": familias["coste_eur"].round(2),
+            "Peso %": familias["peso_pct"].round(1)
+        }),
+        hide_index=True,
+        use_container_width=True
+    )
+
+    if mes_sel != 0:
+        mes_previo = 12 if mes_sel == 1 else mes_sel - 1
+        st.markdown(f"**Variación frente a {MESES_ES[mes_previo]} · mayores cambios**")
+        variacion = variacion_mensual(df_cubo, anio_sel, mes_sel).head(n_top)
+        st.dataframe(
+            pd.DataFrame({
+                "Proveedor": variacion["proveedor"],
+                "Mes (€)": variacion["actual_eur"].round(2),
+                "Mes anterior (€)": variacion["anterior_eur"].round(2),
+                "Variación (€)": variacion["variacion_eur"],
+                "Variación %": variacion["variacion_pct"].round(1)
+            }),
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        st.caption("Elige un mes para ver la variación frente al mes anterior.")
+
 # =========================================================
 # COSTE DE PRODUCTO SOBRE VENTAS · BLOQUE ESTRUCTURAL OYKEN
 # =========================================================
@@ -352,11 +482,6 @@ st.caption(
     "Este valor se utiliza como referencia de margen bruto en OYKEN."
 )
 
-# -------------------------
-# ARCHIVO CANÓNICO DEL PORCENTAJE
-# -------------------------
-COSTE_PRODUCTO_FILE = Path("coste_producto.csv")
-
 # -------------------------
 # LECTURA DE COMPRAS DEL PERIODO
 # -------------------------
@@ -365,29 +490,19 @@ compras_periodo = tabla_compras_mensuales["Compras del mes (€)"].sum()
 # -------------------------
 # LECTURA DE VENTAS MENSUALES (FUENTE CANÓNICA)
 # -------------------------
-VENTAS_MENSUALES_FILE = Path("ventas_mensuales.csv")
-
-if not VENTAS_MENSUALES_FILE.exists():
+if version_mensual(VENTAS_MENSUALES_FILE, DIRECTORIO) is None:
     st.warning(
         "No existen ventas mensuales consolidadas. "
         "No se puede calcular el coste de producto."
     )
     st.stop()
 
-df_ventas = pd.read_csv(VENTAS_MENSUALES_FILE)
-
-required_cols = {"anio", "mes", "ventas_total_eur"}
-if not required_cols.issubset(df_ventas.columns):
-    st.error("El archivo de ventas mensuales no tiene el formato esperado.")
-    st.stop()
-
-ventas_filtradas = df_ventas[
-    (df_ventas["anio"] == anio_sel) &
-    (
-        (df_ventas["mes"] == mes_sel)
-        if mes_sel != 0 else True
-    )
-]
+# Solo los meses del periodo (consulta por rango sobre (anio, mes))
+ventas_filtradas = leer_ventas_mensuales(
+    DIRECTORIO,
+    desde=(anio_sel, mes_sel or 1),
+    hasta=(anio_sel, mes_sel or 12)
+)
 
 ventas_periodo = ventas_filtradas["ventas_total_eur"].sum()
 
@@ -440,84 +555,8 @@ st.metric(
 
 
 # ---------------------------------------------------------
-# SUBBLOQUE 3 · GUARDADO AUTOMÁTICO (CCV CANÓNICO)
+# SUBBLOQUE 3 · PERSISTENCIA
 # ---------------------------------------------------------
-# Este bloque persiste el dato automáticamente
-# para que pueda ser leído por Breakeven y otros módulos.
-
-COSTE_PRODUCTO_FILE = Path("coste_producto.csv")
-
-# Crear CSV si no existe
-if not COSTE_PRODUCTO_FILE.exists():
-    pd.DataFrame(
-        columns=[
-            "anio",
-            "mes",
-            "coste_producto_pct",
-            "fecha_actualizacion"
-        ]
-    ).to_csv(COSTE_PRODUCTO_FILE, index=False)
-
-# Cargar histórico
-df_hist = pd.read_csv(COSTE_PRODUCTO_FILE)
-
-# Overwrite limpio por año + mes
-df_hist = df_hist[
-    ~(
-        (df_hist["anio"] == anio_sel) &
-        (df_hist["mes"] == mes_sel)
-    )
-]
-
-# Nuevo registro
-nuevo_registro = pd.DataFrame([{
-    "anio": anio_sel,
-    "mes": mes_sel,
-    "coste_producto_pct": round(porcentaje_coste, 4),
-    "fecha_actualizacion": datetime.now()
-}])
-
-# Guardado final
-df_final = pd.concat([df_hist, nuevo_registro], ignore_index=True)
-df_final = df_final.sort_values(["anio", "mes"])
-df_final.to_csv(COSTE_PRODUCTO_FILE, index=False)
-
-# -------------------------
-# GUARDAR CSV MENSUAL (CANÓNICO)
-# -------------------------
-
-# Crear CSV si no existe
-if not COMPRAS_MENSUALES_FILE.exists():
-    pd.DataFrame(
-        columns=["anio", "mes", "compras_total_eur", "fecha_actualizacion"]
-    ).to_csv(COMPRAS_MENSUALES_FILE, index=False)
-
-# Preparar datos a guardar (desde la tabla visible)
-df_csv = tabla_compras_mensuales.copy()
-
-df_csv["mes"] = df_csv["Mes"].map(
-    {v: k for k, v in MESES_ES.items()}
-)
-df_csv["anio"] = anio_sel
-df_csv["compras_total_eur"] = df_csv["Compras del mes (€)"]
-
-df_csv = df_csv[["anio", "mes", "compras_total_eur"]]
-
-# Cargar histórico
-df_hist = pd.read_csv(COMPRAS_MENSUALES_FILE)
-
-# Eliminar meses existentes del mismo año (overwrite limpio)
-df_hist = df_hist[
-    ~(
-        (df_hist["anio"] == anio_sel) &
-        (df_hist["mes"].isin(df_csv["mes"]))
-    )
-]
-
-# Añadir timestamp
-df_csv["fecha_actualizacion"] = datetime.now()
-
-# Guardar final
-df_final = pd.concat([df_hist, df_csv], ignore_index=True)
-df_final = df_final.sort_values(["anio", "mes"])
-df_final.to_csv(COMPRAS_MENSUALES_FILE, index=False)
+# coste_producto y compras_mensuales (oyken.db) las escribe el worker
+# de consolidación (oyken.consolidacion) para todos los meses y años;
+# la página no las escribe.
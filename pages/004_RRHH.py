@@ -1,6 +1,11 @@
 import streamlit as st
 import pandas as pd
-from pathlib import Path
+
+from oyken.cache import local_activo
+from oyken.calendario import MESES_ES
+from oyken.consolidacion import consolidar_todo_en_segundo_plano
+from oyken.persistencia import anadir_filas
+from oyken.rrhh import MESES, nomina_mensual
 
 # =====================================================
 # CONFIGURACIÓN
@@ -13,13 +18,8 @@ st.caption("Planificación estructural de personal")
 # CONSTANTES
 # =====================================================
 
-MESES = [
-    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
-]
-
-SS_EMPRESA = 0.33
-PUESTOS_FILE = Path("rrhh_puestos.csv")
+DIRECTORIO = local_activo()
+PUESTOS_FILE = DIRECTORIO / "rrhh_puestos.csv"
 
 # =====================================================
 # UTILIDADES DE PERSISTENCIA
@@ -31,9 +31,8 @@ def cargar_puestos():
     return pd.DataFrame(columns=["Año", "Puesto", "Bruto anual (€)", *MESES])
 
 def guardar_puesto(registro: dict):
-    df = cargar_puestos()
-    df = pd.concat([df, pd.DataFrame([registro])], ignore_index=True)
-    df.to_csv(PUESTOS_FILE, index=False)
+    anadir_filas(PUESTOS_FILE, [registro], ["Año", "Puesto", "Bruto anual (€)", *MESES])
+    consolidar_todo_en_segundo_plano(DIRECTORIO)
 
 # =====================================================
 # CONTEXTO DE PLANIFICACIÓN
@@ -116,17 +115,6 @@ st.divider()
 st.subheader("Coste de personal — Nómina (económico)")
 st.caption("Cálculo económico aislado de la planificación.")
 
-SS_EMPRESA = 0.33
-
-# =====================================================
-# BLOQUE 2B · MAPA DE MESES
-# =====================================================
-
-MESES_ES = [
-    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
-]
-
 # =====================================================
 # BLOQUE 2C · SELECTORES ECONÓMICOS
 # =====================================================
@@ -154,7 +142,7 @@ with c2:
     mes_economico = st.selectbox(
         "Mes",
         options=[0] + list(range(1, 13)),
-        format_func=lambda x: "Todos los meses" if x == 0 else MESES_ES[x - 1],
+        format_func=lambda x: "Todos los meses" if x == 0 else MESES_ES[x],
         key="mes_rrhh_economico"
     )
 
@@ -173,31 +161,19 @@ if df_puestos_econ.empty:
 # =====================================================
 # BLOQUE 3 · CÁLCULO ROBUSTO MENSUAL
 # =====================================================
+# Una sola operación matricial (puestos × 12 meses) compartida por
+# los totales, el desglose y la tabla mensual canónica.
 
-datos_meses = []
+df_nomina = nomina_mensual(df_puestos_econ)
 
-for i, mes_nombre in enumerate(MESES_ES, start=1):
+if mes_economico != 0:
+    df_nomina = df_nomina[df_nomina["mes"] == mes_economico]
 
-    if mes_economico != 0 and i != mes_economico:
-        continue
+df_nomina = df_nomina.assign(Mes=df_nomina["mes"].map(MESES_ES))
 
-    total_mes = 0.0
-
-    for _, row in df_puestos_econ.iterrows():
-        salario_mensual = row["Bruto anual (€)"] / 12
-        personas = row[mes_nombre]
-
-        nomina = salario_mensual * personas
-        ss = nomina * SS_EMPRESA
-
-        total_mes += nomina + ss
-
-    datos_meses.append({
-        "Mes": mes_nombre,
-        "Coste RRHH (€)": round(total_mes, 2)
-    })
-
-df_totales = pd.DataFrame(datos_meses)
+df_totales = df_nomina[["Mes", "coste_empresa_eur"]].rename(
+    columns={"coste_empresa_eur": "Coste RRHH (€)"}
+)
 
 # =====================================================
 # BLOQUE 4 · TABLA VISIBLE
@@ -225,34 +201,13 @@ st.divider()
 st.subheader("Desglose económico RRHH")
 st.caption("Detalle de nómina, Seguridad Social y coste empresa.")
 
-desglose = []
-
-for i, mes_nombre in enumerate(MESES_ES, start=1):
-
-    if mes_economico != 0 and i != mes_economico:
-        continue
-
-    total_nomina = 0.0
-    total_ss = 0.0
-
-    for _, row in df_puestos_econ.iterrows():
-        salario_mensual = row["Bruto anual (€)"] / 12
-        personas = row[mes_nombre]
-
-        nomina = salario_mensual * personas
-        ss = nomina * SS_EMPRESA
-
-        total_nomina += nomina
-        total_ss += ss
-
-    desglose.append({
-        "Mes": mes_nombre,
-        "Nómina (€)": round(total_nomina, 2),
-        "Seguridad Social (€)": round(total_ss, 2),
-        "Coste Empresa (€)": round(total_nomina + total_ss, 2)
-    })
-
-df_desglose = pd.DataFrame(desglose)
+df_desglose = df_nomina[["Mes", "nomina_eur", "ss_eur", "coste_empresa_eur"]].rename(
+    columns={
+        "nomina_eur": "Nómina (€)",
+        "ss_eur": "Seguridad Social (€)",
+        "coste_empresa_eur": "Coste Empresa (€)"
+    }
+)
 
 st.dataframe(
     df_desglose,
@@ -261,43 +216,7 @@ st.dataframe(
 )
 
 # =====================================================
-# BLOQUE 5 · CSV CANÓNICO MENSUAL
+# BLOQUE 5 · TABLA MENSUAL CANÓNICA
 # =====================================================
-
-from datetime import datetime
-
-RRHH_MENSUAL_FILE = Path("rrhh_mensual.csv")
-
-# Crear CSV si no existe
-if not RRHH_MENSUAL_FILE.exists():
-    pd.DataFrame(
-        columns=["anio", "mes", "rrhh_total_eur", "fecha_actualizacion"]
-    ).to_csv(RRHH_MENSUAL_FILE, index=False)
-
-# Preparar datos a guardar
-df_csv = df_totales.copy()
-df_csv["mes"] = df_csv["Mes"].map(
-    {v: i + 1 for i, v in enumerate(MESES_ES)}
-)
-df_csv["anio"] = anio_economico
-df_csv["rrhh_total_eur"] = df_csv["Coste RRHH (€)"]
-df_csv = df_csv[["anio", "mes", "rrhh_total_eur"]]
-
-# Cargar histórico
-df_hist = pd.read_csv(RRHH_MENSUAL_FILE)
-
-# Overwrite limpio por (anio, mes)
-df_hist = df_hist[
-    ~(
-        (df_hist["anio"] == anio_economico) &
-        (df_hist["mes"].isin(df_csv["mes"]))
-    )
-]
-
-df_csv["fecha_actualizacion"] = datetime.now()
-
-df_final = pd.concat([df_hist, df_csv], ignore_index=True)
-df_final = df_final.sort_values(["anio", "mes"])
-df_final.to_csv(RRHH_MENSUAL_FILE, index=False)
-
-st.success("RRHH económico consolidado correctamente.")
+# rrhh_mensual (oyken.db) la escribe el worker de consolidación
+# (oyken.consolidacion) para todos los años; la página no lo escribe.
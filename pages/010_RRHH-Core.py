@@ -1,6 +1,18 @@
 import streamlit as st
 from datetime import date
 
+from oyken.cache import local_activo
+from oyken.rrhh_core import (
+    cargar_modelo,
+    diferencias_modelo,
+    duracion_horas,
+    formato_hora,
+    guardar_modelo,
+    huella_estructural,
+    intervalo,
+    versiones_modelo
+)
+
 # ======================================================
 # CONFIGURACIÓN GENERAL
 # ======================================================
@@ -13,8 +25,13 @@ st.set_page_config(
 # ======================================================
 # SESSION STATE · MODELO RRHH CORE
 # ======================================================
-if "rrhh_core" not in st.session_state:
-    st.session_state.rrhh_core = {
+# Se parte de la última versión guardada en disco (rrhh_core/) del
+# local activo; al cambiar de local se carga la suya
+DIRECTORIO = local_activo()
+
+if st.session_state.get("rrhh_core_local") != str(DIRECTORIO):
+    st.session_state.rrhh_core_local = str(DIRECTORIO)
+    st.session_state.rrhh_core = cargar_modelo(directorio=DIRECTORIO) or {
         "configuracion": {
             "apertura": "13:00",
             "cierre": "23:30",
@@ -219,10 +236,9 @@ for tramo, funcion, es in estructura_detectada:
         horas = 0
         try:
             if inicio and fin:
-                hi, mi = map(int, inicio.split(":"))
-                hf, mf = map(int, fin.split(":"))
-                horas = max((hf + mf/60) - (hi + mi/60), 0)
-        except:
+                # Si fin < inicio, la cobertura cruza medianoche
+                horas = duracion_horas(inicio, fin)
+        except ValueError:
             st.warning("Formato HH:MM")
 
         st.session_state.rrhh_core["horas_estructurales"][clave] = {
@@ -245,34 +261,39 @@ st.caption("Define el suelo humano real del negocio.")
 intervalos = []
 for datos in st.session_state.rrhh_core["horas_estructurales"].values():
     try:
-        hi, mi = map(int, datos["inicio"].split(":"))
-        hf, mf = map(int, datos["fin"].split(":"))
-        intervalos.append((hi*60 + mi, hf*60 + mf))
-    except:
+        intervalos.append(intervalo(datos["inicio"], datos["fin"]))
+    except ValueError:
         continue
 
 if intervalos:
-    conteos = []
-    for minuto in range(0, 24*60, 15):
-        activos = sum(1 for i, f in intervalos if i <= minuto < f)
-        conteos.append(activos)
-
-    pico = max(conteos)
-    total_horas = sum((f - i) for i, f in intervalos) / 60
+    # Barrido por eventos a resolución de minuto (admite tramos nocturnos)
+    huella = huella_estructural(intervalos)
+    pico = huella["pico_simultaneo"]
+    total_horas = huella["horas_diarias"]
 
     st.metric("Pico estructural simultáneo", f"{pico} funciones")
     st.metric("Horas estructurales totales", f"{total_horas:.1f} h / día")
 
+    if huella["franjas_pico"]:
+        st.caption(
+            "Franja(s) de pico: " + ", ".join(
+                f"{formato_hora(i)}–{formato_hora(f)}" for i, f in huella["franjas_pico"]
+            )
+        )
+
     st.info(
         "Este resultado no depende del volumen ni de la plantilla real. "
         "Define el suelo humano del negocio."
     )
 
-    st.session_state.rrhh_core["salida"] = {
-        "pico_simultaneo": pico,
-        "horas_diarias": total_horas,
-        "fecha_modelo": date.today().isoformat()
-    }
+    # fecha_modelo solo cambia cuando cambia la salida, no en cada render
+    salida = {"pico_simultaneo": pico, "horas_diarias": total_horas}
+    previa = st.session_state.rrhh_core.get("salida") or {}
+    if all(previa.get(k) == v for k, v in salida.items()) and previa.get("fecha_modelo"):
+        salida["fecha_modelo"] = previa["fecha_modelo"]
+    else:
+        salida["fecha_modelo"] = date.today().isoformat()
+    st.session_state.rrhh_core["salida"] = salida
 else:
     st.info("Completa las horas estructurales para ver la huella humana.")
 
@@ -290,3 +311,44 @@ if st.session_state.rrhh_core["salida"]:
     )
 else:
     st.info("Todavía no hay salida estructural disponible.")
+
+# ======================================================
+# BLOQUE FINAL B · VERSIONES DEL MODELO
+# ======================================================
+st.divider()
+st.subheader("Versiones del modelo")
+st.caption(
+    "Cada versión queda guardada por fecha de modelo y puede leerse "
+    "desde otras páginas y procesos sin abrir esta pantalla."
+)
+
+if st.button("💾 Guardar versión del modelo"):
+    fecha_modelo = st.session_state.rrhh_core["salida"].get("fecha_modelo")
+    version = guardar_modelo(st.session_state.rrhh_core, fecha_modelo, DIRECTORIO)
+    if version:
+        st.success(f"Modelo guardado · versión {version}")
+    else:
+        st.info("Sin cambios respecto a la última versión guardada.")
+
+versiones = versiones_modelo(DIRECTORIO)
+
+if len(versiones) >= 2:
+    v1, v2 = st.columns(2)
+    with v1:
+        version_a = st.selectbox("Versión base", versiones, index=len(versiones) - 2)
+    with v2:
+        version_b = st.selectbox("Comparar con", versiones, index=len(versiones) - 1)
+
+    cambios = diferencias_modelo(
+        cargar_modelo(version_a, DIRECTORIO), cargar_modelo(version_b, DIRECTORIO)
+    )
+
+    if cambios:
+        st.table([
+            {"Campo": ruta, version_a: str(antes), version_b: str(despues)}
+            for ruta, antes, despues in cambios
+        ])
+    else:
+        st.caption("Las dos versiones son idénticas.")
+elif versiones:
+    st.caption(f"Versión guardada: {versiones[0]}")
@@ -1,36 +1,23 @@
 import streamlit as st
 import pandas as pd
-from pathlib import Path
 from datetime import date
 
+from oyken.cache import local_activo
+from oyken.calendario import MESES_ES
+from oyken.consolidacion import INVENTARIO_FILE, consolidar_inventario, variacion_inventario
+from oyken.mensual import guardar_mensual, leer_mensual
+
 # =====================================================
 # CONFIGURACIÓN
 # =====================================================
 st.title("OYKEN · Inventario")
 
-INVENTARIO_FILE = Path("inventario_mensual.csv")
-
-MESES_ES = {
-    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril",
-    5: "Mayo", 6: "Junio", 7: "Julio", 8: "Agosto",
-    9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
-}
+DIRECTORIO = local_activo()
 
 # =====================================================
-# CARGA / INICIALIZACIÓN CSV
+# CARGA
 # =====================================================
-if INVENTARIO_FILE.exists():
-    df_inv = pd.read_csv(INVENTARIO_FILE)
-else:
-    df_inv = pd.DataFrame(
-        columns=[
-            "anio",
-            "mes",
-            "inventario_cierre_eur",
-            "variacion_inventario_eur",
-            "fecha_actualizacion"
-        ]
-    )
+df_inv = leer_mensual(INVENTARIO_FILE, DIRECTORIO)
 
 # Asegurar tipos
 df_inv["anio"] = pd.to_numeric(df_inv["anio"], errors="coerce")
@@ -73,11 +60,6 @@ with st.form("form_inventario_mensual", clear_on_submit=True):
     guardar = st.form_submit_button("Guardar inventario")
 
     if guardar:
-        # Eliminar posible registro previo del mismo año/mes
-        df_inv = df_inv[
-            ~((df_inv["anio"] == anio_sel) & (df_inv["mes"] == mes_sel))
-        ]
-
         nuevo = pd.DataFrame([{
             "anio": anio_sel,
             "mes": mes_sel,
@@ -86,8 +68,9 @@ with st.form("form_inventario_mensual", clear_on_submit=True):
             "fecha_actualizacion": date.today().isoformat()
         }])
 
-        df_inv = pd.concat([df_inv, nuevo], ignore_index=True)
-        df_inv.to_csv(INVENTARIO_FILE, index=False)
+        # Sustituye el posible registro previo del mismo año/mes
+        guardar_mensual(INVENTARIO_FILE, nuevo, DIRECTORIO)
+        consolidar_inventario(DIRECTORIO)
 
         st.success("Inventario mensual guardado correctamente")
         st.rerun()
@@ -125,19 +108,9 @@ st.subheader("Variación de inventario mensual")
 
 if not df_inv.empty:
 
-    df_var = df_inv.sort_values(["anio", "mes"]).copy()
-
-    df_var["variacion_inventario_eur"] = (
-        df_var["inventario_cierre_eur"]
-        - df_var["inventario_cierre_eur"].shift(1)
-    )
-
-    # Primer registro sin variación
-    df_var.loc[df_var.index[0], "variacion_inventario_eur"] = 0
-
-    # Persistir variación recalculada
-    df_inv.update(df_var)
-    df_inv.to_csv(INVENTARIO_FILE, index=False)
+    # La variación se persiste al guardar un cierre (o en la
+    # consolidación); aquí solo se muestra
+    df_var = variacion_inventario(df_inv)
 
     df_var["Mes"] = df_var["mes"].map(MESES_ES)
 
@@ -157,7 +130,7 @@ if not df_inv.empty:
     )
 
 # =====================================================
-# BLOQUE 4 — INVENTARIO MENSUAL (CSV CANÓNICO)
+# BLOQUE 4 — INVENTARIO MENSUAL (TABLA CANÓNICA)
 # =====================================================
 st.divider()
 st.subheader("Inventario mensual (estructura de cálculo)")
@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
-from pathlib import Path
 from datetime import date
 
+from oyken.cache import franjas, local_activo, ventas_enriquecidas
+from oyken.calendario import DOW_ES
+from oyken.tickets import firma_tickets
+
 # =========================
 # CONFIGURACIÓN
 # =========================
@@ -10,31 +13,21 @@ from datetime import date
 st.title("OYKEN · Comportamiento del cliente")
 st.caption("Cómo compra el cliente · Semana en curso")
 
-DATA_FILE = Path("ventas.csv")
-
-DOW_ES = {
-    0: "Lunes", 1: "Martes", 2: "Miércoles",
-    3: "Jueves", 4: "Viernes", 5: "Sábado", 6: "Domingo"
-}
-
 # =========================
 # CARGA DE DATOS
 # =========================
-if not DATA_FILE.exists():
+DIRECTORIO = local_activo()
+df = ventas_enriquecidas(DIRECTORIO)
+
+if df.empty:
     st.warning("No hay datos suficientes.")
     st.stop()
 
-df = pd.read_csv(DATA_FILE, parse_dates=["fecha"])
-df = df.sort_values("fecha")
-
 # =========================
 # PREPARACIÓN TEMPORAL
 # =========================
-df["weekday"] = df["fecha"].dt.weekday
-df["dow"] = df["weekday"].map(DOW_ES)
-
-df["week"] = df["fecha"].dt.isocalendar().week
-df["year"] = df["fecha"].dt.isocalendar().year
+# dow_es, iso_week e iso_year vienen de la dimensión calendario
+df["dow"] = df["dow_es"]
 
 hoy = pd.to_datetime(date.today())
 week_actual = hoy.isocalendar().week
@@ -45,8 +38,8 @@ dow_hoy = hoy.weekday()
 # FILTROS DE PERIODO
 # =========================
 df_semana = df[
-    (df["week"] == week_actual) &
-    (df["year"] == year_actual)
+    (df["iso_week"] == week_actual) &
+    (df["iso_year"] == year_actual)
 ]
 
 df_patron = df[
@@ -192,3 +185,54 @@ for l in lectura:
     st.write(l)
 
 st.caption("Este bloque describe comportamiento. No anticipa ni recomienda.")
+
+# =========================
+# BLOQUE D · VENTAS POR FRANJA HORARIA
+# =========================
+# Solo con tickets importados desde el TPV (almacén de tickets)
+if firma_tickets(DIRECTORIO):
+    st.divider()
+    st.subheader("Ventas por franja horaria")
+
+    PERIODOS = {"Semana en curso": 0, "Últimas 4 semanas": 4, "Últimas 12 semanas": 12}
+
+    c1, c2 = st.columns(2)
+    with c1:
+        periodo = st.selectbox("Periodo", list(PERIODOS), key="periodo_franjas")
+    with c2:
+        minutos = st.selectbox("Tramo (minutos)", [60, 30, 15], key="minutos_franjas")
+
+    semanas = PERIODOS[periodo]
+    if semanas:
+        desde = hoy - pd.Timedelta(weeks=semanas)
+    else:
+        desde = hoy - pd.Timedelta(days=dow_hoy)
+
+    df_franjas = franjas(DIRECTORIO, desde, hoy, minutos)
+
+    if df_franjas.empty:
+        st.info("No hay tickets en el periodo seleccionado.")
+    else:
+        df_franjas["hora"] = df_franjas["franja"].map(lambda m: f"{m // 60:02d}:{m % 60:02d}")
+        dias = df_franjas["fecha"].nunique()
+
+        # Media por día del periodo (los días sin ventas en un tramo cuentan como 0)
+        media = (
+            df_franjas.groupby("hora")[["ventas_eur", "tickets"]].sum() / dias
+        ).round(2)
+
+        st.caption(f"Venta media por tramo · {dias} días")
+        st.bar_chart(media["ventas_eur"])
+
+        # Patrón día de la semana × hora (media de € por tramo)
+        df_franjas["dow"] = df_franjas["fecha"].dt.weekday
+        dias_dow = df_franjas.groupby("dow")["fecha"].nunique()
+        patron = (
+            df_franjas.pivot_table(index="hora", columns="dow", values="ventas_eur", aggfunc="sum", fill_value=0)
+            .div(dias_dow, axis=1)
+            .rename(columns=DOW_ES)
+            .round(0)
+        )
+
+        st.markdown("**€ medios por tramo y día de la semana**")
+        st.dataframe(patron, use_container_width=True)
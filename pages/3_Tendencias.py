@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-from pathlib import Path
+
+from oyken.cache import local_activo, tendencias, ventas_enriquecidas
+from oyken.tendencias import UMBRALES_ALERTA
 
 # =========================
 # CONFIGURACIÓN
@@ -11,28 +12,29 @@ st.set_page_config(page_title="OIKEN · Tendencias", layout="centered")
 st.title("OIKEN · Tendencias")
 st.caption("Estructura, estabilidad y robustez del negocio")
 
-DATA_FILE = Path("ventas.csv")
-
 # =========================
 # CARGA DE DATOS
 # =========================
-if not DATA_FILE.exists():
+DIRECTORIO = local_activo()
+df = ventas_enriquecidas(DIRECTORIO)
+
+if df.empty:
     st.error("No hay datos suficientes para analizar tendencias.")
     st.stop()
 
-df = pd.read_csv(DATA_FILE, parse_dates=["fecha"]).sort_values("fecha")
 hoy = df["fecha"].max()
 
+# Tabla precalculada de indicadores para todo el histórico
+# (tendencias_indicadores.parquet); los bloques leen el último día
+serie = tendencias(DIRECTORIO)
+ultimo = serie.iloc[-1]
+
 # =========================
 # UTILIDADES
 # =========================
 def rango_fechas(df):
     return f"{df['fecha'].min().strftime('%d/%m')} – {df['fecha'].max().strftime('%d/%m')}"
 
-def cv_turno_seguro(ventas, tickets):
-    tm = np.where(tickets > 0, ventas / tickets, np.nan)
-    return np.nanstd(tm)
-
 def info_requisito(texto):
     st.markdown(
         f"""
@@ -65,21 +67,6 @@ def render_bloque_no_disponible(titulo, motivo, requisito):
     info_requisito(requisito)
     st.divider()
 
-# =========================
-# VARIABLES BASE
-# =========================
-df["tickets_total"] = (
-    df["tickets_manana"] +
-    df["tickets_tarde"] +
-    df["tickets_noche"]
-)
-
-df["ticket_medio"] = np.where(
-    df["tickets_total"] > 0,
-    df["ventas_total_eur"] / df["tickets_total"],
-    np.nan
-)
-
 # =========================
 # VENTANAS TEMPORALES
 # =========================
@@ -133,12 +120,8 @@ else:
 # =========================
 # 2 · CONSISTENCIA DEL RESULTADO
 # =========================
-if len(df_7) >= 7 and df_7["ventas_total_eur"].mean() > 0:
-    cv_ventas = (
-        df_7["ventas_total_eur"].std()
-        / df_7["ventas_total_eur"].mean()
-        * 100
-    )
+if pd.notna(ultimo["cv_ventas"]):
+    cv_ventas = ultimo["cv_ventas"]
 
     texto = f"""
 Este bloque evalúa la consistencia del resultado diario, entendida
@@ -167,10 +150,7 @@ else:
 # 3 · DÍAS FUERTES Y DÉBILES
 # =========================
 if len(df_15) >= 15:
-    df_15 = df_15.copy()
-    df_15["weekday"] = df_15["fecha"].dt.day_name()
-
-    media_dia = df_15.groupby("weekday")["ventas_total_eur"].mean()
+    media_dia = df_15.groupby("dow_es")["ventas_total_eur"].mean()
     dia_fuerte = media_dia.idxmax()
     dia_debil = media_dia.idxmin()
 
@@ -200,12 +180,8 @@ else:
 # =========================
 # 4 · ESTABILIDAD DEL TICKET MEDIO
 # =========================
-if len(df_7) >= 7 and df_7["ticket_medio"].mean() > 0:
-    cv_ticket = (
-        df_7["ticket_medio"].std()
-        / df_7["ticket_medio"].mean()
-        * 100
-    )
+if pd.notna(ultimo["cv_ticket"]):
+    cv_ticket = ultimo["cv_ticket"]
 
     texto = f"""
 Este bloque evalúa la regularidad del ingreso por operación,
@@ -234,12 +210,14 @@ else:
 # =========================
 if len(df_7) >= 7:
     tabla_turnos = [
-        {"Turno": "Mañana", "CV": cv_turno_seguro(df_7["ventas_manana_eur"], df_7["tickets_manana"])},
-        {"Turno": "Tarde",  "CV": cv_turno_seguro(df_7["ventas_tarde_eur"], df_7["tickets_tarde"])},
-        {"Turno": "Noche",  "CV": cv_turno_seguro(df_7["ventas_noche_eur"], df_7["tickets_noche"])},
+        {"Turno": "Mañana", "CV": ultimo["vol_manana"]},
+        {"Turno": "Tarde",  "CV": ultimo["vol_tarde"]},
+        {"Turno": "Noche",  "CV": ultimo["vol_noche"]},
     ]
 
-    turno_mas_volatil = max(tabla_turnos, key=lambda x: x["CV"])["Turno"]
+    turno_mas_volatil = max(
+        tabla_turnos, key=lambda x: x["CV"] if pd.notna(x["CV"]) else -1
+    )["Turno"]
 
     texto = f"""
 El análisis por franjas horarias muestra una ejecución no homogénea
@@ -267,17 +245,7 @@ else:
 # 6 · DEPENDENCIA DE PICOS
 # =========================
 if len(df_10) >= 10:
-    media = df_10["ventas_total_eur"].mean()
-    desv = df_10["ventas_total_eur"].std()
-
-    if media > 0 and desv > 0:
-        pct_picos = (
-            df_10[df_10["ventas_total_eur"] > media + 2 * desv]["ventas_total_eur"].sum()
-            / df_10["ventas_total_eur"].sum()
-            * 100
-        )
-    else:
-        pct_picos = 0
+    pct_picos = ultimo["pct_picos"]
 
     texto = f"""
 Este bloque evalúa la dependencia del negocio respecto a días de
@@ -301,6 +269,55 @@ else:
         "Requisito mínimo: 10 días de operación."
     )
 
+# =========================
+# 7 · EVOLUCIÓN DE INDICADORES
+# =========================
+st.subheader("EVOLUCIÓN DE INDICADORES")
+st.caption("Valor diario de cada indicador sobre su ventana móvil")
+
+PERIODOS = {"Últimos 90 días": 90, "Último año": 365, "Todo el histórico": None}
+periodo = st.radio("Periodo", list(PERIODOS), horizontal=True)
+
+serie_periodo = serie.set_index("fecha")
+if PERIODOS[periodo]:
+    serie_periodo = serie_periodo[serie_periodo.index > hoy - pd.Timedelta(days=PERIODOS[periodo])]
+
+NOMBRES_INDICADOR = {
+    "cv_ventas": "CV ventas (%)",
+    "cv_ticket": "CV ticket medio (%)",
+    "pct_picos": "Ventas en picos (%)"
+}
+
+# Alertas: valor actual y días por encima del umbral en el periodo
+for col, umbral in UMBRALES_ALERTA.items():
+    dias_alerta = int((serie_periodo[col] > umbral).sum())
+    if pd.notna(ultimo[col]) and ultimo[col] > umbral:
+        st.warning(
+            f"{NOMBRES_INDICADOR[col]}: {ultimo[col]:.1f} % supera el umbral de {umbral:.0f} % "
+            f"· {dias_alerta} días en alerta en el periodo"
+        )
+    elif dias_alerta:
+        st.caption(f"{NOMBRES_INDICADOR[col]}: {dias_alerta} días por encima de {umbral:.0f} % en el periodo")
+
+for col in UMBRALES_ALERTA:
+    st.markdown(f"**{NOMBRES_INDICADOR[col]}**")
+    st.line_chart(
+        serie_periodo[[col]]
+        .rename(columns={col: NOMBRES_INDICADOR[col]})
+        .assign(Umbral=UMBRALES_ALERTA[col])
+    )
+
+st.markdown("**Volatilidad del ticket medio por turno (€)**")
+st.line_chart(
+    serie_periodo[["vol_manana", "vol_tarde", "vol_noche"]].rename(columns={
+        "vol_manana": "Mañana",
+        "vol_tarde": "Tarde",
+        "vol_noche": "Noche"
+    })
+)
+
+st.divider()
+
 # =========================
 # NOTA FINAL
 # =========================
@@ -1,50 +1,34 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from pathlib import Path
 from datetime import date
 
+from oyken.cache import local_activo, ventas_enriquecidas
+from oyken.calendario import con_comparables
+
 # =========================
 # CONFIGURACIÓN
 # =========================
 st.title("OIKEN · Comparables")
 st.caption("Pulso diario, proyección y estructura temporal del negocio")
 
-DATA_FILE = Path("ventas.csv")
-
 # =========================
 # CARGA DE DATOS
 # =========================
-if not DATA_FILE.exists():
-    st.error("No hay datos suficientes para mostrar comparables.")
-    st.stop()
-
-df = pd.read_csv(DATA_FILE, parse_dates=["fecha"])
-df = df.sort_values("fecha")
+# anio, mes, cuatrimestre y fecha_comp vienen de la dimensión calendario
+df = ventas_enriquecidas(local_activo())
 
 if df.empty:
+    st.error("No hay datos suficientes para mostrar comparables.")
     st.stop()
 
-# =========================
-# VARIABLES BASE
-# =========================
-df["year"] = df["fecha"].dt.year
-df["weekday"] = df["fecha"].dt.weekday
-df["day"] = df["fecha"].dt.day
-
-df["tickets_total"] = (
-    df["tickets_manana"] +
-    df["tickets_tarde"] +
-    df["tickets_noche"]
-)
-
 # =========================
 # FECHA ACTUAL
 # =========================
 hoy = pd.to_datetime(date.today())
 df_mes = df[
-    (df["fecha"].dt.year == hoy.year) &
-    (df["fecha"].dt.month == hoy.month) &
+    (df["anio"] == hoy.year) &
+    (df["mes"] == hoy.month) &
     (df["fecha"] <= hoy)
 ].copy()
 
@@ -63,34 +47,16 @@ estimacion_cierre = ritmo_diario * 30
 # =========================
 st.subheader("Pulso diario (comparativa DOW)")
 
-df_prev = df[
-    (df["fecha"].dt.year == hoy.year - 1) &
-    (df["fecha"].dt.month == hoy.month)
-].copy()
-
-registros = []
-
-for _, row in df_mes.iterrows():
-    dow_eq = df_prev[df_prev["weekday"] == row["weekday"]]
-    if dow_eq.empty:
-        continue
-
-    ref = dow_eq.iloc[0]
-    if ref["ventas_total_eur"] <= 0:
-        continue
-
-    pct = (
-        (row["ventas_total_eur"] - ref["ventas_total_eur"])
-        / ref["ventas_total_eur"] * 100
-    )
-
-    registros.append({
-        "fecha": row["fecha"].strftime("%a %d"),
-        "variacion_pct": pct,
-        "ventas": row["ventas_total_eur"]
-    })
+# Cada día del mes cruzado con su comparable ISO del año anterior
+df_mes = con_comparables(df_mes, df, columnas=["ventas_total_eur"])
 
-df_pulso = pd.DataFrame(registros)
+df_pulso = df_mes[df_mes["ventas_total_eur_comp"] > 0].copy()
+df_pulso["variacion_pct"] = (
+    (df_pulso["ventas_total_eur"] - df_pulso["ventas_total_eur_comp"])
+    / df_pulso["ventas_total_eur_comp"] * 100
+)
+df_pulso["ventas"] = df_pulso["ventas_total_eur"]
+df_pulso["fecha"] = df_pulso["dow_es"].str[:3] + " " + df_pulso["fecha"].dt.strftime("%d")
 
 if not df_pulso.empty:
     max_venta = df_pulso["ventas"].max()
@@ -130,7 +96,8 @@ st.caption(
 st.divider()
 st.subheader("Evolución mensual ajustada a DOW")
 
-ventas_prev = df_prev.head(len(df_mes))["ventas_total_eur"].sum()
+# Mismos días de la semana del año anterior, alineados por semana ISO
+ventas_prev = df_mes["ventas_total_eur_comp"].fillna(0).sum()
 
 if ventas_prev > 0:
     diff = ventas_acumuladas - ventas_prev
@@ -166,15 +133,10 @@ st.metric(
 st.divider()
 st.subheader("Peso del año por cuatrimestres")
 
-df_year = df[df["year"] == hoy.year].copy()
-df_year["cuatrimestre"] = pd.cut(
-    df_year["fecha"].dt.month,
-    bins=[0, 4, 8, 12],
-    labels=["Ene–Abr", "May–Ago", "Sep–Dic"]
-)
+df_year = df[df["anio"] == hoy.year]
 
 tabla_cuatri = (
-    df_year.groupby("cuatrimestre")["ventas_total_eur"]
+    df_year.groupby("cuatrimestre", observed=False)["ventas_total_eur"]
     .sum()
     .reset_index()
 )
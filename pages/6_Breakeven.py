@@ -1,6 +1,11 @@
 import streamlit as st
 import pandas as pd
-from pathlib import Path
+
+from oyken.cache import local_activo
+from oyken.calendario import MESES_ES
+from oyken.consolidacion import COMPRAS_MENSUALES_FILE
+from oyken.mensual import leer_mensual, leer_ventas_mensuales
+from oyken.rrhh_core import salida_vigente
 
 # =====================================================
 # CABECERA
@@ -11,32 +16,16 @@ st.caption("Punto de equilibrio estructural del negocio")
 st.divider()
 
 # =====================================================
-# ARCHIVOS CANÓNICOS
+# DATOS CANÓNICOS
 # =====================================================
 
-COSTE_PRODUCTO_FILE = Path("coste_producto.csv")
-RRHH_FILE = Path("rrhh_mensual.csv")
-GASTOS_FILE = Path("gastos.csv")
+DIRECTORIO = local_activo()
+GASTOS_FILE = DIRECTORIO / "gastos.csv"
 
 # =====================================================
 # SELECTOR TEMPORAL (AUTÓNOMO)
 # =====================================================
 
-MESES_ES = {
-    1: "Enero",
-    2: "Febrero",
-    3: "Marzo",
-    4: "Abril",
-    5: "Mayo",
-    6: "Junio",
-    7: "Julio",
-    8: "Agosto",
-    9: "Septiembre",
-    10: "Octubre",
-    11: "Noviembre",
-    12: "Diciembre"
-}
-
 c1, c2 = st.columns(2)
 
 with c1:
@@ -57,26 +46,43 @@ with c2:
 
 st.divider()
 
+# =====================================================
+# SUELO HUMANO ESTRUCTURAL (RRHH CORE)
+# =====================================================
+
+salida_core = salida_vigente(DIRECTORIO)
+
+st.markdown("### Suelo humano estructural")
+
+if salida_core:
+    c1, c2 = st.columns(2)
+    with c1:
+        st.metric("Pico simultáneo", f"{salida_core['pico_simultaneo']} funciones")
+    with c2:
+        st.metric("Horas estructurales", f"{salida_core['horas_diarias']:.1f} h / día")
+    st.caption(f"Fuente: RRHH Core · modelo {salida_core.get('fecha_modelo', '—')}")
+else:
+    st.caption("RRHH Core todavía no tiene un modelo guardado.")
+
+st.divider()
+
 # =====================================================
 # MARGEN BRUTO (DESDE COMPRAS + VENTAS)
 # =====================================================
 
-COMPRAS_MENSUALES_FILE = Path("compras_mensuales.csv")
-VENTAS_MENSUALES_FILE = Path("ventas_mensuales.csv")
+# ---------- Cargar datos ----------
+df_compras = leer_mensual(COMPRAS_MENSUALES_FILE, DIRECTORIO)
+df_ventas = leer_ventas_mensuales(DIRECTORIO)
 
 # ---------- Validaciones ----------
-if not COMPRAS_MENSUALES_FILE.exists():
+if df_compras.empty:
     st.error("No existen datos de Compras mensuales.")
     st.stop()
 
-if not VENTAS_MENSUALES_FILE.exists():
+if df_ventas.empty:
     st.error("No existen datos de Ventas mensuales.")
     st.stop()
 
-# ---------- Cargar datos ----------
-df_compras = pd.read_csv(COMPRAS_MENSUALES_FILE)
-df_ventas = pd.read_csv(VENTAS_MENSUALES_FILE)
-
 # ---------- Normalizar tipos (CRÍTICO) ----------
 for df in (df_compras, df_ventas):
     df["anio"] = df["anio"].astype(int)
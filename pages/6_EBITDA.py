@@ -1,6 +1,18 @@
 import streamlit as st
-import pandas as pd
-from pathlib import Path
+
+from oyken.cache import local_activo
+from oyken.calendario import MESES_ES
+from oyken.mensual import version_mensual
+from oyken.ebitda import (
+    FUENTES,
+    actualizar_ebitda,
+    consultar_ebitda,
+    indexar_ebitda,
+    rango_ejercicio,
+    rango_ultimos_12,
+    rango_ytd,
+    totales_ebitda
+)
 
 # =========================
 # CONFIGURACIÓN
@@ -13,55 +25,34 @@ st.set_page_config(
 st.title("OYKEN · EBITDA")
 
 # =========================
-# ARCHIVOS CANÓNICOS
+# TABLAS CANÓNICAS
 # =========================
-VENTAS_FILE      = Path("ventas_mensuales.csv")
-COMPRAS_FILE     = Path("compras_mensuales.csv")
-RRHH_FILE        = Path("rrhh_mensual.csv")
-GASTOS_FILE      = Path("gastos_mensuales.csv")
-INVENTARIO_FILE  = Path("inventario_mensual.csv")
-
-if not all(p.exists() for p in [
-    VENTAS_FILE, COMPRAS_FILE, RRHH_FILE, GASTOS_FILE
-]):
+DIRECTORIO = local_activo()
+
+# Ventas, compras, RRHH y gastos consolidados; el inventario es opcional
+if any(
+    version_mensual(FUENTES[columna], DIRECTORIO) is None
+    for columna in ["ventas_total_eur", "compras_total_eur", "rrhh_total_eur", "gastos_total_eur"]
+):
     st.warning("Aún no existen cierres mensuales suficientes para calcular EBITDA.")
     st.stop()
 
 # =========================
 # CARGA DE DATOS
 # =========================
-df_v = pd.read_csv(VENTAS_FILE)
-df_c = pd.read_csv(COMPRAS_FILE)
-df_r = pd.read_csv(RRHH_FILE)
-df_g = pd.read_csv(GASTOS_FILE)
-
-if INVENTARIO_FILE.exists():
-    df_i = pd.read_csv(INVENTARIO_FILE)
-else:
-    df_i = pd.DataFrame(columns=["anio", "mes", "variacion_inventario_eur"])
-
-# Normalizar tipos
-for df in [df_v, df_c, df_r, df_g, df_i]:
-    df["anio"] = pd.to_numeric(df["anio"], errors="coerce")
-    df["mes"] = pd.to_numeric(df["mes"], errors="coerce")
-
-df_v["ventas_total_eur"] = pd.to_numeric(df_v["ventas_total_eur"], errors="coerce").fillna(0)
-df_c["compras_total_eur"] = pd.to_numeric(df_c["compras_total_eur"], errors="coerce").fillna(0)
-df_r["rrhh_total_eur"] = pd.to_numeric(df_r["rrhh_total_eur"], errors="coerce").fillna(0)
-df_g["gastos_total_eur"] = pd.to_numeric(df_g["gastos_total_eur"], errors="coerce").fillna(0)
-df_i["variacion_inventario_eur"] = pd.to_numeric(
-    df_i.get("variacion_inventario_eur", 0),
-    errors="coerce"
-).fillna(0)
+# Tabla de hechos materializada: solo se recalcula si cambia alguna
+# de las fuentes mensuales.
+hechos = actualizar_ebitda(DIRECTORIO)
 
 # =========================
 # SELECTORES
 # =========================
-anios_disponibles = sorted(
-    set(df_v["anio"].dropna())
-    | set(df_c["anio"].dropna())
-    | set(df_r["anio"].dropna())
-    | set(df_g["anio"].dropna())
+anios_disponibles = sorted(hechos["anio"].unique())
+
+periodo = st.radio(
+    "Periodo",
+    ["Año natural", "Últimos 12 meses", "Acumulado del año", "Ejercicio fiscal"],
+    horizontal=True
 )
 
 c1, c2 = st.columns(2)
@@ -70,63 +61,51 @@ with c1:
     anio_sel = st.selectbox("Año", anios_disponibles, index=len(anios_disponibles) - 1)
 
 with c2:
-    mes_sel = st.selectbox(
-        "Mes",
-        options=[0] + list(range(1, 13)),
-        format_func=lambda x: "Todos los meses" if x == 0 else [
-            "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-            "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
-        ][x - 1]
-    )
-
-# =========================
-# FILTRADO
-# =========================
-for name in ["df_v", "df_c", "df_r", "df_g", "df_i"]:
-    locals()[name] = locals()[name][locals()[name]["anio"] == anio_sel]
-    if mes_sel != 0:
-        locals()[name] = locals()[name][locals()[name]["mes"] == mes_sel]
+    if periodo == "Año natural":
+        mes_sel = st.selectbox(
+            "Mes",
+            options=[0] + list(range(1, 13)),
+            format_func=lambda x: "Todos los meses" if x == 0 else MESES_ES[x]
+        )
+    elif periodo == "Ejercicio fiscal":
+        mes_sel = st.selectbox(
+            "Mes de inicio del ejercicio",
+            options=list(range(1, 13)),
+            format_func=lambda x: MESES_ES[x]
+        )
+    else:
+        # Por defecto, el último mes con datos del año elegido
+        ultimo_mes = int(hechos.loc[hechos["anio"] == anio_sel, "mes"].max())
+        mes_sel = st.selectbox(
+            "Mes de cierre",
+            options=list(range(1, 13)),
+            index=ultimo_mes - 1,
+            format_func=lambda x: MESES_ES[x]
+        )
 
 # =========================
 # BASE MENSUAL
 # =========================
-base = pd.DataFrame({"mes": range(1, 13)})
-
-base = base.merge(df_v[["mes", "ventas_total_eur"]], on="mes", how="left")
-base = base.merge(df_c[["mes", "compras_total_eur"]], on="mes", how="left")
-base = base.merge(df_r[["mes", "rrhh_total_eur"]], on="mes", how="left")
-base = base.merge(df_g[["mes", "gastos_total_eur"]], on="mes", how="left")
-base = base.merge(df_i[["mes", "variacion_inventario_eur"]], on="mes", how="left")
-
-base = base.fillna(0)
-
-if mes_sel != 0:
-    base = base[base["mes"] == mes_sel]
-
-base = base.sort_values("mes")
-
-# =========================
-# CÁLCULOS
-# =========================
-base["ebitda_base_eur"] = (
-    base["ventas_total_eur"]
-    - base["compras_total_eur"]
-    - base["rrhh_total_eur"]
-    - base["gastos_total_eur"]
-)
+if periodo == "Año natural":
+    desde, hasta = (anio_sel, mes_sel or 1), (anio_sel, mes_sel or 12)
+elif periodo == "Últimos 12 meses":
+    desde, hasta = rango_ultimos_12(anio_sel, mes_sel)
+elif periodo == "Acumulado del año":
+    desde, hasta = rango_ytd(anio_sel, mes_sel)
+else:
+    desde, hasta = rango_ejercicio(anio_sel, mes_sel)
 
-base["ebitda_ajustado_eur"] = (
-    base["ebitda_base_eur"]
-    - base["variacion_inventario_eur"]
-)
+base = consultar_ebitda(indexar_ebitda(hechos), desde, hasta)
+totales = totales_ebitda(base)
 
-MESES_ES = {
-    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril",
-    5: "Mayo", 6: "Junio", 7: "Julio", 8: "Agosto",
-    9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
-}
+if desde[0] == hasta[0]:
+    base["Mes"] = base["mes"].map(MESES_ES)
+else:
+    base["Mes"] = base["mes"].map(MESES_ES) + " " + base["anio"].astype(str)
 
-base["Mes"] = base["mes"].map(MESES_ES)
+# Fila de total del periodo al pie de cada tabla
+if len(base) > 1:
+    base.loc[len(base)] = {**totales.to_dict(), "Mes": "Total periodo"}
 
 # =====================================================
 # BLOQUE 1 — EBITDA OPERATIVO
@@ -0,0 +1,123 @@
+import streamlit as st
+
+from oyken.cache import grupo, local_activo
+from oyken.calendario import MESES_ES
+from oyken.ebitda import METRICAS_EBITDA
+from oyken.grupo import ranking_locales, total_grupo
+from oyken.locales import listar_locales
+
+# =========================
+# CONFIGURACIÓN
+# =========================
+st.set_page_config(
+    page_title="OYKEN · Grupo",
+    layout="centered"
+)
+
+st.title("OYKEN · Grupo")
+st.caption("Ventas y EBITDA consolidados de todos los locales")
+
+local_activo()
+
+if not listar_locales():
+    st.info("Esta instalación tiene un solo local: no hay consolidado de grupo.")
+    st.stop()
+
+# =========================
+# CARGA DE DATOS
+# =========================
+# La página solo lee grupo_mensual.parquet: lo escribe el worker
+# (python -m oyken grupo, o la consolidación en modo vigilancia).
+por_local = grupo()
+
+if por_local.empty:
+    st.warning(
+        "Aún no hay consolidado de grupo. Se genera con `python -m oyken grupo` "
+        "o con la consolidación en modo vigilancia."
+    )
+    st.stop()
+
+COLUMNAS_VISIBLES = {
+    "ventas_total_eur": "Ventas (€)",
+    "compras_total_eur": "Compras (€)",
+    "rrhh_total_eur": "RRHH (€)",
+    "gastos_total_eur": "Gastos (€)",
+    "ebitda_base_eur": "EBITDA operativo (€)",
+    "ebitda_ajustado_eur": "EBITDA ajustado (€)"
+}
+
+# =========================
+# SELECTOR
+# =========================
+anios_disponibles = sorted(por_local["anio"].unique())
+anio_sel = st.selectbox("Año", anios_disponibles, index=len(anios_disponibles) - 1)
+
+# =====================================================
+# BLOQUE 1 — GRUPO
+# =====================================================
+st.divider()
+st.subheader(f"Grupo · {anio_sel}")
+
+base = total_grupo(por_local)
+base = base[base["anio"] == anio_sel].reset_index(drop=True)
+totales = base[METRICAS_EBITDA].sum()
+
+c1, c2, c3 = st.columns(3)
+c1.metric("Ventas", f"{totales['ventas_total_eur']:,.0f} €")
+c2.metric("EBITDA ajustado", f"{totales['ebitda_ajustado_eur']:,.0f} €")
+c3.metric(
+    "Margen EBITDA",
+    f"{totales['ebitda_ajustado_eur'] / totales['ventas_total_eur']:.1%}"
+    if totales["ventas_total_eur"] > 0 else "—"
+)
+
+base["Mes"] = base["mes"].map(MESES_ES)
+st.dataframe(
+    base[["Mes", *COLUMNAS_VISIBLES]].rename(columns=COLUMNAS_VISIBLES),
+    hide_index=True,
+    use_container_width=True
+)
+
+# =====================================================
+# BLOQUE 2 — LOCALES
+# =====================================================
+st.divider()
+st.subheader("Comparativa de locales")
+
+ranking = ranking_locales(por_local, anio_sel)
+ranking["Peso ventas %"] = (
+    ranking["ventas_total_eur"] / totales["ventas_total_eur"] * 100
+).round(1) if totales["ventas_total_eur"] > 0 else 0.0
+
+st.dataframe(
+    ranking[["local", *COLUMNAS_VISIBLES, "Peso ventas %"]]
+    .rename(columns={"local": "Local", **COLUMNAS_VISIBLES}),
+    hide_index=True,
+    use_container_width=True
+)
+
+# =====================================================
+# BLOQUE 3 — DETALLE POR LOCAL
+# =====================================================
+st.divider()
+st.subheader("Detalle por local")
+
+locales = ranking["local"].tolist()
+local_sel = st.selectbox(
+    "Local",
+    locales,
+    index=locales.index(st.session_state.local_activo)
+    if st.session_state.get("local_activo") in locales else 0,
+    key="local_detalle_grupo"
+)
+
+detalle = por_local[
+    (por_local["local"] == local_sel) & (por_local["anio"] == anio_sel)
+].sort_values("mes").copy()
+detalle["Mes"] = detalle["mes"].map(MESES_ES)
+
+st.dataframe(
+    detalle[["Mes", *COLUMNAS_VISIBLES]].rename(columns=COLUMNAS_VISIBLES),
+    hide_index=True,
+    use_container_width=True
+)
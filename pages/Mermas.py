@@ -1,8 +1,9 @@
 import streamlit as st
-import pandas as pd
-from pathlib import Path
 from datetime import date
 
+from oyken.cache import local_activo
+from oyken.persistencia import anadir_filas, leer_csv
+
 # =========================
 # CONFIGURACIÓN
 # =========================
@@ -11,25 +12,22 @@ st.title("OYKEN · Mermas")
 st.markdown("**Registro operativo de pérdidas de producto**")
 st.caption("Fase 1 · Control por cantidad. Sin valoración económica.")
 
-DATA_FILE = Path("mermas.csv")
+DATA_FILE = local_activo() / "mermas.csv"
 
 # =========================
 # CARGA / ESTADO
 # =========================
-if DATA_FILE.exists():
-    df_mermas = pd.read_csv(DATA_FILE)
-else:
-    df_mermas = pd.DataFrame(
-        columns=[
-            "Fecha",
-            "Mes",
-            "Familia",
-            "Producto",
-            "Unidad",
-            "Cantidad",
-            "Motivo"
-        ]
-    )
+COLUMNAS_MERMAS = [
+    "Fecha",
+    "Mes",
+    "Familia",
+    "Producto",
+    "Unidad",
+    "Cantidad",
+    "Motivo"
+]
+
+df_mermas, _ = leer_csv(DATA_FILE, COLUMNAS_MERMAS)
 
 # =========================
 # CATÁLOGOS
@@ -109,12 +107,8 @@ with st.form("form_mermas", clear_on_submit=True):
             "Motivo": motivo
         }
 
-        df_mermas = pd.concat(
-            [df_mermas, pd.DataFrame([nueva])],
-            ignore_index=True
-        )
-
-        df_mermas.to_csv(DATA_FILE, index=False)
+        # Alta sobre el archivo actual (bajo cerrojo, escritura atómica)
+        df_mermas, _ = anadir_filas(DATA_FILE, [nueva], COLUMNAS_MERMAS)
         st.success("Merma registrada correctamente.")
 
 # =========================
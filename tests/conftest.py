@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Igual que los scripts de bench/: el paquete se importa desde la raíz
+# del repositorio sin instalarlo
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
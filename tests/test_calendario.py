@@ -0,0 +1,96 @@
+import os
+
+import pandas as pd
+
+from oyken.calendario import (
+    CALENDARIO_FILE,
+    FESTIVOS_FILE,
+    calendario,
+    con_comparables,
+    fecha_comparable,
+    festivos
+)
+
+
+def comparable(fecha, anios=1):
+    return pd.Timestamp(fecha_comparable([fecha], anios)[0])
+
+
+# =========================
+# COMPARABLES DOW (ISO)
+# =========================
+def test_mismo_dia_de_la_misma_semana_iso():
+    # Lunes de la semana 11 -> lunes de la semana 11 del año anterior
+    assert comparable("2025-03-10") == pd.Timestamp("2024-03-11")
+    assert comparable("2025-03-10").weekday() == 0
+
+
+def test_fecha_de_diciembre_en_la_semana_1_del_anio_siguiente():
+    # 30/12/2024 es lunes de la semana 1 de 2025
+    assert comparable("2024-12-30") == pd.Timestamp("2024-01-01")
+
+
+def test_semana_53_sin_semana_53_en_el_anio_previo():
+    # 2020 y 2026 tienen 53 semanas ISO; 2019 y 2025 no: cae en la 52
+    assert comparable("2021-01-01") == pd.Timestamp("2019-12-27")
+    assert comparable("2026-12-31") == pd.Timestamp("2025-12-25")
+
+
+def test_semana_53_con_semana_53_en_el_anio_de_referencia():
+    assert comparable("2026-12-31", anios=6) == pd.Timestamp("2020-12-31")
+
+
+def test_con_comparables_cruza_el_historico():
+    fechas = pd.date_range("2024-01-01", "2025-12-31")
+    historico = pd.DataFrame({"fecha": fechas, "ventas": range(len(fechas))})
+
+    df = con_comparables(historico[historico["fecha"].dt.year == 2025], historico, columnas=["ventas"])
+
+    assert df["ventas_comp"].notna().all()
+    fila = df[df["fecha"] == pd.Timestamp("2025-03-10")].iloc[0]
+    assert fila["fecha_comp"] == pd.Timestamp("2024-03-11")
+    assert fila["ventas_comp"] == historico.set_index("fecha").loc["2024-03-11", "ventas"]
+
+
+# =========================
+# FESTIVOS Y DIMENSIÓN CALENDARIO
+# =========================
+def test_viernes_santo():
+    dias = festivos([2024, 2025, 2026])
+    for viernes in ("2024-03-29", "2025-04-18", "2026-04-03"):
+        assert pd.Timestamp(viernes) in dias
+    assert pd.Timestamp("2025-04-20") not in dias  # domingo de Pascua, no festivo nacional
+
+
+def test_festivos_en_la_dimension(tmp_path):
+    cal = calendario("2025-01-01", "2025-12-31", tmp_path).set_index("fecha")
+    assert cal.loc["2025-04-18", "festivo"]
+    assert cal.loc["2025-12-25", "festivo"]
+    assert not cal.loc["2025-04-17", "festivo"]
+
+
+def test_cambio_en_festivos_regenera_aunque_el_mtime_sea_antiguo(tmp_path):
+    locales = tmp_path / FESTIVOS_FILE
+    pd.DataFrame({"fecha": ["2025-05-15"]}).to_csv(locales, index=False)
+    assert calendario("2025-05-01", "2025-05-31", tmp_path).set_index("fecha").loc["2025-05-15", "festivo"]
+
+    # Se sustituye por otra versión con fecha de modificación anterior
+    # a la del calendario (copia de una copia de seguridad, por ejemplo)
+    pd.DataFrame({"fecha": ["2025-05-16"]}).to_csv(locales, index=False)
+    antiguo = (tmp_path / CALENDARIO_FILE).stat().st_mtime_ns - 10**9
+    os.utime(locales, ns=(antiguo, antiguo))
+
+    cal = calendario("2025-05-01", "2025-05-31", tmp_path).set_index("fecha")
+    assert not cal.loc["2025-05-15", "festivo"]
+    assert cal.loc["2025-05-16", "festivo"]
+
+    # Sin festivos locales, tampoco
+    locales.unlink()
+    assert not calendario("2025-05-01", "2025-05-31", tmp_path).set_index("fecha").loc["2025-05-16", "festivo"]
+
+
+def test_sin_cambios_no_regenera(tmp_path):
+    calendario("2025-01-01", "2025-12-31", tmp_path)
+    antes = (tmp_path / CALENDARIO_FILE).stat().st_mtime_ns
+    calendario("2025-03-01", "2025-03-31", tmp_path)
+    assert (tmp_path / CALENDARIO_FILE).stat().st_mtime_ns == antes
@@ -0,0 +1,117 @@
+import pandas as pd
+import pytest
+
+from oyken.compras import (
+    COMPRAS_FILE,
+    CUBO_FILE,
+    agregar_cubo,
+    anadir_compras,
+    borrar_compras,
+    cubo_compras,
+    peso_familias,
+    top_proveedores,
+    variacion_mensual
+)
+from oyken.persistencia import ConflictoVersion
+
+
+def compra(fecha, proveedor, familia, coste):
+    return {"Fecha": fecha, "Proveedor": proveedor, "Familia": familia, "Coste (€)": coste}
+
+
+def ordenado(cubo):
+    return cubo.sort_values(["anio", "mes", "proveedor", "familia"]).reset_index(drop=True)
+
+
+def igual_que_rehecho(directorio):
+    # El cubo mantenido por deltas frente a uno agregado desde cero
+    cubo = pd.read_parquet(directorio / CUBO_FILE)
+    rehecho = agregar_cubo(pd.read_csv(directorio / COMPRAS_FILE))
+    rehecho["coste_eur"] = rehecho["coste_eur"].round(2)
+    pd.testing.assert_frame_equal(ordenado(cubo), ordenado(rehecho), check_dtype=False)
+
+
+# =========================
+# CUBO POR DELTAS
+# =========================
+def test_altas_y_bajas_igual_que_rehacer(tmp_path):
+    anadir_compras([
+        compra("03/01/2026", "Makro", "Materia prima", 100.10),
+        compra("15/01/2026", "Makro", "Materia prima", 50.20),
+        compra("20/01/2026", "Coca Cola", "Bebidas", 30.0),
+    ], tmp_path)
+    _, v = anadir_compras([compra("02/02/2026", "Makro", "Limpieza", 12.35)], tmp_path)
+    igual_que_rehecho(tmp_path)
+
+    # Baja de una línea de una celda con varias, y de la única de otra
+    _, v = borrar_compras([1], tmp_path, version_esperada=v)
+    igual_que_rehecho(tmp_path)
+    borrar_compras([1], tmp_path, version_esperada=v)
+    igual_que_rehecho(tmp_path)
+
+    cubo = ordenado(cubo_compras(tmp_path))
+    assert list(zip(cubo["mes"], cubo["proveedor"], cubo["coste_eur"], cubo["lineas"])) == [
+        (1, "Makro", 100.10, 1),
+        (2, "Makro", 12.35, 1),
+    ]
+
+
+def test_conflicto_no_toca_el_cubo(tmp_path):
+    _, v = anadir_compras([compra("03/01/2026", "Makro", "Materia prima", 100.0)], tmp_path)
+    anadir_compras([compra("04/01/2026", "Makro", "Materia prima", 40.0)], tmp_path)
+
+    with pytest.raises(ConflictoVersion):
+        borrar_compras([0], tmp_path, version_esperada=v)
+
+    igual_que_rehecho(tmp_path)
+    assert cubo_compras(tmp_path)["coste_eur"].sum() == 140.0
+
+
+def test_edicion_externa_rehace_el_cubo(tmp_path):
+    anadir_compras([compra("03/01/2026", "Makro", "Materia prima", 100.0)], tmp_path)
+
+    # Alguien edita compras.csv a mano: el cubo ya no refleja su versión
+    df = pd.read_csv(tmp_path / COMPRAS_FILE)
+    df.loc[0, "Coste (€)"] = 75.0
+    df.to_csv(tmp_path / COMPRAS_FILE, index=False)
+
+    assert cubo_compras(tmp_path)["coste_eur"].tolist() == [75.0]
+
+    # Y el siguiente delta parte del cubo rehecho
+    anadir_compras([compra("05/01/2026", "Makro", "Materia prima", 5.0)], tmp_path)
+    igual_que_rehecho(tmp_path)
+
+
+def test_compras_sin_familia(tmp_path):
+    pd.DataFrame({
+        "Fecha": ["03/01/2026", "04/01/2026"],
+        "Proveedor": ["Makro", "Makro"],
+        "Coste (€)": [10.0, 20.0],
+    }).to_csv(tmp_path / COMPRAS_FILE, index=False)
+
+    cubo = cubo_compras(tmp_path)
+    assert cubo["familia"].tolist() == ["Otros"]
+    assert cubo["coste_eur"].tolist() == [30.0]
+
+
+# =========================
+# CONSULTAS
+# =========================
+def test_consultas_del_cubo():
+    cubo = agregar_cubo(pd.DataFrame([
+        compra("10/12/2025", "Makro", "Materia prima", 200.0),
+        compra("10/01/2026", "Makro", "Materia prima", 300.0),
+        compra("11/01/2026", "Coca Cola", "Bebidas", 100.0),
+    ]))
+
+    top = top_proveedores(cubo, 2026, 1)
+    assert top["proveedor"].tolist() == ["Makro", "Coca Cola"]
+    assert top["acumulado_pct"].tolist() == [75.0, 100.0]
+
+    familias = peso_familias(cubo, 2026).set_index("familia")["coste_eur"]
+    assert familias.to_dict() == {"Materia prima": 300.0, "Bebidas": 100.0, "Limpieza": 0.0, "Otros": 0.0}
+
+    # Enero compara con diciembre del año anterior
+    variacion = variacion_mensual(cubo, 2026, 1).set_index("proveedor")
+    assert variacion.loc["Makro", "variacion_pct"] == 50.0
+    assert variacion.loc["Coca Cola", "variacion_eur"] == 100.0
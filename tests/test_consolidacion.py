@@ -0,0 +1,91 @@
+import threading
+
+import pandas as pd
+
+from oyken.consolidacion import (
+    INVENTARIO_FILE,
+    consolidar_grupo,
+    consolidar_inventario,
+    consolidar_todo_en_segundo_plano,
+    firma_brutos
+)
+from oyken.locales import crear_local
+from oyken.mensual import guardar_mensual
+from oyken.ventas import upsert_ventas
+
+
+# =========================
+# PASADA EN SEGUNDO PLANO
+# =========================
+def test_peticion_durante_una_pasada_no_se_pierde(tmp_path, monkeypatch):
+    en_curso, seguir = threading.Event(), threading.Event()
+    pasadas = []
+
+    def consolidar_todo(directorio):
+        pasadas.append(directorio)
+        en_curso.set()
+        seguir.wait(5)
+
+    monkeypatch.setattr("oyken.consolidacion.consolidar_todo", consolidar_todo)
+
+    hilo = consolidar_todo_en_segundo_plano(tmp_path)
+    en_curso.wait(5)
+
+    # Varias peticiones durante la pasada: quedan en una sola repetición
+    assert consolidar_todo_en_segundo_plano(tmp_path) is None
+    assert consolidar_todo_en_segundo_plano(tmp_path) is None
+    seguir.set()
+    hilo.join(5)
+
+    assert len(pasadas) == 2
+    assert not hilo.is_alive()
+
+    # Terminada, el cerrojo está libre para la siguiente
+    consolidar_todo_en_segundo_plano(tmp_path).join(5)
+    assert len(pasadas) == 3
+
+
+# =========================
+# CONSOLIDADO DE GRUPO INCREMENTAL
+# =========================
+def test_grupo_se_salta_los_locales_sin_cambios(tmp_path, monkeypatch):
+    centro, norte = crear_local("centro", tmp_path), crear_local("norte", tmp_path)
+    for directorio in (centro, norte):
+        upsert_ventas(pd.DataFrame({
+            "fecha": pd.date_range("2025-01-01", periods=3),
+            "ventas_total_eur": [10.0, 20.0, 30.0],
+        }), directorio)
+
+    pasadas = []
+    monkeypatch.setattr("oyken.consolidacion.consolidar_local", pasadas.append)
+
+    consolidar_grupo(tmp_path, procesos=1)
+    assert sorted(pasadas) == [centro, norte]
+
+    # Sin cambios en los brutos, ningún local se vuelve a consolidar
+    consolidar_grupo(tmp_path, procesos=1)
+    assert len(pasadas) == 2
+
+    # Solo el local con una venta nueva
+    upsert_ventas(pd.DataFrame({
+        "fecha": [pd.Timestamp("2025-01-04")], "ventas_total_eur": [40.0]
+    }), norte)
+    consolidar_grupo(tmp_path, procesos=1)
+    assert pasadas[2:] == [norte]
+
+
+def test_variacion_de_inventario_no_cambia_la_firma(tmp_path):
+    cierres = pd.DataFrame({
+        "anio": [2025, 2025], "mes": [1, 2],
+        "inventario_cierre_eur": [100.0, 150.0], "variacion_inventario_eur": [0.0, 0.0],
+    })
+    guardar_mensual(INVENTARIO_FILE, cierres, tmp_path)
+    antes = firma_brutos(tmp_path)
+
+    # La pasada reescribe la variación (derivada), no los cierres
+    assert consolidar_inventario(tmp_path)
+    assert firma_brutos(tmp_path) == antes
+
+    cierres.loc[1, "inventario_cierre_eur"] = 160.0
+    guardar_mensual(INVENTARIO_FILE, cierres, tmp_path)
+    assert firma_brutos(tmp_path) != antes
@@ -0,0 +1,126 @@
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+from oyken import db
+from oyken.consolidacion import COMPRAS_FILE, COMPRAS_MENSUALES_FILE, consolidar_compras
+from oyken.mensual import (
+    VENTAS_MENSUALES_FILE,
+    consolidar_ventas_mensuales,
+    guardar_mensual,
+    leer_mensual,
+    leer_ventas_mensuales,
+    version_mensual
+)
+from oyken.ventas import cargar_ventas, firma_ventas, registrar_venta, upsert_ventas
+
+
+def dias(desde, importes):
+    return pd.DataFrame({
+        "fecha": pd.date_range(desde, periods=len(importes)),
+        "ventas_total_eur": importes,
+    })
+
+
+# =========================
+# IMPORTACIÓN ÚNICA
+# =========================
+def test_primera_conexion_importa_los_csv(tmp_path):
+    dias("2025-01-01", [10.0, 20.0]).to_csv(tmp_path / "ventas.csv", index=False)
+    dias("2025-01-01", [11.0, 21.0, 31.0]).to_parquet(tmp_path / "ventas.parquet", index=False)
+    pd.DataFrame({
+        "anio": [2025, 2025, 2025],
+        "mes": [1, 2, 1],
+        "ventas_total_eur": [100.0, 200.0, 150.0],
+    }).to_csv(tmp_path / VENTAS_MENSUALES_FILE, index=False)
+
+    # El Parquet (base compactada) gana a la copia CSV; repetidos, el último
+    assert cargar_ventas(directorio=tmp_path)["ventas_total_eur"].tolist() == [11.0, 21.0, 31.0]
+    mensual = leer_ventas_mensuales(tmp_path)
+    assert list(zip(mensual["mes"], mensual["ventas_total_eur"])) == [(1, 150.0), (2, 200.0)]
+
+    # Importado una vez, los CSV ya no se leen
+    (tmp_path / "ventas.parquet").unlink()
+    assert len(cargar_ventas(directorio=tmp_path)) == 3
+    assert db.importar_csvs(tmp_path)["ventas"] == 2
+
+
+def test_sin_datos_no_crea_la_base(tmp_path):
+    assert firma_ventas(tmp_path) == ()
+    assert leer_mensual(VENTAS_MENSUALES_FILE, tmp_path).empty
+    assert version_mensual(VENTAS_MENSUALES_FILE, tmp_path) is None
+    assert not (tmp_path / db.DB_FILE).exists()
+
+
+# =========================
+# CONSULTAS POR RANGO
+# =========================
+def test_rango_de_fechas_con_el_diario(tmp_path):
+    upsert_ventas(dias("2025-01-30", [1.0, 2.0, 3.0, 4.0]), tmp_path)
+    registrar_venta({"fecha": pd.Timestamp("2025-02-01"), "ventas_total_eur": 99.0}, tmp_path)
+
+    df = cargar_ventas(["ventas_total_eur"], tmp_path, desde="2025-01-31", hasta="2025-02-01")
+    assert df["fecha"].tolist() == [pd.Timestamp("2025-01-31"), pd.Timestamp("2025-02-01")]
+    assert df["ventas_total_eur"].tolist() == [2.0, 99.0]
+
+
+def test_rango_mensual_cruza_el_anio(tmp_path):
+    guardar_mensual(COMPRAS_MENSUALES_FILE, pd.DataFrame({
+        "anio": [2024, 2024, 2025, 2025],
+        "mes": [11, 12, 1, 2],
+        "compras_total_eur": [1.0, 2.0, 3.0, 4.0],
+    }), tmp_path)
+
+    df = leer_mensual(COMPRAS_MENSUALES_FILE, tmp_path, desde=(2024, 12), hasta=(2025, 1))
+    assert list(zip(df["anio"], df["mes"])) == [(2024, 12), (2025, 1)]
+
+
+# =========================
+# ESCRITURA TRANSACCIONAL
+# =========================
+def test_fallo_dentro_de_la_transaccion_no_deja_nada(tmp_path):
+    guardar_mensual(COMPRAS_MENSUALES_FILE, pd.DataFrame({
+        "anio": [2025], "mes": [1], "compras_total_eur": [10.0]
+    }), tmp_path)
+    antes = version_mensual(COMPRAS_MENSUALES_FILE, tmp_path)
+
+    with closing(db.conectar(tmp_path)) as con:
+        with pytest.raises(RuntimeError), db.transaccion(con):
+            db.upsert(con, "compras_mensuales", pd.DataFrame({
+                "anio": [2025, 2025], "mes": [1, 2], "compras_total_eur": [99.0, 99.0]
+            }))
+            raise RuntimeError("a medias")
+
+    assert leer_mensual(COMPRAS_MENSUALES_FILE, tmp_path)["compras_total_eur"].tolist() == [10.0]
+    assert version_mensual(COMPRAS_MENSUALES_FILE, tmp_path) == antes
+
+
+def test_consolidacion_solo_escribe_los_meses_cambiados(tmp_path):
+    diario = dias("2025-01-30", [10.0, 20.0, 30.0])
+    assert consolidar_ventas_mensuales(diario, directorio=tmp_path)
+    antes = leer_ventas_mensuales(tmp_path).set_index("mes")["fecha_actualizacion"]
+    assert not consolidar_ventas_mensuales(diario, directorio=tmp_path)
+
+    diario.loc[2, "ventas_total_eur"] = 35.0
+    assert consolidar_ventas_mensuales(diario, directorio=tmp_path)
+    despues = leer_ventas_mensuales(tmp_path).set_index("mes")
+    assert despues.loc[[1, 2], "ventas_total_eur"].tolist() == [30.0, 35.0]
+    assert despues.loc[1, "fecha_actualizacion"] == antes[1]
+    assert despues.loc[2, "fecha_actualizacion"] != antes[2]
+
+
+def test_anio_sin_compras_sale_de_la_tabla(tmp_path):
+    compras = pd.DataFrame({
+        "Fecha": ["03/12/2024", "03/01/2025"],
+        "Proveedor": ["Makro", "Makro"],
+        "Coste (€)": [10.0, 20.0],
+    })
+    compras.to_csv(tmp_path / COMPRAS_FILE, index=False)
+    assert consolidar_compras(tmp_path)
+    assert set(leer_mensual(COMPRAS_MENSUALES_FILE, tmp_path)["anio"]) == {2024, 2025}
+
+    compras.iloc[1:].to_csv(tmp_path / COMPRAS_FILE, index=False)
+    assert consolidar_compras(tmp_path)
+    assert set(leer_mensual(COMPRAS_MENSUALES_FILE, tmp_path)["anio"]) == {2025}
+    assert not consolidar_compras(tmp_path)
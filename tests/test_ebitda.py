@@ -0,0 +1,132 @@
+from contextlib import closing
+
+import pandas as pd
+
+from oyken import db
+from oyken.ebitda import (
+    FUENTES,
+    METRICAS_EBITDA,
+    actualizar_ebitda,
+    clave_mes,
+    consultar_ebitda,
+    indexar_ebitda,
+    leer_ebitda,
+    rango_ejercicio,
+    rango_ultimos_12,
+    rango_ytd,
+    totales_ebitda
+)
+
+
+def escribir_fuente(directorio, columna, meses):
+    # meses: {(anio, mes): importe}; sustituye la tabla entera
+    df = pd.DataFrame(
+        [(a, m, v) for (a, m), v in meses.items()],
+        columns=["anio", "mes", columna],
+    )
+    with closing(db.conectar(directorio)) as con:
+        db.reemplazar(con, db.tabla_de(FUENTES[columna]), df)
+
+
+# =========================
+# MATERIALIZACIÓN
+# =========================
+def test_ebitda_calculado_en_float(tmp_path):
+    escribir_fuente(tmp_path, "ventas_total_eur", {(2025, 1): 1000, (2025, 2): 1200})
+    escribir_fuente(tmp_path, "compras_total_eur", {(2025, 1): 300})
+    escribir_fuente(tmp_path, "variacion_inventario_eur", {(2025, 2): 50})
+
+    df = actualizar_ebitda(tmp_path)
+
+    assert (df.dtypes[METRICAS_EBITDA] == float).all()
+    assert df["ebitda_base_eur"].tolist() == [700.0, 1200.0]
+    assert df["ebitda_ajustado_eur"].tolist() == [700.0, 1150.0]
+
+    totales = totales_ebitda(df)
+    assert totales.dtype == float
+    assert totales["ebitda_ajustado_eur"] == 1850.0
+
+
+def test_tabla_vacia_en_float(tmp_path):
+    assert (leer_ebitda(tmp_path).dtypes[METRICAS_EBITDA] == float).all()
+    assert totales_ebitda(actualizar_ebitda(tmp_path)).dtype == float
+
+
+def test_solo_recalcula_fuentes_cambiadas(tmp_path):
+    escribir_fuente(tmp_path, "ventas_total_eur", {(2025, 1): 1000})
+    escribir_fuente(tmp_path, "gastos_total_eur", {(2025, 1): 100})
+    actualizar_ebitda(tmp_path)
+
+    escribir_fuente(tmp_path, "gastos_total_eur", {(2025, 1): 250})
+    df = actualizar_ebitda(tmp_path)
+
+    assert df["ebitda_base_eur"].tolist() == [750.0]
+    assert df.equals(actualizar_ebitda(tmp_path, forzar=True))
+
+
+def test_mes_retirado_de_las_fuentes_sale_de_la_tabla(tmp_path):
+    escribir_fuente(tmp_path, "ventas_total_eur", {(2024, 12): 900, (2025, 1): 1000})
+    escribir_fuente(tmp_path, "rrhh_total_eur", {(2025, 1): 400})
+    actualizar_ebitda(tmp_path)
+
+    # Diciembre desaparece de la única fuente que lo tenía
+    escribir_fuente(tmp_path, "ventas_total_eur", {(2025, 1): 1000})
+    df = actualizar_ebitda(tmp_path)
+
+    assert list(zip(df["anio"], df["mes"])) == [(2025, 1)]
+    assert df.equals(actualizar_ebitda(tmp_path, forzar=True))
+
+    # Un mes que sigue en otra fuente se queda, con la columna a 0
+    escribir_fuente(tmp_path, "ventas_total_eur", {(2025, 2): 800})
+    df = actualizar_ebitda(tmp_path)
+    assert list(zip(df["anio"], df["mes"])) == [(2025, 1), (2025, 2)]
+    assert df["ventas_total_eur"].tolist() == [0.0, 800.0]
+
+
+# =========================
+# CONSULTAS POR RANGO
+# =========================
+def hechos_mensuales(desde, meses):
+    # ventas = clave_mes, resto a 0: cada fila se reconoce por su importe
+    claves = range(clave_mes(*desde), clave_mes(*desde) + meses)
+    df = pd.DataFrame({
+        "anio": [k // 12 for k in claves],
+        "mes": [k % 12 + 1 for k in claves],
+    })
+    for columna in METRICAS_EBITDA:
+        df[columna] = 0.0
+    df["ventas_total_eur"] = [float(k) for k in claves]
+    df["ebitda_base_eur"] = df["ventas_total_eur"]
+    return indexar_ebitda(df)
+
+
+def test_ultimos_12_cruzan_el_anio():
+    assert rango_ultimos_12(2026, 3) == ((2025, 4), (2026, 3))
+    assert rango_ultimos_12(2026, 12) == ((2026, 1), (2026, 12))
+
+    mensual = consultar_ebitda(hechos_mensuales((2024, 1), 36), *rango_ultimos_12(2026, 3))
+    assert len(mensual) == 12
+    assert list(zip(mensual["anio"], mensual["mes"]))[0] == (2025, 4)
+    assert totales_ebitda(mensual)["ventas_total_eur"] == sum(range(clave_mes(2025, 4), clave_mes(2026, 3) + 1))
+
+
+def test_ytd():
+    assert rango_ytd(2026, 5) == ((2026, 1), (2026, 5))
+    mensual = consultar_ebitda(hechos_mensuales((2025, 1), 24), *rango_ytd(2026, 5))
+    assert mensual["mes"].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_ejercicio_fiscal():
+    assert rango_ejercicio(2026) == ((2026, 1), (2026, 12))
+    assert rango_ejercicio(2026, 9) == ((2025, 9), (2026, 8))
+    assert rango_ejercicio(2026, 12) == ((2025, 12), (2026, 11))
+
+
+def test_meses_sin_datos_salen_a_cero():
+    # Hechos de mar-2025 a jun-2025; el ejercicio pide sep-2024 a ago-2025
+    mensual = consultar_ebitda(hechos_mensuales((2025, 3), 4), *rango_ejercicio(2025, 9))
+
+    assert len(mensual) == 12
+    assert (mensual.dtypes[METRICAS_EBITDA] == float).all()
+    con_datos = mensual[mensual["ventas_total_eur"] > 0]
+    assert list(zip(con_datos["anio"], con_datos["mes"])) == [(2025, 3), (2025, 4), (2025, 5), (2025, 6)]
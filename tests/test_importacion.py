@@ -0,0 +1,168 @@
+import pandas as pd
+import pytest
+
+from oyken.compras import COMPRAS_FILE
+from oyken.importacion import ErrorImportacion, _importe, agregar_pos, importar_compras, importar_pos
+from oyken.proveedores import cargar_proveedores, proveedor_existente
+from oyken.tickets import (
+    TICKETS_DIR,
+    leer_tickets,
+    particiones,
+    reagregar_ventas,
+    retirar_tickets,
+    ventas_por_turno
+)
+from oyken.ventas import cargar_ventas, registrar_venta
+
+
+def exportacion_tpv(ruta, filas):
+    # filas: [(fecha_hora, importe, comensales)]
+    pd.DataFrame(filas, columns=["Fecha Hora", "Importe", "Comensales"]).to_csv(ruta, index=False)
+    return ruta
+
+
+# =========================
+# TPV · TICKETS POR BLOQUES
+# =========================
+def test_tickets_por_bloques(tmp_path):
+    origen = exportacion_tpv(tmp_path / "tpv.csv", [
+        ("2026-01-31 13:00", 20.0, 2),
+        ("2026-01-31 21:00", 30.0, 2),
+        ("2026-02-01 01:30", 15.0, 1),   # noche del 31/01
+        ("2026-02-01 12:00", 40.0, 3),
+        ("2026-02-01 12:30", -5.0, 0),   # devolución: resta, no es ticket
+        ("no es una fecha", 10.0, 1),
+    ])
+
+    bloques = []
+    agregar_pos(origen, tamano=2, con_tickets=bloques.append)
+    assert [len(b) for b in bloques] == [2, 2, 1]
+
+    informe = importar_pos(origen, tmp_path, tamano=2)
+    assert informe["rechazadas"] == 1
+    assert informe["dias"] == 2
+
+    ventas = cargar_ventas(directorio=tmp_path).set_index("fecha")
+    assert ventas.loc["2026-01-31", "ventas_total_eur"] == 65.0
+    assert ventas.loc["2026-01-31", "tickets_noche"] == 2
+    assert ventas.loc["2026-02-01", "ventas_total_eur"] == 35.0
+    assert ventas.loc["2026-02-01", "tickets_manana"] == 1
+
+    # Un día operativo vive en una sola partición; sin restos temporales
+    assert [r.stem for r in particiones(tmp_path)] == ["2026-01", "2026-02"]
+    assert [p.name for p in (tmp_path / TICKETS_DIR).iterdir() if p.is_dir()] == []
+
+    # El almacén de tickets reproduce las ventas importadas
+    derivadas = ventas_por_turno(tmp_path).set_index("fecha")
+    pd.testing.assert_series_equal(
+        derivadas["ventas_total_eur"], ventas["ventas_total_eur"], check_names=False
+    )
+
+
+def test_reimportar_sustituye_los_dias(tmp_path):
+    importar_pos(exportacion_tpv(tmp_path / "a.csv", [
+        ("2026-03-02 13:00", 20.0, 2),
+        ("2026-03-03 13:00", 25.0, 2),
+    ]), tmp_path)
+    importar_pos(exportacion_tpv(tmp_path / "b.csv", [
+        ("2026-03-03 14:00", 50.0, 4),
+        ("2026-03-03 22:00", 10.0, 1),
+    ]), tmp_path, tamano=1)
+
+    tickets = leer_tickets(tmp_path)
+    assert tickets["importe"].tolist() == [20.0, 50.0, 10.0]
+
+    ventas = cargar_ventas(directorio=tmp_path).set_index("fecha")
+    assert ventas["ventas_total_eur"].tolist() == [20.0, 60.0]
+
+
+def test_fallo_en_ventas_no_publica_los_tickets(tmp_path, monkeypatch):
+    importar_pos(exportacion_tpv(tmp_path / "a.csv", [("2026-03-02 13:00", 20.0, 2)]), tmp_path)
+    antes = leer_tickets(tmp_path)
+
+    def falla(*args, **kwargs):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr("oyken.importacion.upsert_ventas", falla)
+    with pytest.raises(OSError):
+        importar_pos(exportacion_tpv(tmp_path / "b.csv", [
+            ("2026-03-02 14:00", 99.0, 1),
+            ("2026-04-01 14:00", 99.0, 1),
+        ]), tmp_path)
+
+    pd.testing.assert_frame_equal(leer_tickets(tmp_path), antes)
+    assert [r.stem for r in particiones(tmp_path)] == ["2026-03"]
+    assert cargar_ventas(directorio=tmp_path)["ventas_total_eur"].tolist() == [20.0]
+    assert [p.name for p in (tmp_path / TICKETS_DIR).iterdir() if p.is_dir()] == []
+
+
+def test_ventas_sin_tickets_retiran_los_del_dia(tmp_path):
+    importar_pos(exportacion_tpv(tmp_path / "a.csv", [
+        ("2026-03-02 13:00", 20.0, 2),
+        ("2026-03-03 13:00", 25.0, 2),
+        ("2026-04-01 13:00", 30.0, 2),
+    ]), tmp_path)
+
+    # Turnos del 02/03 y registro a mano del 01/04 (único día de su mes)
+    pd.DataFrame({
+        "fecha": ["2026-03-02", "2026-03-02"],
+        "turno": ["mañana", "noche"],
+        "importe": [70.0, 30.0],
+    }).to_csv(tmp_path / "turnos.csv", index=False)
+    importar_pos(tmp_path / "turnos.csv", tmp_path)
+    retirar_tickets([pd.Timestamp("2026-04-01")], tmp_path, lambda: registrar_venta(
+        {"fecha": pd.Timestamp("2026-04-01"), "ventas_total_eur": 55.0}, tmp_path
+    ))
+
+    assert leer_tickets(tmp_path)["importe"].tolist() == [25.0]
+    assert [r.stem for r in particiones(tmp_path)] == ["2026-03"]
+
+    # Reagregar con otros turnos no pisa los días que ya no son de tickets
+    reagregar_ventas(tmp_path, {"manana": 6, "tarde": 15, "noche": 21})
+    ventas = cargar_ventas(directorio=tmp_path).set_index("fecha")
+    assert ventas["ventas_total_eur"].tolist() == [100.0, 25.0, 55.0]
+
+
+# =========================
+# COMPRAS DESDE FACTURAS
+# =========================
+def test_importe_con_coma_decimal():
+    columna = pd.Series(["1.234,50", "12,5", 7.25, "3.5", "abc", None], dtype=object)
+    numero = _importe(columna)
+    assert numero.iloc[:4].tolist() == [1234.5, 12.5, 7.25, 3.5]
+    assert numero.iloc[4:].isna().all()
+
+
+def test_importar_facturas(tmp_path):
+    origen = tmp_path / "facturas.csv"
+    pd.DataFrame({
+        "Fecha factura": ["03/02/2026", "03/02/2026", "04/02/2026", "31/02/2026", "05/02/2026", "05/02/2026"],
+        "Proveedor": ["Makro", " Bebidas Martínez ", "Makro", "Makro", "", "Makro"],
+        "Categoría": ["Alimentación", "bebidas", "Limpieza", "Otros", "Otros", "Vajilla"],
+        "Importe": ["1.234,50", "80,00", "15", "10", "10", "0"],
+    }).to_csv(origen, index=False)
+
+    informe = importar_compras(origen, tmp_path, tamano=4)
+
+    # Fecha imposible, sin proveedor y coste 0: rechazadas
+    assert (informe["filas"], informe["rechazadas"], informe["lineas"]) == (6, 3, 3)
+    assert informe["coste"] == 1329.5
+    assert informe["familias"] == {"Materia prima": 1234.5, "Bebidas": 80.0, "Limpieza": 15.0, "Otros": 0.0}
+
+    compras = pd.read_csv(tmp_path / COMPRAS_FILE)
+    assert compras["Fecha"].tolist() == ["03/02/2026", "03/02/2026", "04/02/2026"]
+    assert compras["Coste (€)"].tolist() == [1234.5, 80.0, 15.0]
+
+    # Los proveedores que faltaban quedan dados de alta
+    registro, _ = cargar_proveedores(tmp_path)
+    assert proveedor_existente(registro, "MAKRO") == "Makro"
+    assert proveedor_existente(registro, "bebidas martinez") == "Bebidas Martínez"
+
+
+def test_facturas_sin_columnas_obligatorias(tmp_path):
+    origen = tmp_path / "facturas.csv"
+    pd.DataFrame({"Fecha": ["03/02/2026"], "Importe": ["10"]}).to_csv(origen, index=False)
+
+    with pytest.raises(ErrorImportacion, match="proveedor"):
+        importar_compras(origen, tmp_path)
+    assert not (tmp_path / COMPRAS_FILE).exists()
@@ -0,0 +1,76 @@
+import pandas as pd
+
+from oyken.importacion import importar_compras
+from oyken.proveedores import (
+    PROVEEDORES_FILE,
+    alta_proveedores,
+    buscar_proveedores,
+    cargar_proveedores,
+    clave,
+    proveedor_existente,
+    registro_proveedores
+)
+
+
+def test_clave_sin_tildes_ni_mayusculas():
+    assert clave("Frutas López") == clave("  FRUTAS   lopez ") == "FRUTAS LOPEZ"
+    assert clave("Peña") == "PENA"
+
+
+def test_alta_rechaza_claves_existentes(tmp_path):
+    registro, _ = alta_proveedores(["Frutas López", "Makro"], tmp_path)
+    registro, _ = alta_proveedores(["FRUTAS LOPEZ", "makro", "Pescados  Ruiz", "pescados ruiz"], tmp_path)
+
+    maestro = pd.read_csv(tmp_path / PROVEEDORES_FILE)
+    assert maestro["Proveedor"].tolist() == ["Frutas López", "Makro", "Pescados Ruiz"]
+    assert proveedor_existente(registro, "frutas lopez") == "Frutas López"
+
+
+def test_alta_no_toca_las_filas_existentes(tmp_path):
+    # Maestro antiguo con dos grafías de la misma clave y otra columna
+    pd.DataFrame({
+        "Proveedor": ["Makro", "Frutas López", "FRUTAS LOPEZ"],
+        "CIF": ["A1", "B2", "B3"],
+    }).to_csv(tmp_path / PROVEEDORES_FILE, index=False)
+
+    alta_proveedores(["frutas lópez", "Coca Cola"], tmp_path)
+
+    maestro = pd.read_csv(tmp_path / PROVEEDORES_FILE)
+    assert maestro["Proveedor"].tolist() == ["Makro", "Frutas López", "FRUTAS LOPEZ", "Coca Cola"]
+    assert maestro["CIF"].tolist()[:3] == ["A1", "B2", "B3"]
+
+
+def test_importacion_informa_del_nombre_guardado(tmp_path):
+    alta_proveedores(["Bebidas Martínez"], tmp_path)
+    origen = tmp_path / "facturas.csv"
+    pd.DataFrame({
+        "Fecha": ["03/02/2026", "03/02/2026", "03/02/2026"],
+        "Proveedor": ["BEBIDAS MARTINEZ", "  pescados   RUIZ ", "Pescados Ruiz"],
+        "Coste": ["10", "20", "30"],
+    }).to_csv(origen, index=False)
+
+    informe = importar_compras(origen, tmp_path)
+
+    assert informe["proveedores_nuevos"] == ["pescados RUIZ"]
+    registro, _ = cargar_proveedores(tmp_path)
+    assert registro["nombres"] == ["Bebidas Martínez", "pescados RUIZ"]
+    compras = pd.read_csv(tmp_path / "compras.csv")
+    assert compras["Proveedor"].tolist() == ["Bebidas Martínez", "pescados RUIZ", "pescados RUIZ"]
+
+
+def test_busqueda_por_prefijo_y_aproximada():
+    registro = registro_proveedores(["Makro", "Makro Cash", "Frutas López", "Bebidas Martínez"])
+
+    assert buscar_proveedores(registro, "mak") == ["Makro", "Makro Cash"]
+    assert buscar_proveedores(registro, "lopez")[0] == "Frutas López"
+    assert buscar_proveedores(registro, "frutas lopes")[0] == "Frutas López"
+    assert buscar_proveedores(registro, "") == ["Bebidas Martínez", "Frutas López", "Makro", "Makro Cash"]
+
+
+def test_busqueda_corta_a_media_palabra():
+    registro = registro_proveedores(["Galope", "Opera", "Makro", "Coop Norte"])
+
+    # Con menos de LONGITUD_APROXIMADA letras, subcadena en cualquier posición
+    assert buscar_proveedores(registro, "op") == ["Opera", "Coop Norte", "Galope"]
+    assert buscar_proveedores(registro, "kr") == ["Makro"]
+    assert buscar_proveedores(registro, "op", limite=2) == ["Opera", "Coop Norte"]
@@ -0,0 +1,105 @@
+import pytest
+
+from oyken.rrhh_core import (
+    MINUTOS_DIA,
+    cargar_modelo,
+    diferencias_modelo,
+    duracion_horas,
+    guardar_modelo,
+    huella_estructural,
+    intervalo,
+    minutos,
+    perfil_cobertura,
+    salida_vigente,
+    versiones_modelo
+)
+
+
+# =========================
+# BARRIDO DE COBERTURA
+# =========================
+def test_intervalo_que_cruza_medianoche():
+    assert intervalo("22:00", "02:00") == (22 * 60, 26 * 60)
+    assert duracion_horas("22:00", "02:00") == 4
+    assert intervalo("00:00", "24:00") == (0, MINUTOS_DIA)
+
+
+def test_hora_no_valida():
+    with pytest.raises(ValueError):
+        minutos("25:00")
+    with pytest.raises(ValueError):
+        minutos("12:75")
+
+
+def test_tramo_nocturno_cubre_final_y_principio_del_dia():
+    perfil = perfil_cobertura([intervalo("22:00", "02:00")])
+    assert perfil == [(0, 120, 1), (120, 1320, 0), (1320, MINUTOS_DIA, 1)]
+
+
+def test_pico_con_tramo_nocturno_solapado():
+    # Cocina 12–00:30, sala 20–02, limpieza 00:00–01:00
+    huella = huella_estructural([
+        intervalo("12:00", "00:30"),
+        intervalo("20:00", "02:00"),
+        intervalo("00:00", "01:00"),
+    ])
+    assert huella["pico_simultaneo"] == 3
+    assert huella["franjas_pico"] == [(0, 30)]
+    assert huella["horas_diarias"] == 12.5 + 6 + 1
+
+
+def test_tramos_contiguos_no_se_solapan():
+    # Semiabiertos: el que sale a las 16:00 no coincide con el que entra
+    huella = huella_estructural([intervalo("08:00", "16:00"), intervalo("16:00", "23:00")])
+    assert huella["pico_simultaneo"] == 1
+    assert huella["franjas_pico"] == [(8 * 60, 23 * 60)]
+
+
+def test_perfil_cubre_el_dia_completo():
+    perfil = perfil_cobertura([intervalo("09:00", "13:00"), intervalo("11:00", "03:00")])
+    assert perfil[0][0] == 0 and perfil[-1][1] == MINUTOS_DIA
+    assert all(a[1] == b[0] for a, b in zip(perfil, perfil[1:]))
+    assert sum((f - i) * n for i, f, n in perfil) == (4 + 16) * 60
+
+
+def test_sin_intervalos():
+    huella = huella_estructural([])
+    assert huella["pico_simultaneo"] == 0
+    assert huella["franjas_pico"] == []
+
+
+# =========================
+# MODELO VERSIONADO
+# =========================
+def modelo(pico, fecha_modelo):
+    return {
+        "funciones": ["cocina", "sala"],
+        "salida": {"pico_simultaneo": pico, "horas_diarias": 20.0, "fecha_modelo": fecha_modelo},
+    }
+
+
+def test_sin_cambios_no_crea_version(tmp_path):
+    assert guardar_modelo(modelo(2, "2026-03-01"), "2026-03-01", tmp_path) == "2026-03-01"
+    assert guardar_modelo(modelo(2, "2026-03-01"), "2026-03-01", tmp_path) is None
+    # Otro día, mismo contenido: fecha_modelo no cuenta como cambio
+    assert guardar_modelo(modelo(2, "2026-03-02"), "2026-03-02", tmp_path) is None
+    assert versiones_modelo(tmp_path) == ["2026-03-01"]
+
+
+def test_misma_fecha_no_sobrescribe(tmp_path):
+    guardar_modelo(modelo(2, "2026-03-01"), "2026-03-01", tmp_path)
+    assert guardar_modelo(modelo(3, "2026-03-01"), "2026-03-01", tmp_path) == "2026-03-01-02"
+    assert guardar_modelo(modelo(4, "2026-03-01"), "2026-03-01", tmp_path) == "2026-03-01-03"
+
+    assert cargar_modelo("2026-03-01", tmp_path)["salida"]["pico_simultaneo"] == 2
+    assert salida_vigente(tmp_path)["pico_simultaneo"] == 4
+
+
+def test_diferencias_entre_versiones(tmp_path):
+    guardar_modelo(modelo(2, "2026-03-01"), "2026-03-01", tmp_path)
+    guardar_modelo(modelo(3, "2026-04-01"), "2026-04-01", tmp_path)
+
+    cambios = diferencias_modelo(cargar_modelo("2026-03-01", tmp_path), cargar_modelo(directorio=tmp_path))
+    assert ("salida.pico_simultaneo", 2, 3) in cambios
+    assert ("salida.fecha_modelo", "2026-03-01", "2026-04-01") in cambios
+    assert not any(ruta == "funciones" for ruta, _, _ in cambios)
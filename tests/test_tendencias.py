@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from oyken.tendencias import (
+    ESTADO_FILE,
+    INDICADORES,
+    INDICADORES_FILE,
+    TURNOS,
+    calcular_indicadores,
+    leer_indicadores,
+    serie_tendencias,
+    ventas_tendencias
+)
+from oyken.ventas import registrar_venta, upsert_ventas
+
+
+def dias(desde, n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    df = pd.DataFrame({"fecha": pd.date_range(desde, periods=n)})
+    for t in TURNOS:
+        df[f"tickets_{t}"] = rng.integers(0, 40, n)
+        df[f"ventas_{t}_eur"] = (df[f"tickets_{t}"] * rng.uniform(8, 30, n)).round(2)
+    df["ventas_total_eur"] = sum(df[f"ventas_{t}_eur"] for t in TURNOS)
+    return df
+
+
+def sin_cambios(tabla, referencia):
+    pd.testing.assert_frame_equal(
+        tabla.reset_index(drop=True), referencia.reset_index(drop=True),
+        check_exact=False, rtol=1e-4, atol=1e-3
+    )
+
+
+def test_motor_streaming_igual_que_el_backfill(tmp_path):
+    upsert_ventas(dias("2025-01-01", 60), tmp_path)
+    df = ventas_tendencias(tmp_path)
+
+    streaming = serie_tendencias(df)
+    streaming[INDICADORES] = streaming[INDICADORES].astype("float32")
+    sin_cambios(streaming, calcular_indicadores(df))
+
+
+def test_dias_nuevos_sin_backfill(tmp_path, monkeypatch):
+    upsert_ventas(dias("2025-01-01", 40), tmp_path)
+    leer_indicadores(tmp_path)
+    assert (tmp_path / ESTADO_FILE).exists()
+
+    def prohibido(*args, **kwargs):
+        raise AssertionError("backfill completo")
+
+    monkeypatch.setattr("oyken.tendencias.backfill_indicadores", prohibido)
+    for fila in dias("2025-02-10", 5, semilla=1).to_dict("records"):
+        registrar_venta(fila, tmp_path)
+        tabla = leer_indicadores(tmp_path)
+        assert tabla["fecha"].iloc[-1] == fila["fecha"]
+
+    sin_cambios(tabla, calcular_indicadores(ventas_tendencias(tmp_path)))
+    monkeypatch.undo()
+
+    # Sin ventas nuevas, la tabla se lee tal cual
+    antes = (tmp_path / INDICADORES_FILE).stat().st_mtime_ns
+    leer_indicadores(tmp_path)
+    assert (tmp_path / INDICADORES_FILE).stat().st_mtime_ns == antes
+
+
+def test_cambio_en_dia_pasado_rehace_la_tabla(tmp_path):
+    upsert_ventas(dias("2025-01-01", 40), tmp_path)
+    leer_indicadores(tmp_path)
+
+    pasado = dias("2025-01-20", 1, semilla=2)
+    pasado["ventas_total_eur"] *= 10
+    registrar_venta(pasado.iloc[0].to_dict(), tmp_path)
+
+    tabla = leer_indicadores(tmp_path)
+    sin_cambios(tabla, calcular_indicadores(ventas_tendencias(tmp_path)))
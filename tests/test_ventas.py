@@ -0,0 +1,110 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+import pandas as pd
+
+from oyken import db
+from oyken.ventas import (
+    JOURNAL_FILE,
+    MAX_BYTES_DIARIO,
+    cargar_ventas,
+    compactar_si_conviene,
+    compactar_ventas,
+    registrar_venta,
+    upsert_ventas
+)
+
+
+def venta(fecha, total, observaciones=""):
+    return {
+        "fecha": pd.Timestamp(fecha),
+        "ventas_manana_eur": total,
+        "ventas_total_eur": total,
+        "tickets_manana": 1,
+        "observaciones": observaciones
+    }
+
+
+def test_diario_ultima_linea_gana(tmp_path):
+    registrar_venta(venta("2026-01-05", 100), tmp_path)
+    registrar_venta(venta("2026-01-06", 200), tmp_path)
+    registrar_venta(venta("2026-01-05", 150, "corregida"), tmp_path)
+
+    df = cargar_ventas(directorio=tmp_path)
+
+    assert list(df["fecha"]) == [pd.Timestamp("2026-01-05"), pd.Timestamp("2026-01-06")]
+    assert list(df["ventas_total_eur"]) == [150, 200]
+    assert df.loc[0, "observaciones"] == "corregida"
+
+
+def test_compactacion_ida_y_vuelta(tmp_path):
+    for d in range(10):
+        registrar_venta(venta(pd.Timestamp("2026-02-01") + pd.Timedelta(days=d), 10.0 * d), tmp_path)
+    antes = cargar_ventas(directorio=tmp_path)
+
+    compactar_ventas(tmp_path)
+
+    assert not (tmp_path / JOURNAL_FILE).exists()
+    pd.testing.assert_frame_equal(cargar_ventas(directorio=tmp_path), antes)
+
+    # La tabla de oyken.db tiene ya todo el diario
+    with closing(db.conectar(tmp_path)) as con:
+        base = db.leer(con, "ventas")
+    assert list(base["ventas_total_eur"]) == list(antes["ventas_total_eur"])
+
+    # Lo guardado después de compactar se superpone a la base
+    registrar_venta(venta("2026-02-03", 999), tmp_path)
+    df = cargar_ventas(directorio=tmp_path)
+    assert len(df) == 10
+    assert df.set_index("fecha").loc["2026-02-03", "ventas_total_eur"] == 999
+
+
+def test_upsert_conserva_observaciones(tmp_path):
+    registrar_venta(venta("2026-03-01", 50, "lluvia"), tmp_path)
+    upsert_ventas(pd.DataFrame([venta("2026-03-01", 80), venta("2026-03-02", 90)]), tmp_path)
+
+    df = cargar_ventas(directorio=tmp_path).set_index("fecha")
+    assert df.loc["2026-03-01", "ventas_total_eur"] == 80
+    assert df.loc["2026-03-01", "observaciones"] == "lluvia"
+    assert not (tmp_path / JOURNAL_FILE).exists()
+
+
+def test_compactar_solo_si_conviene(tmp_path):
+    assert compactar_si_conviene(tmp_path) is None
+
+    registrar_venta(venta("2026-04-01", 10), tmp_path)
+    assert compactar_si_conviene(tmp_path) is None  # diario pequeño
+
+    hilo = compactar_si_conviene(tmp_path, al_abrir=True)
+    hilo.join()
+    assert not (tmp_path / JOURNAL_FILE).exists()
+
+    # Diario por encima del umbral: se compacta tras guardar
+    with open(tmp_path / JOURNAL_FILE, "w") as f:
+        f.write("fecha,ventas_total_eur\n")
+        filas = MAX_BYTES_DIARIO // 15 + 1  # 15 bytes por línea
+        for d in range(filas):
+            f.write(f"{(pd.Timestamp('2000-01-01') + pd.Timedelta(days=d)):%Y-%m-%d},1.0\n")
+    hilo = compactar_si_conviene(tmp_path)
+    hilo.join()
+    assert len(cargar_ventas(directorio=tmp_path)) == filas + 1
+
+
+def _escritor(args):
+    directorio, n, altas = args
+    for k in range(altas):
+        registrar_venta(venta(pd.Timestamp("2000-01-01") + pd.Timedelta(days=n * altas + k), 1.0), directorio)
+        if k % 2 == 0:
+            compactar_ventas(directorio)
+    return n
+
+
+def test_escritores_concurrentes_no_pierden_ventas(tmp_path):
+    escritores, altas = 8, 6
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        list(pool.map(_escritor, [(tmp_path, n, altas) for n in range(escritores)]))
+    compactar_ventas(tmp_path)
+
+    df = cargar_ventas(directorio=tmp_path)
+    assert len(df) == escritores * altas
+    assert df["fecha"].is_unique